@@ -0,0 +1,145 @@
+# Copyright 2024 Canonical Ltd
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Cinder backends defined by the structured backends option.
+
+Each backend is a mapping of charm options with a name, e.g.
+
+    - name: powerflex-a
+      powerflexgw-ip: 10.0.0.10
+      powerflex-storage-pools: pd1:sp1
+    - name: powerflex-b
+      powerflexgw-ip: 10.0.1.10
+      powerflex-sdc-mdm-ips: 10.0.1.11,10.0.1.12
+      powerflex-storage-pools: pd1:sp1,pd1:sp2
+      performance-profile: high-throughput
+
+The options a backend does not set are taken from the charm configuration.
+A backend on another PowerFlex system sets the MDM IPs of that system,
+which are added to the SDC.
+"""
+
+import re
+from typing import Any, Dict, List, Mapping, Optional
+
+import yaml
+
+import replication
+import tuning
+
+# Charm options which may be set for each backend
+BACKEND_OPTIONS = (
+    "volume-backend-name",
+    "powerflexgw-ip",
+    "powerflexgw-login",
+    "powerflexgw-password",
+    "powerflexgw-verify-certificate",
+    "powerflex-storage-pools",
+    "powerflex-max-over-subscription-ratio",
+    "powerflex-san-thin-provision",
+    "powerflex-allow-migration-during-rebuild",
+    "powerflex-allow-non-padded-volumes",
+    "powerflex-rest-server-port",
+    "powerflex-round-volume-capacity",
+    "powerflex-rest-api-connect-timeout",
+    "powerflex-rest-api-read-timeout",
+    "powerflex-sdc-mdm-ips",
+    "performance-profile",
+    "performance-overrides",
+    "powerflex-replication-config",
+    "image-volume-cache-enabled",
+    "image-volume-cache-max-size-gb",
+    "image-volume-cache-max-count",
+)
+
+# cinder.conf sections which cannot hold a backend
+RESERVED_SECTIONS = ("DEFAULT", "backend_defaults", "coordination")
+
+_NAME = re.compile(r"^[A-Za-z0-9][A-Za-z0-9_.-]*$")
+
+
+def _validate(index: int, entry: Any, names: set) -> str:
+    """Validate a backend entry and return its name."""
+    if not isinstance(entry, dict):
+        raise ValueError(f"backend {index} is not a mapping")
+
+    name = entry.get("name")
+    if not isinstance(name, str) or not _NAME.match(name):
+        raise ValueError(f"backend {index} has an invalid name {name!r}")
+    if name in RESERVED_SECTIONS:
+        raise ValueError(f"backend name {name} is reserved by cinder")
+    if name in names:
+        raise ValueError(f"backend {name} is defined twice")
+
+    unknown = sorted(set(entry) - {"name"} - set(BACKEND_OPTIONS))
+    if unknown:
+        raise ValueError("backend {}: unknown options {}".format(name, ", ".join(unknown)))
+
+    for option, resolve in (
+        ("performance-profile", tuning.profile_options),
+        ("performance-overrides", tuning.parse_overrides),
+    ):
+        try:
+            resolve(entry.get(option))
+        except ValueError as e:
+            raise ValueError(f"backend {name}: invalid {option}: {e}") from e
+
+    mdm_ips = entry.get("powerflex-sdc-mdm-ips")
+    if mdm_ips is not None and (not isinstance(mdm_ips, str) or not mdm_ips.strip()):
+        raise ValueError(f"backend {name}: powerflex-sdc-mdm-ips is not a list of MDM IPs")
+
+    try:
+        replication.parse_replication_device(entry.get("powerflex-replication-config"))
+    except ValueError as e:
+        raise ValueError(f"backend {name}: invalid powerflex-replication-config: {e}") from e
+
+    return name
+
+
+def parse_backends(raw: Optional[str]) -> List[Dict[str, Any]]:
+    """Parse the backends option.
+
+    :param raw: the YAML list of backends, no backend when empty
+    :return: the charm options set for each backend, in order
+    :raises ValueError: when the option is malformed or a backend is invalid
+    """
+    if not raw or not raw.strip():
+        return []
+
+    try:
+        entries = yaml.safe_load(raw)
+    except yaml.YAMLError as e:
+        raise ValueError(f"not valid YAML: {e}") from e
+    if not isinstance(entries, list) or not entries:
+        raise ValueError("expected a list of backends")
+
+    names = set()
+    for index, entry in enumerate(entries, 1):
+        names.add(_validate(index, entry, names))
+
+    return [dict(entry) for entry in entries]
+
+
+def backend_config(charm_config: Mapping[str, Any], backend: Mapping[str, Any]) -> dict:
+    """Return the charm options of a backend.
+
+    :param charm_config: the charm configuration
+    :param backend: the options set for the backend
+    :return: the charm configuration updated with the backend options, the
+             volume backend name defaulting to the backend name
+    """
+    config = dict(charm_config)
+    config.update(backend)
+    config["volume-backend-name"] = backend.get("volume-backend-name") or backend["name"]
+    return config
@@ -16,26 +16,84 @@
 
 """Charmed operator for Dell PowerFlex Cinder driver."""
 
+import contextlib
+import functools
+import hashlib
+import json
 import logging
 import os
 import subprocess
+import sys
+import time
 from pathlib import Path
-from typing import Iterable, Optional, Union
+from typing import Any, Iterable, Optional, Tuple, Union
 
 import charmhelpers.core as ch_core
-from charmhelpers.core.host import service_running
-from charmhelpers.core.templating import render
+from charmhelpers.core.host import service_restart, service_running
 from ops import model
 from ops.main import main
 from ops_openstack.plugins.classes import CinderStoragePluginCharm
 
+import backends
+import cinder_client
+import gateway
+import iobench
+import qos
+import replication
+import rolling
+import sdc
+import sdc_stats
+import timing
+import tuning
+
 VOLUME_DRIVER = "cinder.volume.drivers.dell_emc.powerflex.driver.PowerFlexDriver"
 CONNECTOR_DIR = "/opt/emc/scaleio/openstack"
 CONNECTOR_FILE = "connector.conf"
+# Files kept in the unit state directory, next to the unit's charm directory
+TIMINGS_FILE = "powerflex-hook-timings.json"
+SDC_INSTALL_STATE_FILE = "powerflex-sdc-install.json"
+# Lock taken by dpkg frontends such as apt, held by the background installation
+DPKG_FRONTEND_LOCK = "/var/lib/dpkg/lock-frontend"
+DPKG_LOCK_TIMEOUT = 600
+METRICS_STATE_FILE = "powerflex-metrics-state.json"
+METRICS_RELATION = "metrics-endpoint"
+PEER_RELATION = "sdc-peers"
+SYSTEMD_DIR = "/etc/systemd/system"
+# Seconds between two checks of the cinder-volume services after a failover
+FAILOVER_POLL_INTERVAL = 5
 
 logger = logging.getLogger(__name__)
 
 
+def render(*args, **kwargs):
+    """Render a template with charmhelpers.core.templating.render.
+
+    Most hooks never render a template, so the templating helpers and
+    Jinja2 are only imported when a template is actually rendered.
+    """
+    from charmhelpers.core.templating import render as _render
+
+    return _render(*args, **kwargs)
+
+
+def _memoized_status(check):
+    """Reuse the result of a status check for the rest of a status evaluation.
+
+    update_status() evaluates every registered check, then some of them
+    again to report their details: each check only runs once per evaluation.
+    """
+
+    @functools.wraps(check)
+    def wrapper(self):
+        if self._status_results is None:
+            return check(self)
+        if check.__name__ not in self._status_results:
+            self._status_results[check.__name__] = check(self)
+        return self._status_results[check.__name__]
+
+    return wrapper
+
+
 class CinderPowerflexCharm(CinderStoragePluginCharm):
     """Cinder subordinate charm for Dell PowerFlex drivers."""
 
@@ -57,18 +115,90 @@ class CinderPowerflexCharm(CinderStoragePluginCharm):
     # Restart map is used to map which services should be restarted
     # when the specified file is changed on disk. The key is the file,
     # the value is a list of services which need to be restarted.
-    RESTART_MAP = {
-        "/opt/emc/scaleio/openstack/connector.conf": ["scini"],
-    }
+    # connector.conf only holds the credentials read by os-brick and cinder
+    # when they use the gateway, so scini is never restarted for it: a
+    # restart interrupts I/O on every PowerFlex volume attached to the host.
+    RESTART_MAP = {}
+
+    # Services which must be running for the unit to be active
+    SERVICES = ["scini"]
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        self._stored.installed = False
-        self._stored.install_failed = False
+        hook = Path(os.environ.get("JUJU_DISPATCH_PATH", "unknown")).name
+        self.timer = timing.HookTimer(self._timings_file, hook)
+        self._stored.set_default(
+            installed=False,
+            install_failed=False,
+            sdc_package_sha256=None,
+            gateway_probe={},
+            sdc_install_pending=None,
+            mdm_unreachable=[],
+            mdm_order={},
+            backend_mdms={},
+            sdc_parameters={},
+            sdc_resource={},
+            sdc_upgrade={},
+            sdc_profile={},
+            sdc_package_name=None,
+            dpkg_state={},
+        )
+        self._gateway = None
+        # Results of the status checks during a status evaluation
+        self._status_results = None
         self._stored.is_started = True
 
         self.register_status_check(self.resource_status)
         self.register_status_check(self.install_status)
+        self.register_status_check(self.upgrade_status)
+        self.register_status_check(self.active_active_status)
+        self.register_status_check(self.gateway_status)
+        self.register_status_check(self.mdm_status)
+        self.register_status_check(self.tuning_status)
+        self.register_status_check(self.backends_status)
+        self.register_status_check(self.qos_tiers_status)
+        self.register_status_check(self.replication_status)
+        self.register_status_check(self.image_volume_cache_status)
+        self.register_status_check(self.sdc_parameters_status)
+        self.register_status_check(self.sdc_profile_status)
+
+        self.framework.observe(self.on.upgrade_charm, self._on_upgrade_charm)
+        self.framework.observe(self.on.config_changed, self._on_config_changed)
+        self.framework.observe(self.on.reload_sdc_action, self._on_reload_sdc_action)
+        self.framework.observe(self.on.benchmark_backend_action, self._on_benchmark_backend_action)
+        self.framework.observe(self.on.sdc_stats_action, self._on_sdc_stats_action)
+        self.framework.observe(self.on.apply_qos_tiers_action, self._on_apply_qos_tiers_action)
+        self.framework.observe(self.on.failover_action, self._on_failover_action)
+        self.framework.observe(self.on.failback_action, self._on_failback_action)
+        self.framework.observe(self.on.timing_report_action, self._on_timing_report_action)
+        self.framework.observe(self.framework.on.commit, self._on_commit)
+        self.framework.observe(
+            self.on[METRICS_RELATION].relation_joined, self._on_metrics_endpoint_changed
+        )
+        self.framework.observe(
+            self.on[METRICS_RELATION].relation_broken, self._on_metrics_endpoint_broken
+        )
+        self.framework.observe(self.on.leader_elected, self._on_metrics_endpoint_changed)
+        self.framework.observe(self.on[PEER_RELATION].relation_changed, self._on_sdc_peers_changed)
+        self.framework.observe(
+            self.on[PEER_RELATION].relation_departed, self._on_sdc_peers_changed
+        )
+        self.framework.observe(self.on.leader_elected, self._on_sdc_peers_changed)
+        self.framework.observe(self.on.update_status, self._on_update_status_probe_mdms)
+        self.framework.observe(self.on.update_status, self._on_update_status_collect_install)
+        self.framework.observe(self.on.update_status, self._on_sdc_peers_changed)
+        self.framework.observe(self.on.update_status, self._on_update_status_retry_profile)
+
+    def services(self):
+        """Return the services which must be running for the unit to be active."""
+        if self.model.relations.get(METRICS_RELATION):
+            return self.SERVICES + [self._exporter_service]
+        return list(self.SERVICES)
+
+    @property
+    def _exporter_service(self) -> str:
+        """Return the name of the systemd service running the metrics exporter."""
+        return f"{self.app.name}-exporter"
 
     @property
     def stateless(self):
@@ -78,15 +208,82 @@ class CinderPowerflexCharm(CinderStoragePluginCharm):
     @property
     def active_active(self):
         """Indicate whether the cinder driver supports an active/active configuration."""
-        # Active/Active configuration is not supported at this time
-        return False
+        # Cinder services can only share the backend safely when they
+        # synchronise through a coordination backend
+        cget = self.config.get
+        return bool(cget("active-active") and cget("coordination-backend-url"))
+
+    @property
+    def _state_dir(self) -> Path:
+        """Return the directory holding the files kept by this unit."""
+        return self.charm_dir.parent
+
+    @property
+    def _timings_file(self) -> Path:
+        """Return the path of the file holding the hook timings of this unit."""
+        return self._state_dir / TIMINGS_FILE
+
+    def set_data(self, data, config, app_name):
+        """Publish the backend configuration, only writing what has changed.
+
+        The principal cinder charm rewrites cinder.conf and restarts
+        cinder-volume whenever the storage-backend relation data changes,
+        so the data last published on the relation is compared with the
+        newly generated data and only the keys which differ are written.
+
+        :param data: the relation data bag of this unit
+        :param config: the charm configuration
+        :param app_name: the name of this application
+        """
+        pending = {}
+        super().set_data(pending, config, app_name)
+        configured = self._backends(config)
+        if configured:
+            # Every backend is enabled by cinder under its own section
+            pending["backend_name"] = ",".join(backend["name"] for backend in configured)
+            pending["subordinate_configuration"] = _set_backend_sections(
+                pending["subordinate_configuration"],
+                {
+                    backend["name"]: list(
+                        self.cinder_configuration(backends.backend_config(config, backend))
+                    )
+                    for backend in configured
+                },
+            )
+        pending["subordinate_configuration"] = _add_sections(
+            pending["subordinate_configuration"], self.cinder_sections(config)
+        )
+
+        changes = _diff_backend_options(
+            data.get("subordinate_configuration"), pending.get("subordinate_configuration")
+        )
+        changed_keys = [key for key, value in pending.items() if data.get(key) != value]
+        if not changed_keys:
+            logger.info("storage-backend data unchanged, nothing to publish")
+            return
+
+        logger.info(
+            "Publishing storage-backend keys %s, backend option changes: %s",
+            ", ".join(sorted(changed_keys)),
+            changes or "none",
+        )
+        for key in changed_keys:
+            data[key] = pending[key]
 
     def _get_debian_package_path(self) -> Optional[Path]:
         """Return the path to the Debian package if it has been provided.
 
+        The resource is only fetched again once the file it was fetched to
+        changes or disappears, or after install and upgrade-charm, when a
+        new revision may have been attached.
+
         :return: the Path to the Debian package if the user has provided it
                  as a resource, otherwise return None
         """
+        cached = dict(self._stored.sdc_resource)
+        if cached and not cached.get("stale") and self._resource_unchanged(cached):
+            return Path(cached["path"])
+
         sdc_package_file = self.model.resources.fetch("sdc-deb-package")
 
         # Check that the file exists and is not a 0-byte file
@@ -95,10 +292,50 @@ class CinderPowerflexCharm(CinderStoragePluginCharm):
             and sdc_package_file.is_file()
             and sdc_package_file.stat().st_size > 0
         ):
+            stat = sdc_package_file.stat()
+            resource = {
+                "path": str(sdc_package_file),
+                "size": stat.st_size,
+                "mtime_ns": stat.st_mtime_ns,
+                "sha256": None,
+            }
+            # The checksum still holds when the same file was fetched again
+            if cached and self._resource_unchanged(dict(cached, path=resource["path"])):
+                resource["sha256"] = cached.get("sha256")
+            self._stored.sdc_resource = resource
             return sdc_package_file
 
+        self._stored.sdc_resource = {}
         return None
 
+    @staticmethod
+    def _resource_unchanged(cached: dict) -> bool:
+        """Check whether a fetched resource file still has its recorded size and mtime."""
+        try:
+            stat = Path(cached["path"]).stat()
+        except OSError:
+            return False
+        return (stat.st_size, stat.st_mtime_ns) == (cached["size"], cached["mtime_ns"])
+
+    def _sdc_package_checksum(self, sdc_package_file: Path) -> str:
+        """Return the SHA-256 checksum of the SDC package, computed once per file."""
+        cached = self._stored.sdc_resource
+        if cached.get("path") == str(sdc_package_file) and cached.get("sha256"):
+            return cached["sha256"]
+
+        with self.timer.span("sha256"):
+            checksum = sdc.file_sha256(sdc_package_file)
+        if cached.get("path") == str(sdc_package_file):
+            self._stored.sdc_resource = dict(cached, sha256=checksum)
+        return checksum
+
+    def _invalidate_resource_cache(self):
+        """Fetch the SDC package resource again on its next use."""
+        if self._stored.sdc_resource:
+            self._stored.sdc_resource = dict(self._stored.sdc_resource, stale=True)
+
+    @_memoized_status
+    @timing.timed("resource_status")
     def resource_status(self) -> model.StatusBase:
         """Return the resource status for the Debian package.
 
@@ -111,24 +348,357 @@ class CinderPowerflexCharm(CinderStoragePluginCharm):
 
         return model.BlockedStatus("sdc-deb-package resource is missing")
 
+    @_memoized_status
+    def active_active_status(self) -> model.StatusBase:
+        """Return the status of the active/active configuration.
+
+        :return: ActiveStatus unless active/active is enabled without a
+                 coordination backend.
+        """
+        if self.config.get("active-active") and not self.config.get("coordination-backend-url"):
+            return model.BlockedStatus("active-active requires coordination-backend-url")
+
+        return model.ActiveStatus()
+
+    def _gateway_client(self) -> gateway.PowerFlexGateway:
+        """Return the PowerFlex Gateway client shared by the hook."""
+        if self._gateway is None:
+            cget = self.config.get
+            self._gateway = gateway.PowerFlexGateway(
+                str(cget("powerflexgw-ip") or ""),
+                int(self.config["powerflex-rest-server-port"]),
+                str(cget("powerflexgw-login") or ""),
+                str(cget("powerflexgw-password") or ""),
+                timeout=float(self.config["powerflex-rest-api-connect-timeout"]),
+                verify=bool(cget("powerflexgw-verify-certificate")),
+            )
+        return self._gateway
+
+    @_memoized_status
+    @timing.timed("gateway_status")
+    def gateway_status(self) -> model.StatusBase:
+        """Return the status of the PowerFlex Gateway.
+
+        The gateway is probed with the configured credentials and the result
+        is reused for powerflexgw-probe-ttl seconds.
+
+        :return: ActiveStatus when the gateway accepts the credentials,
+                 BlockedStatus when it is unreachable or rejects them.
+        """
+        cget = self.config.get
+        if not cget("powerflexgw-ip"):
+            # Reported as missing mandatory configuration
+            return model.ActiveStatus()
+
+        target = hashlib.sha256(
+            "{}:{}:{}:{}".format(
+                cget("powerflexgw-ip"),
+                cget("powerflex-rest-server-port"),
+                cget("powerflexgw-login"),
+                cget("powerflexgw-password"),
+            ).encode()
+        ).hexdigest()
+        probe = self._stored.gateway_probe
+        expired = time.time() - probe.get("checked_at", 0) >= cget("powerflexgw-probe-ttl")
+        if expired or probe.get("target") != target:
+            probe = {"target": target, "checked_at": time.time()}
+            try:
+                latency = self._gateway_client().probe(
+                    timeout=float(self.config["powerflexgw-probe-timeout"])
+                )
+                probe["latency_ms"] = round(latency * 1000, 1)
+            except gateway.GatewayError as e:
+                logger.error("PowerFlex Gateway probe failed: %s", e)
+                probe["error"] = str(e)
+            self._stored.gateway_probe = probe
+
+        if "error" in probe:
+            return model.BlockedStatus(
+                "PowerFlex Gateway {} unavailable: {}".format(
+                    cget("powerflexgw-ip"), probe["error"]
+                )
+            )
+
+        return model.ActiveStatus("gateway {}ms".format(probe["latency_ms"]))
+
+    @_memoized_status
+    def image_volume_cache_status(self) -> model.StatusBase:
+        """Return the status of the image-volume cache configuration.
+
+        :return: ActiveStatus unless the image-volume cache is enabled for a
+                 backend without the cinder internal tenant it requires.
+        """
+        requested = [
+            name
+            for name, config in self._backend_sections(self.config)
+            if config.get("image-volume-cache-enabled") and not _image_volume_cache_enabled(config)
+        ]
+        if requested:
+            message = (
+                "image-volume-cache-enabled requires cinder-internal-tenant-project-id "
+                "and cinder-internal-tenant-user-id"
+            )
+            if self._backends(self.config):
+                message += " (backends: {})".format(", ".join(requested))
+            return model.BlockedStatus(message)
+
+        return model.ActiveStatus()
+
+    @_memoized_status
+    def tuning_status(self) -> model.StatusBase:
+        """Return the status of the performance tuning configuration.
+
+        :return: ActiveStatus when the performance profile and overrides are
+                 valid, BlockedStatus otherwise.
+        """
+        for name, resolve in (
+            ("performance-profile", tuning.profile_options),
+            ("performance-overrides", tuning.parse_overrides),
+        ):
+            try:
+                resolve(str(self.config.get(name) or ""))
+            except ValueError as e:
+                return model.BlockedStatus(f"Invalid {name}: {e}")
+
+        return model.ActiveStatus()
+
+    @_memoized_status
+    def backends_status(self) -> model.StatusBase:
+        """Return the status of the backends configuration.
+
+        :return: ActiveStatus when the backends are valid and the MDMs of their
+                 PowerFlex systems were added to the SDC, BlockedStatus otherwise.
+        """
+        try:
+            backends.parse_backends(str(self.config.get("backends") or ""))
+        except ValueError as e:
+            return model.BlockedStatus(f"Invalid backends: {e}")
+
+        errors = self._stored.backend_mdms.get("errors", {})
+        if errors:
+            name = sorted(errors)[0]
+            return model.BlockedStatus(f"Unable to add the MDMs of backend {name}: {errors[name]}")
+
+        return model.ActiveStatus()
+
+    @_memoized_status
+    def qos_tiers_status(self) -> model.StatusBase:
+        """Return the status of the QoS tiers configuration.
+
+        :return: ActiveStatus when the QoS tiers are valid, BlockedStatus otherwise.
+        """
+        try:
+            qos.parse_tiers(str(self.config.get("qos-tiers") or ""))
+        except ValueError as e:
+            return model.BlockedStatus(f"Invalid qos-tiers: {e}")
+
+        return model.ActiveStatus()
+
+    @_memoized_status
+    def replication_status(self) -> model.StatusBase:
+        """Return the status of the replication configuration.
+
+        :return: ActiveStatus when the replication device is valid or unset,
+                 BlockedStatus otherwise.
+        """
+        try:
+            replication.parse_replication_device(
+                str(self.config.get("powerflex-replication-config") or "")
+            )
+        except ValueError as e:
+            return model.BlockedStatus(f"Invalid powerflex-replication-config: {e}")
+
+        return model.ActiveStatus()
+
+    @_memoized_status
+    def sdc_parameters_status(self) -> model.StatusBase:
+        """Return the status of the scini kernel module parameters.
+
+        :return: ActiveStatus listing the applied parameters and those waiting
+                 for a module reload, BlockedStatus when they are invalid.
+        """
+        try:
+            sdc.parse_module_parameters(str(self.config.get("sdc-module-parameters") or ""))
+        except ValueError as e:
+            return model.BlockedStatus(f"Invalid sdc-module-parameters: {e}")
+
+        details = []
+        applied = self._stored.sdc_parameters.get("applied")
+        if applied:
+            details.append(
+                "scini {}".format(" ".join(f"{k}={v}" for k, v in sorted(applied.items())))
+            )
+        pending = self._stored.sdc_parameters.get("pending")
+        if pending:
+            details.append("reload-sdc pending for {}".format(", ".join(pending)))
+
+        return model.ActiveStatus("; ".join(details))
+
+    @_memoized_status
+    def sdc_profile_status(self) -> model.StatusBase:
+        """Return the status of the SDC performance profile.
+
+        :return: ActiveStatus, describing why the profile is not applied yet
+                 if so, BlockedStatus when the profile is unknown.
+        """
+        profile = self.config.get("sdc-performance-profile")
+        if not profile:
+            return model.ActiveStatus()
+        if profile not in gateway.SDC_PERFORMANCE_PROFILES:
+            return model.BlockedStatus(
+                "Invalid sdc-performance-profile: {}, expected one of {}".format(
+                    profile, ", ".join(gateway.SDC_PERFORMANCE_PROFILES)
+                )
+            )
+
+        error = self._stored.sdc_profile.get("error")
+        if error:
+            return model.ActiveStatus(f"SDC profile {profile} not applied: {error}")
+        return model.ActiveStatus()
+
+    @_memoized_status
+    def mdm_status(self) -> model.StatusBase:
+        """Return the status of the MDMs probed before the SDC installation.
+
+        :return: ActiveStatus, listing the unreachable MDMs if any,
+                 BlockedStatus when none of the MDMs could be reached.
+        """
+        unreachable = list(self._stored.mdm_unreachable)
+        if not unreachable:
+            return model.ActiveStatus()
+
+        configured = sdc.split_mdm_ips(str(self.config.get("powerflex-sdc-mdm-ips") or ""))
+        if set(configured) <= set(unreachable):
+            return model.BlockedStatus("No MDM reachable: {}".format(", ".join(unreachable)))
+
+        return model.ActiveStatus("MDM unreachable: {}".format(", ".join(unreachable)))
+
+    def update_status(self, *args, **kwargs):
+        """Update the unit status, reporting the status check details when active."""
+        self._status_results = {}
+        try:
+            super().update_status(*args, **kwargs)
+            if not isinstance(self.unit.status, model.ActiveStatus):
+                return
+
+            # Status checks may describe an active state, e.g. the gateway latency
+            details = []
+            for check in (
+                self.gateway_status,
+                self.mdm_status,
+                self.sdc_parameters_status,
+                self.sdc_profile_status,
+            ):
+                status = check()
+                if isinstance(status, model.ActiveStatus) and status.message:
+                    details.append(status.message)
+            if details:
+                self.unit.status = model.ActiveStatus(
+                    "{} ({})".format(self.unit.status.message, ", ".join(details))
+                )
+        finally:
+            self._status_results = None
+
+    @_memoized_status
+    @timing.timed("install_status")
     def install_status(self):
         """Return the status for the deb installation.
 
         :return: ActiveStatus when the installation of the Debian file is successful,
+                 MaintenanceStatus until a background installation is collected,
                  BlockedStatus when the installation failed.
         """
-        if self._stored.installed:
-            return model.ActiveStatus()
+        if self._stored.sdc_install_pending:
+            return model.MaintenanceStatus("SDC Debian package installation in progress")
+
+        state = self._sdc_dpkg_state()
+        if state is None:
+            # The SDC package name is not known yet, trust the charm flags
+            if self._stored.installed:
+                return model.ActiveStatus()
+            if self._stored.install_failed:
+                return model.BlockedStatus("SDC Debian package failed to install")
+            return model.BlockedStatus("SDC Debian package is not installed")
 
-        # TODO: This should really be checked by examining the dpkg install state
-        if self._stored.install_failed:
+        status = state.get("status")
+        if status is None:
+            return model.BlockedStatus("SDC Debian package is not installed")
+        if status != "installed":
+            return model.BlockedStatus(f"SDC Debian package is {status}")
+        # A failed upgrade leaves the previous package installed, the failure
+        # stands until the package state changes, e.g. it is fixed by hand
+        if self._stored.install_failed and state.get("failed"):
             return model.BlockedStatus("SDC Debian package failed to install")
 
-        return model.BlockedStatus("SDC Debian package is not installed")
+        return model.ActiveStatus()
+
+    def _sdc_dpkg_state(self) -> Optional[dict]:
+        """Return the state of the SDC package read from the dpkg database.
+
+        The dpkg status file is parsed again only when it changed since the
+        last call, which makes the check cheap enough for every hook.
+
+        :return: the package status and version (both None when it is not
+                 installed), or None when the package name is unknown or
+                 the dpkg database cannot be read
+        """
+        name = self._stored.sdc_package_name
+        if not name:
+            return None
+        try:
+            st = sdc.DPKG_STATUS.stat()
+        except OSError as e:
+            logger.warning("Unable to read the dpkg database: %s", e)
+            return None
+
+        signature = [st.st_size, st.st_mtime_ns]
+        cached = dict(self._stored.dpkg_state)
+        if cached.get("signature") == signature and cached.get("name") == name:
+            return cached
+
+        try:
+            package = sdc.dpkg_status(name)
+        except OSError as e:
+            logger.warning("Unable to read the dpkg database: %s", e)
+            return None
+        status, version = package or (None, None)
+        state = {"signature": signature, "name": name, "status": status, "version": version}
+        # The recorded failure belongs to the dpkg state it was recorded with
+        if cached.get("failed") and cached.get("signature") == signature:
+            state["failed"] = True
+        self._stored.dpkg_state = state
+        return state
+
+    def _record_sdc_install_outcome(self, failed: bool):
+        """Tie the outcome of a charm installation to the current dpkg state."""
+        state = self._sdc_dpkg_state()
+        if state is not None:
+            state["failed"] = failed
+            self._stored.dpkg_state = state
+
+    @_memoized_status
+    def upgrade_status(self) -> model.StatusBase:
+        """Return the status of the rolling SDC upgrade of this unit.
+
+        :return: WaitingStatus while the unit waits for an upgrade slot or for
+                 the health gate, MaintenanceStatus while it upgrades,
+                 ActiveStatus otherwise.
+        """
+        state = self._stored.sdc_upgrade.get("state")
+        if state == rolling.WAITING:
+            return model.WaitingStatus("SDC upgrade waiting for a rolling upgrade slot")
+        if state == rolling.UPGRADING:
+            return model.MaintenanceStatus("SDC upgrade in progress")
+        if state == rolling.VERIFYING:
+            return model.WaitingStatus("SDC upgrade waiting for scini and the mapped volumes")
+
+        return model.ActiveStatus()
 
     def cinder_configuration(self, charm_config) -> Iterable[tuple[str, Union[str, int, bool]]]:
         """Return the configuration to be set by Cinder."""
         cget = charm_config.get
+        device = _replication_device(charm_config)
+        replication_device = replication.format_replication_device(device) if device else None
 
         raw_options = [
             ("volume_driver", VOLUME_DRIVER),
@@ -151,83 +721,1197 @@ class CinderPowerflexCharm(CinderStoragePluginCharm):
             ("powerflex_round_volume_capacity", cget("powerflex-round-volume-capacity")),
             ("rest_api_connect_timeout", cget("powerflex-rest-api-connect-timeout")),
             ("rest_api_read_timeout", cget("powerflex-rest-api-read-timeout")),
-            ("replication_device", cget("powerflex-replication-config")),
+            ("replication_device", replication_device),
         ]
 
         options = [(x, y) for x, y in raw_options if y is not None or ""]
+
+        # Options of the performance profile and overrides replace the
+        # options set above, the remaining ones are appended
+        tuned = self._tuning_options(charm_config)
+        options = [(x, tuned.pop(x, y)) for x, y in options]
+        options.extend(tuned.items())
+
+        if _image_volume_cache_enabled(charm_config):
+            options.extend(
+                [
+                    ("image_volume_cache_enabled", True),
+                    ("image_volume_cache_max_size_gb", cget("image-volume-cache-max-size-gb")),
+                    ("image_volume_cache_max_count", cget("image-volume-cache-max-count")),
+                ]
+            )
         return options
 
+    def _tuning_options(self, charm_config) -> dict[str, Union[str, int, bool]]:
+        """Return the backend options of the performance profile and overrides.
+
+        Invalid settings are ignored here and reported by tuning_status().
+        """
+        options = {}
+        for name, resolve in (
+            ("performance-profile", tuning.profile_options),
+            ("performance-overrides", tuning.parse_overrides),
+        ):
+            try:
+                options.update(resolve(charm_config.get(name)))
+            except ValueError as e:
+                logger.error("Ignoring invalid %s: %s", name, e)
+        return options
+
+    def _backend_sections(self, charm_config) -> list[tuple[str, dict]]:
+        """Return the cinder.conf section name and charm options of each backend."""
+        configured = self._backends(charm_config)
+        if not configured:
+            return [(self.app.name, dict(charm_config))]
+        return [
+            (backend["name"], backends.backend_config(charm_config, backend))
+            for backend in configured
+        ]
+
+    def _backends(self, charm_config) -> list[dict]:
+        """Return the backends set by the backends option.
+
+        Invalid backends are ignored here and reported by backends_status(),
+        the backend defined by the charm options is used instead.
+        """
+        try:
+            return backends.parse_backends(charm_config.get("backends"))
+        except ValueError as e:
+            logger.error("Ignoring invalid backends: %s", e)
+            return []
+
+    def cinder_sections(self, charm_config) -> dict[str, list[tuple[str, str]]]:
+        """Return the cinder.conf sections set besides the backend section.
+
+        :return: the options keyed by cinder.conf section name
+        """
+        cget = charm_config.get
+        sections = {}
+        if self.active_active:
+            cluster = cget("cluster-name") or cget("volume-backend-name") or self.app.name
+            sections.setdefault("DEFAULT", []).append(("cluster", cluster))
+            sections["coordination"] = [("backend_url", cget("coordination-backend-url"))]
+
+        if any(
+            _image_volume_cache_enabled(config)
+            for _, config in self._backend_sections(charm_config)
+        ):
+            # Image-volume cache entries are owned by the cinder internal tenant
+            sections.setdefault("DEFAULT", []).extend(
+                [
+                    (
+                        "cinder_internal_tenant_project_id",
+                        cget("cinder-internal-tenant-project-id"),
+                    ),
+                    ("cinder_internal_tenant_user_id", cget("cinder-internal-tenant-user-id")),
+                ]
+            )
+
+        return sections
+
+    @timing.timed("on_install")
     def on_install(self, event):
         """Handle install event by rendering config files and installing packages."""
+        self._invalidate_resource_cache()
         super().on_install(event)
         self.create_connector()
         self.install_sdc()
         self.update_status()
 
+    def _on_commit(self, event):
+        """Persist the timings collected during this hook."""
+        self.timer.flush()
+        if self.model.relations.get(METRICS_RELATION):
+            self._write_metrics_state()
+
+    def _write_metrics_state(self):
+        """Write the charm state read by the metrics exporter."""
+        state = {
+            "installed": self._stored.installed,
+            "install_failed": self._stored.install_failed,
+            # The stored flag is reset on every dispatch, ask systemd instead
+            "is_started": service_running("scini"),
+            "gateway_probe": dict(self._stored.gateway_probe),
+        }
+        try:
+            sdc.write_file_atomic(
+                self._state_dir / METRICS_STATE_FILE, json.dumps(state, sort_keys=True)
+            )
+        except OSError as e:
+            logger.warning("Unable to write the metrics state: %s", e)
+
+    def _on_metrics_endpoint_changed(self, event):
+        """Start the metrics exporter and publish its scrape job."""
+        self.configure_exporter()
+        self.update_status()
+
+    def _on_metrics_endpoint_broken(self, event):
+        """Stop the metrics exporter once the last metrics-endpoint relation is gone."""
+        self.configure_exporter(broken=event.relation)
+        self.update_status()
+
+    def configure_exporter(self, broken: Optional[model.Relation] = None):
+        """Run the metrics exporter while a metrics-endpoint relation exists.
+
+        :param broken: a relation being removed, which is not counted
+        """
+        exporter = self._exporter_service
+        unit_file = Path(SYSTEMD_DIR) / f"{exporter}.service"
+        relations = [r for r in self.model.relations.get(METRICS_RELATION, []) if r != broken]
+        if not relations:
+            if unit_file.exists():
+                logger.info("Removing the %s service", exporter)
+                ch_core.host.service_stop(exporter)
+                if not ch_core.host.service("disable", exporter):
+                    logger.warning("Unable to disable the %s service", exporter)
+                unit_file.unlink()
+                subprocess.run(["systemctl", "daemon-reload"], check=False)
+            return
+
+        self._write_metrics_state()
+        content = render(
+            source="exporter.service",
+            target=None,
+            context={
+                "application": self.app.name,
+                "exporter": self.charm_dir / "src" / "exporter.py",
+                "state_dir": self._state_dir,
+                "port": self.config["metrics-port"],
+                "cache_ttl": self.config["metrics-cache-ttl"],
+            },
+        )
+        if sdc.write_file_atomic(unit_file, content):
+            logger.info("Updated %s, restarting the exporter", unit_file)
+            subprocess.run(["systemctl", "daemon-reload"], check=False)
+            if not ch_core.host.service("enable", exporter):
+                logger.warning("Unable to enable the %s service at boot", exporter)
+            service_restart(exporter)
+        elif not service_running(exporter):
+            service_restart(exporter)
+
+        for relation in relations:
+            self._publish_scrape_job(relation)
+
+    def _publish_scrape_job(self, relation: model.Relation):
+        """Publish the exporter address and scrape job on a metrics-endpoint relation."""
+        binding = self.model.get_binding(relation)
+        if binding is not None and binding.network.ingress_address is not None:
+            relation.data[self.unit].update(
+                {
+                    "prometheus_scrape_unit_address": str(binding.network.ingress_address),
+                    "prometheus_scrape_unit_name": self.unit.name,
+                }
+            )
+
+        if not self.unit.is_leader():
+            return
+        relation.data[self.app].update(
+            {
+                "scrape_metadata": json.dumps(
+                    {
+                        "model": self.model.name,
+                        "model_uuid": self.model.uuid,
+                        "application": self.app.name,
+                        "charm_name": self.meta.name,
+                    }
+                ),
+                "scrape_jobs": json.dumps(
+                    [
+                        {
+                            "metrics_path": "/metrics",
+                            "static_configs": [{"targets": [f"*:{self.config['metrics-port']}"]}],
+                        }
+                    ]
+                ),
+            }
+        )
+
+    def _on_timing_report_action(self, event):
+        """Report the p50/p95/max duration of each recorded hook phase."""
+        summary = timing.summarize(timing.load(self._timings_file))
+        if not summary:
+            event.set_results({"message": "No hook timings have been recorded yet"})
+            return
+
+        # Action result keys only allow lowercase letters, digits and hyphens
+        event.set_results(
+            {
+                phase.replace("_", "-"): {
+                    "count": stats["count"],
+                    "p50-ms": stats["p50"],
+                    "p95-ms": stats["p95"],
+                    "max-ms": stats["max"],
+                }
+                for phase, stats in summary.items()
+            }
+        )
+
+    def _on_benchmark_backend_action(self, event):
+        """Measure the IOPS and latency of a PowerFlex volume, loop device or file."""
+        params = event.params
+        target = Path(params["target"])
+        try:
+            workload = iobench.Workload(
+                block_size=iobench.parse_size(params["block-size"]),
+                queue_depth=params["queue-depth"],
+                read_percent=params["read-percent"],
+                duration=params["duration"],
+            )
+            iobench.validate(workload)
+            size = iobench.parse_size(params["size"])
+        except ValueError as e:
+            event.fail(f"Invalid workload: {e}")
+            return
+
+        exists = iobench.is_block_device(target) or target.exists()
+        if exists and not (iobench.is_block_device(target) or target.is_file()):
+            event.fail(f"{target} is neither a block device nor a file")
+            return
+        if exists and workload.read_percent < 100 and not params["i-really-mean-it"]:
+            event.fail(
+                f"The workload overwrites the data of {target}, "
+                "run it again with i-really-mean-it=true to confirm"
+            )
+            return
+
+        engine = iobench.default_engine()
+        logger.info("Running %s against %s with %s", workload, target, engine)
+        try:
+            if not exists:
+                event.log(f"Creating the {size} bytes scratch file {target}")
+                iobench.create_scratch_file(target, size)
+            event.log(f"Running the workload with {engine} for {workload.duration} seconds")
+            results = iobench.run(target, workload, direct=params["direct"], engine=engine)
+        except (OSError, ValueError) as e:
+            event.fail(f"Benchmark of {target} failed: {e}")
+            return
+        finally:
+            if not exists:
+                target.unlink(missing_ok=True)
+
+        event.set_results(
+            {
+                "target": str(target),
+                "block-size": workload.block_size,
+                "queue-depth": workload.queue_depth,
+                "read-percent": workload.read_percent,
+                "duration": workload.duration,
+                "engine": engine,
+                **results,
+            }
+        )
+
+    def _on_sdc_stats_action(self, event):
+        """Report the MDM connections and the I/O rates of the mapped volumes."""
+        interval = event.params["interval"]
+        if not 0 < interval <= 60:
+            event.fail("interval must be between 1 and 60 seconds")
+            return
+
+        try:
+            collected = sdc_stats.collect(interval)
+        except OSError as e:
+            event.fail(f"Unable to query the SDC: {e}")
+            return
+
+        total = {}
+        for stats in collected["stats"].values():
+            for key in ("read-iops", "write-iops", "read-kib-s", "write-kib-s"):
+                total[key] = round(total.get(key, 0) + stats[key], 1)
+
+        event.set_results(
+            {
+                "interval": interval,
+                "mdms": "; ".join(
+                    f"{mdm.mdm_id} (sdc {mdm.sdc_id}): {', '.join(mdm.ips)}"
+                    for mdm in collected["mdms"]
+                )
+                or "none",
+                "mapped-volumes": len(collected["volumes"]),
+                "volumes": collected["stats"],
+                "total": total,
+            }
+        )
+
+    def _volume_backend_names(self, charm_config) -> list[str]:
+        """Return the volume backend names of the backends published to cinder."""
+        configured = self._backends(charm_config)
+        if not configured:
+            return [charm_config.get("volume-backend-name") or self.app.name]
+        return sorted(
+            {
+                backends.backend_config(charm_config, backend)["volume-backend-name"]
+                for backend in configured
+            }
+        )
+
+    def _openstack_credentials(self) -> Tuple[str, str]:
+        """Return the username and password of the openstack-credentials-secret.
+
+        :raises ValueError: if the secret is not set, not readable or incomplete
+        """
+        secret_id = self.config.get("openstack-credentials-secret")
+        if not secret_id:
+            raise ValueError("openstack-credentials-secret is not set")
+        try:
+            content = self.model.get_secret(id=str(secret_id)).get_content(refresh=True)
+        except model.ModelError as e:
+            raise ValueError(f"unable to read openstack-credentials-secret: {e}") from e
+        missing = [key for key in ("username", "password") if not content.get(key)]
+        if missing:
+            raise ValueError("openstack-credentials-secret has no {}".format(", ".join(missing)))
+        return content["username"], content["password"]
+
+    def _cinder_client(self, params: dict) -> cinder_client.CinderClient:
+        """Return a Cinder API client authenticated with the openstack-credentials-secret.
+
+        :raises ValueError: if the credentials cannot be read
+        """
+        username, password = self._openstack_credentials()
+        return cinder_client.CinderClient(
+            params["auth-url"],
+            username,
+            password,
+            params["project-name"],
+            user_domain_name=params["user-domain-name"],
+            project_domain_name=params["project-domain-name"],
+            region_name=params.get("region-name") or None,
+            interface=params["interface"],
+            insecure=params["insecure"],
+        )
+
+    def _on_apply_qos_tiers_action(self, event):
+        """Create or update the QoS specs and volume types of the qos-tiers."""
+        try:
+            tiers = qos.parse_tiers(str(self.config.get("qos-tiers") or ""))
+        except ValueError as e:
+            event.fail(f"Invalid qos-tiers: {e}")
+            return
+        if not tiers:
+            event.fail("qos-tiers is not set")
+            return
+
+        try:
+            client = self._cinder_client(event.params)
+        except ValueError as e:
+            event.fail(f"Unable to read the OpenStack credentials: {e}")
+            return
+        dry_run = event.params["dry-run"]
+        try:
+            with self.timer.span("apply_qos_tiers"):
+                operations = qos.sync(
+                    client, tiers, self._volume_backend_names(self.config), dry_run=dry_run
+                )
+        except cinder_client.OpenStackError as e:
+            event.fail(f"Unable to apply the QoS tiers: {e}")
+            return
+
+        for operation in operations:
+            logger.info("QoS tiers: %s%s", "would " if dry_run else "", operation.describe())
+        event.set_results(
+            {
+                "dry-run": dry_run,
+                "changes": len(operations),
+                "operations": "\n".join(operation.describe() for operation in operations)
+                or "none",
+            }
+        )
+
+    def _replicated_backends(
+        self, charm_config
+    ) -> list[tuple[str, dict, replication.ReplicationDevice]]:
+        """Return the backends with a valid replication device.
+
+        :return: the section name, charm options and replication device of each
+        """
+        replicated = []
+        for name, section_config in self._backend_sections(charm_config):
+            device = _replication_device(section_config)
+            if device:
+                replicated.append((name, section_config, device))
+        return replicated
+
+    @staticmethod
+    def _replication_targets(services: list[dict], names: Iterable[str]) -> dict:
+        """Return the cinder-volume services of the backends.
+
+        :param services: the cinder-volume services
+        :param names: the cinder.conf section names of the backends
+        :return: the services keyed by backend section name
+        """
+        targets = {name: [] for name in names}
+        for service in services:
+            # host@backend, with #pool for the pools of some drivers
+            backend = service.get("host", "").partition("@")[2].partition("#")[0]
+            if backend in targets:
+                targets[backend].append(service)
+        return targets
+
+    @contextlib.contextmanager
+    def _phase(self, phases: dict, action: str, phase: str):
+        """Time a phase of a replication switch, in the results and the hook timings."""
+        start = time.monotonic()
+        try:
+            with self.timer.span(f"{action}_{phase}"):
+                yield
+        finally:
+            phases[f"{phase}-ms"] = round((time.monotonic() - start) * 1000, 1)
+
+    def _on_failover_action(self, event):
+        """Fail the replicated backends over to their replication targets."""
+        self._switch_replication(event, failback=False)
+
+    def _on_failback_action(self, event):
+        """Fail the replicated backends back to their primary systems."""
+        self._switch_replication(event, failback=True)
+
+    def _replication_preflight(self, client, replicated, failback: bool):
+        """Run the preflight checks of a replication switch concurrently.
+
+        Failing over only requires the replication targets, as the primary
+        systems may be the ones lost, while failing back requires both.
+
+        :return: the outcome of each check, the names of the required checks
+                 and the services of each backend found by the cinder check
+        """
+        found = {}
+
+        def find_services() -> str:
+            targets = self._replication_targets(
+                client.volume_services(), [name for name, _, _ in replicated]
+            )
+            missing = sorted(name for name, services in targets.items() if not services)
+            if missing:
+                raise ValueError("no cinder-volume service for {}".format(", ".join(missing)))
+            found.update(targets)
+            return "{} services".format(sum(len(services) for services in targets.values()))
+
+        def probe(
+            host: str, port: int, login: str, password: str, timeout: float, verify: bool
+        ) -> str:
+            client = gateway.PowerFlexGateway(
+                host, port, login, password, timeout=timeout, verify=verify
+            )
+            try:
+                return "API latency {:.0f}ms".format(client.probe() * 1000)
+            finally:
+                client.close()
+
+        checks = {"cinder": find_services}
+        required = {"cinder"}
+        for name, config, device in replicated:
+            port = config.get("powerflex-rest-server-port")
+            timeout = config.get("powerflex-rest-api-connect-timeout")
+            verify = bool(config.get("powerflexgw-verify-certificate"))
+            replica = f"{name} replica gateway {device.san_ip}"
+            checks[replica] = functools.partial(
+                probe, device.san_ip, port, device.san_login, device.san_password, timeout, verify
+            )
+            required.add(replica)
+            primary = "{} primary gateway {}".format(name, config.get("powerflexgw-ip"))
+            checks[primary] = functools.partial(
+                probe,
+                config.get("powerflexgw-ip"),
+                port,
+                config.get("powerflexgw-login"),
+                config.get("powerflexgw-password"),
+                timeout,
+                verify,
+            )
+            if failback:
+                required.add(primary)
+
+        return replication.run_checks(checks), required, found
+
+    @staticmethod
+    def _fail_over_services(client, services: list[dict], backend_id: str):
+        """Ask cinder to switch the backend of services to backend_id."""
+        # The services of a cluster fail over together
+        clusters: set[str] = {service["cluster"] for service in services if service.get("cluster")}
+        for cluster in sorted(clusters):
+            logger.info("Failing cluster %s over to %s", cluster, backend_id)
+            client.failover(backend_id, cluster=cluster)
+        for service in services:
+            if not service.get("cluster"):
+                logger.info("Failing %s over to %s", service["host"], backend_id)
+                client.failover(backend_id, host=service["host"])
+
+    def _switch_replication(self, event, failback: bool):
+        """Check the gateways and cinder, switch the replicated backends and wait for cinder.
+
+        :param event: the failover or failback action event
+        :param failback: whether the backends fail back to their primary systems
+        """
+        action = "failback" if failback else "failover"
+        replicated = self._replicated_backends(self.config)
+        if not replicated:
+            event.fail("No backend has a valid powerflex-replication-config")
+            return
+
+        try:
+            client = self._cinder_client(event.params)
+        except ValueError as e:
+            event.fail(f"Unable to read the OpenStack credentials: {e}")
+            return
+        phases = {}
+        results = {"backends": ", ".join(name for name, _, _ in replicated), "phases": phases}
+        started = time.monotonic()
+
+        with self._phase(phases, action, "preflight"):
+            checks, required, targets = self._replication_preflight(client, replicated, failback)
+        results["preflight"] = "; ".join(
+            "{}: {} ({}, {:.0f}ms)".format(
+                name, "ok" if check.ok else "failed", check.detail, check.seconds * 1000
+            )
+            for name, check in checks.items()
+        )
+        failed = [name for name in checks if name in required and not checks[name].ok]
+        if failed or event.params["dry-run"]:
+            phases["total-ms"] = round((time.monotonic() - started) * 1000, 1)
+            event.set_results(results)
+            if failed:
+                event.fail("Preflight checks failed: {}".format(", ".join(failed)))
+            return
+
+        expected = replication.ENABLED if failback else replication.FAILED_OVER
+        try:
+            with self._phase(phases, action, "switch"):
+                for name, _, device in replicated:
+                    backend_id = replication.DEFAULT_BACKEND_ID if failback else device.backend_id
+                    self._fail_over_services(client, targets[name], backend_id)
+
+            def switched() -> bool:
+                current = self._replication_targets(client.volume_services(), targets)
+                results["services"] = "; ".join(
+                    "{}: {}".format(service["host"], service.get("replication_status"))
+                    for services in current.values()
+                    for service in services
+                )
+                return all(
+                    service.get("replication_status") == expected
+                    for services in current.values()
+                    for service in services
+                )
+
+            with self._phase(phases, action, "verify"):
+                done = replication.wait_for(
+                    switched, event.params["timeout"], FAILOVER_POLL_INTERVAL
+                )
+        except cinder_client.OpenStackError as e:
+            phases["total-ms"] = round((time.monotonic() - started) * 1000, 1)
+            event.set_results(results)
+            event.fail(f"Unable to {action}: {e}")
+            return
+
+        phases["total-ms"] = round((time.monotonic() - started) * 1000, 1)
+        event.set_results(results)
+        if not done:
+            event.fail(f"The cinder-volume services are not {expected} yet")
+
+    def _on_config_changed(self, event):
+        """Handle config-changed event by updating connector.conf and the SDC parameters."""
+        self.create_connector()
+        self.configure_sdc_parameters()
+        self.configure_backend_mdms()
+        self.apply_sdc_performance_profile()
+        self.configure_exporter()
+        # Probes the MDMs when their configuration changed
+        self._order_mdm_ips()
+        self.update_status()
+
+    def _host_addresses(self) -> list[str]:
+        """Return the IP addresses of the host the SDC runs on."""
+        try:
+            binding = self.model.get_binding("juju-info")
+            network = binding.network if binding is not None else None
+        except model.ModelError as e:
+            logger.warning("Unable to read the host addresses: %s", e)
+            network = None
+        if network is None:
+            return []
+        addresses = {str(address) for address in network.ingress_addresses}
+        addresses.update(
+            str(interface.address) for interface in network.interfaces if interface.address
+        )
+        return sorted(addresses)
+
+    def _sdc_guid(self) -> Optional[str]:
+        """Return the GUID of the SDC, None when it cannot be queried."""
+        try:
+            return sdc_stats.parse_query_guid(sdc_stats.query_drv_cfg("--query_guid"))
+        except OSError as e:
+            logger.warning("Unable to query the SDC GUID: %s", e)
+            return None
+
+    def apply_sdc_performance_profile(self):
+        """Apply the configured performance profile to the SDC of this host.
+
+        The SDC is looked up through the PowerFlex Gateway by its GUID, or by
+        the host IP addresses, and the profile is read back once set. The
+        outcome is recorded so that the gateway is only called again when
+        the profile changes or could not be applied.
+        """
+        profile = self.config.get("sdc-performance-profile")
+        if (
+            not profile
+            or profile not in gateway.SDC_PERFORMANCE_PROFILES
+            or not self._stored.installed
+        ):
+            self._stored.sdc_profile = {}
+            return
+
+        applied = self._stored.sdc_profile
+        if applied.get("profile") == profile and not applied.get("error"):
+            return
+
+        try:
+            client = self._gateway_client()
+            with self.timer.span("sdc_profile"):
+                found = client.find_sdc(self._sdc_guid(), self._host_addresses())
+                if found is None:
+                    raise gateway.GatewayError("the SDC is not registered with the cluster")
+                if found.get("perfProfile") != profile:
+                    logger.info(
+                        "Changing the performance profile of SDC %s from %s to %s",
+                        found["id"],
+                        found.get("perfProfile"),
+                        profile,
+                    )
+                    client.set_sdc_performance_profile(found["id"], profile)
+                    found = client.get_sdc(found["id"])
+                    if found.get("perfProfile") != profile:
+                        raise gateway.GatewayError(
+                            "the profile is still {}".format(found.get("perfProfile"))
+                        )
+        except gateway.GatewayError as e:
+            logger.warning("Unable to apply the SDC performance profile %s: %s", profile, e)
+            self._stored.sdc_profile = {"profile": profile, "error": str(e)}
+            return
+
+        logger.info("SDC %s runs with the %s performance profile", found["id"], profile)
+        self._stored.sdc_profile = {"profile": profile, "sdc_id": found["id"]}
+
+    def _on_update_status_probe_mdms(self, event):
+        """Probe the MDMs again, refreshing their order and the unreachable ones."""
+        self._probe_mdm_order()
+
+    def _on_update_status_collect_install(self, event):
+        """Collect the outcome of a background SDC package installation once it ended."""
+        if self._stored.sdc_install_pending and self._collect_background_install():
+            self.update_status()
+
+    def _on_update_status_retry_profile(self, event):
+        """Retry applying the SDC performance profile, e.g. once the SDC registered."""
+        if self._stored.sdc_profile.get("error"):
+            self.apply_sdc_performance_profile()
+            self.update_status()
+
+    def _on_reload_sdc_action(self, event):
+        """Restart the scini service so that every module parameter takes effect."""
+        try:
+            sdc.parse_module_parameters(str(self.config.get("sdc-module-parameters") or ""))
+        except ValueError as e:
+            event.fail(f"Invalid sdc-module-parameters: {e}")
+            return
+
+        logger.info("Restarting the scini service")
+        with self.timer.span("reload_sdc"):
+            service_restart("scini")
+        if not service_running("scini"):
+            self._stored.is_started = False
+            event.fail("The scini service is not running after the restart")
+            return
+
+        self._stored.is_started = True
+        self.configure_sdc_parameters()
+        # Nothing is applied to the module before the SDC is installed
+        applied = self._stored.sdc_parameters.get("applied", {})
+        pending = self._stored.sdc_parameters.get("pending", [])
+        event.set_results(
+            {
+                "applied": " ".join(f"{k}={v}" for k, v in sorted(applied.items())),
+                "pending": ", ".join(pending),
+            }
+        )
+        self.update_status()
+
+    def configure_sdc_parameters(self):
+        """Persist the scini kernel module parameters and apply them at runtime.
+
+        The parameters are written to the scini modprobe.d configuration so
+        they are used whenever the module is loaded. Those the loaded module
+        does not allow changing at runtime are reported as pending until the
+        module is reloaded with the reload-sdc action.
+        """
+        try:
+            parameters = sdc.parse_module_parameters(
+                str(self.config.get("sdc-module-parameters") or "")
+            )
+        except ValueError as e:
+            logger.error("Ignoring invalid sdc-module-parameters: %s", e)
+            return
+
+        content = sdc.render_modprobe_conf(parameters)
+        if content:
+            sdc.write_file_atomic(sdc.SCINI_MODPROBE_CONF, content)
+        else:
+            sdc.SCINI_MODPROBE_CONF.unlink(missing_ok=True)
+
+        if not self._stored.installed:
+            # Applied when the SDC installation loads the module
+            self._stored.sdc_parameters = {}
+            return
+
+        applied, pending = sdc.apply_module_parameters(parameters)
+        if pending:
+            logger.warning("scini parameters %s require a module reload", ", ".join(pending))
+        self._stored.sdc_parameters = {"applied": applied, "pending": pending}
+
+    def configure_backend_mdms(self):
+        """Add the MDMs of the backends on other PowerFlex systems to the SDC.
+
+        The SDC is installed against powerflex-sdc-mdm-ips, the volumes of a
+        backend setting other MDM IPs can only be mapped once the SDC knows
+        the MDMs of its system. MDMs are never removed from the SDC.
+        """
+        errors = {}
+        wanted = {
+            backend["name"]: sdc.split_mdm_ips(backend["powerflex-sdc-mdm-ips"])
+            for backend in self._backends(self.config)
+            if backend.get("powerflex-sdc-mdm-ips")
+        }
+        if wanted and self._stored.installed:
+            try:
+                output = sdc_stats.query_drv_cfg("--query_mdms")
+            except OSError as e:
+                logger.error("Unable to query the MDMs of the SDC: %s", e)
+                errors = {name: str(e) for name in wanted}
+            else:
+                known = {ip for mdm in sdc_stats.parse_query_mdms(output) for ip in mdm.ips}
+                for name, mdm_ips in wanted.items():
+                    if known.intersection(mdm_ips):
+                        continue
+                    logger.info("Adding the MDMs %s of backend %s", ",".join(mdm_ips), name)
+                    try:
+                        sdc_stats.add_mdm(mdm_ips)
+                    except OSError as e:
+                        logger.error("Unable to add the MDMs of backend %s: %s", name, e)
+                        errors[name] = str(e)
+                    else:
+                        known.update(mdm_ips)
+        self._stored.backend_mdms = {"errors": errors}
+
+    def _on_upgrade_charm(self, event):
+        """Handle upgrade-charm event by installing a newly attached SDC package."""
+        self._invalidate_resource_cache()
+        self.install_sdc()
+        self.configure_exporter()
+        self.update_status()
+
+    @timing.timed("create_connector")
     def create_connector(self):
         """Create the connector.conf file and populate with data."""
         config = dict(self.framework.model.config)
-        powerflex_backend = dict(self.cinder_configuration(config))
-        powerflex_config = {"cinder_name": self.framework.model.app.name}
-        # Get cinder config stanza name.
+        # One connector section for each cinder backend section
+        sections = self._backend_sections(config)
         filename = os.path.join(CONNECTOR_DIR, CONNECTOR_FILE)
         ch_core.host.mkdir(CONNECTOR_DIR)
 
-        filter_params = ["san_password"]
-
-        # If replication is enabled, add the filter to the filter_params list
-        if "replication_device" in powerflex_backend:
-            filter_params.append("replication_device")
-
-        for param in filter_params:
-            if param in powerflex_backend:
-                if param == "replication_device":
-                    # Extract the password from the content
-                    # 'backendid:acme,san_ip:10.20.30.41,san_login:admin,san_password:password'
-                    powerflex_config["rep_san_password"] = (
-                        powerflex_backend["replication_device"].split(",")[3].split(":")[1]
-                    )
-                else:
-                    powerflex_config[param] = powerflex_backend[param]
+        connector_config = [
+            self._connector_section(name, dict(self.cinder_configuration(section_config)))
+            for name, section_config in sections
+        ]
 
         # Render the templates/connector.conf and create the
         # /opt/emc/scaleio/openstack/connector.conf with root access only
-        logger.debug("Rendering connector.conf template with config {}".format(powerflex_config))
-        render(
-            source="connector.conf",
-            target=filename,
-            context={"backends": powerflex_config},
-            perms=0o600,
+        logger.debug(
+            "Rendering connector.conf template for backends %s",
+            ", ".join(section["cinder_name"] for section in connector_config),
         )
+        with self.timer.span("render"):
+            content = render(
+                source="connector.conf",
+                target=None,
+                context={"backends": connector_config},
+            )
+        # The file is replaced atomically, and only when its content changes,
+        # so that readers never see a partially written file
+        if sdc.write_file_atomic(Path(filename), content, perms=0o600):
+            logger.info("Updated %s", filename)
+
+    @staticmethod
+    def _connector_section(cinder_name: str, powerflex_backend: dict) -> dict:
+        """Return the connector.conf settings of a cinder backend section.
 
+        :param cinder_name: the name of the cinder.conf section of the backend
+        :param powerflex_backend: the cinder options of the backend
+        """
+        powerflex_config = {"cinder_name": cinder_name}
+        if "san_password" in powerflex_backend:
+            powerflex_config["san_password"] = powerflex_backend["san_password"]
+
+        # If replication is enabled, the password of the remote gateway too
+        if "replication_device" in powerflex_backend:
+            device = replication.parse_replication_device(powerflex_backend["replication_device"])
+            if device is not None:
+                powerflex_config["rep_san_password"] = device.san_password
+
+        return powerflex_config
+
+    @timing.timed("install_sdc")
     def install_sdc(self):
         """Install the SDC debian package in order to get access to the PowerFlex volumes."""
+        # The installation changes the outcome of the status checks
+        if self._status_results:
+            self._status_results.clear()
         sdc_package_file = self._get_debian_package_path()
         if not sdc_package_file:
             # Note: the user has not provided the Debian resource
             logger.error("The package required for SDC installation is missing")
             return
 
-        # Get the MDM IP from config file
-        sdc_mdm_ips = self.model.config["powerflex-sdc-mdm-ips"]
+        sdc_package_sha256 = self._sdc_package_checksum(sdc_package_file)
+        # The package name tells which package of the dpkg database is the SDC
+        package = sdc.deb_package_info(sdc_package_file)
+        if package:
+            self._stored.sdc_package_name = package.name
+        if self._sdc_package_installed(package, sdc_package_sha256):
+            self._stored.installed = True
+            self._stored.install_failed = False
+            self._check_sdc_started()
+            return
+
+        if self._rolling_upgrade() and not self._upgrade_granted(sdc_package_sha256):
+            return
+
+        # Get the MDM IP from config file, closest reachable MDM first
+        sdc_mdm_ips = self._order_mdm_ips()
+        if sdc_mdm_ips is None:
+            logger.error("None of the MDMs can be reached, not installing the SDC")
+            self._stored.installed = False
+            self._stored.install_failed = True
+            self._record_sdc_install_outcome(failed=True)
+            return
+
         # Install the SDC package
         install_cmd = ["sudo", f"MDM_IP={sdc_mdm_ips}", "dpkg", "-i", str(sdc_package_file)]
         logger.info("Installing SDC kernel module with MDM(s) %s", sdc_mdm_ips)
-        result = subprocess.run(install_cmd, capture_output=True, text=True)
-        exit_code = result.returncode
+        if self.config.get("sdc-background-install"):
+            # The worker holds the frontend lock, which dpkg must not take again
+            install_cmd.insert(2, "DPKG_FRONTEND_LOCKED=1")
+            self._start_background_install(install_cmd, sdc_package_sha256)
+            return
+
+        with self.timer.span("dpkg"):
+            result = subprocess.run(install_cmd, capture_output=True, text=True)
+        self._finish_sdc_install(
+            result.returncode, result.stdout, result.stderr, sdc_package_sha256
+        )
+
+    def _rolling_upgrade(self) -> bool:
+        """Indicate whether installing the SDC package must wait for an upgrade slot.
+
+        Only upgrades are coordinated: the first installation does not
+        interrupt any I/O.
+        """
+        return (
+            int(self.config["sdc-upgrade-max-concurrent"]) > 0
+            and self._stored.installed
+            and self.model.get_relation(PEER_RELATION) is not None
+        )
+
+    def _granted_units(self) -> list[str]:
+        """Return the units the leader granted an SDC upgrade slot."""
+        relation = self.model.get_relation(PEER_RELATION)
+        if relation is None:
+            return []
+        return json.loads(relation.data[self.app].get("sdc-upgrade-granted") or "[]")
+
+    def _upgrade_granted(self, sdc_package_sha256: str) -> bool:
+        """Request an SDC upgrade slot, returning whether the unit holds one."""
+        upgrade = self._stored.sdc_upgrade
+        if upgrade.get("sha256") != sdc_package_sha256 or upgrade.get("state") in (
+            rolling.DONE,
+            rolling.FAILED,
+        ):
+            self._set_upgrade_state(rolling.WAITING, sdc_package_sha256)
+
+        if self.unit.name not in self._granted_units():
+            logger.info("Waiting for a rolling upgrade slot to upgrade the SDC")
+            return False
+
+        logger.info("Rolling upgrade slot granted, upgrading the SDC")
+        self._stored.sdc_upgrade = dict(
+            self._stored.sdc_upgrade, volumes=self._mapped_volumes() or []
+        )
+        self._set_upgrade_state(rolling.UPGRADING)
+        return True
+
+    def _set_upgrade_state(self, state: str, sdc_package_sha256: Optional[str] = None):
+        """Record the SDC upgrade state and publish it to the peers."""
+        upgrade: dict[str, Any] = dict(self._stored.sdc_upgrade, state=state)
+        if sdc_package_sha256:
+            upgrade.update(sha256=sdc_package_sha256, volumes=[])
+        self._stored.sdc_upgrade = upgrade
+
+        relation = self.model.get_relation(PEER_RELATION)
+        if relation is not None:
+            relation.data[self.unit]["sdc-upgrade-state"] = state
+        self._update_upgrade_grants()
+
+    def _update_upgrade_grants(self):
+        """Grant the SDC upgrade slots to the waiting units, on the leader."""
+        relation = self.model.get_relation(PEER_RELATION)
+        if relation is None or not self.unit.is_leader():
+            return
+
+        states = {
+            unit.name: relation.data[unit].get("sdc-upgrade-state")
+            for unit in relation.units | {self.unit}
+        }
+        granted = self._granted_units()
+        new_grants = rolling.grant(states, granted, int(self.config["sdc-upgrade-max-concurrent"]))
+        if new_grants != granted:
+            logger.info("SDC upgrade slots granted to %s", ", ".join(new_grants) or "no unit")
+            relation.data[self.app]["sdc-upgrade-granted"] = json.dumps(new_grants)
+
+    def _mapped_volumes(self) -> Optional[list[str]]:
+        """Return the IDs of the volumes mapped to the SDC, None when unknown."""
+        try:
+            output = sdc_stats.query_drv_cfg("--query_vols")
+        except OSError as e:
+            logger.warning("Unable to list the mapped volumes: %s", e)
+            return None
+        return [volume.volume_id for volume in sdc_stats.parse_query_vols(output)]
+
+    def _check_upgrade_health(self):
+        """Complete the SDC upgrade once scini runs and its volumes are mapped again."""
+        if self._stored.sdc_upgrade.get("state") != rolling.VERIFYING:
+            return
+
+        if rolling.is_healthy(
+            service_running("scini"),
+            self._stored.sdc_upgrade.get("volumes", []),
+            self._mapped_volumes(),
+        ):
+            logger.info("SDC upgrade passed the health gate")
+            self._set_upgrade_state(rolling.DONE)
+        else:
+            logger.info("SDC upgrade waiting for scini and the volumes mapped before it")
+
+    def _on_sdc_peers_changed(self, event):
+        """Progress the rolling SDC upgrade."""
+        self._update_upgrade_grants()
+        state = self._stored.sdc_upgrade.get("state")
+        if state == rolling.WAITING and self.unit.name in self._granted_units():
+            self.install_sdc()
+        elif state == rolling.VERIFYING:
+            self._check_upgrade_health()
+        else:
+            return
+        self.update_status()
+
+    def _order_mdm_ips(self) -> Optional[str]:
+        """Return the configured MDMs ordered by latency.
+
+        The MDMs are only probed when their configuration changed since the
+        last probe, which update-status refreshes, so that hooks installing
+        the SDC do not wait on the MDMs.
+
+        :return: the comma separated MDM IPs, reachable MDMs first ordered by
+                 latency, or None when none of the MDMs can be reached
+        """
+        if self._stored.mdm_order.get("mdm_ips") != self._configured_mdm_ips():
+            return self._probe_mdm_order()
+        return self._stored.mdm_order.get("order")
+
+    def _configured_mdm_ips(self) -> str:
+        """Return the comma separated MDM IPs of the configuration."""
+        return str(self.config.get("powerflex-sdc-mdm-ips") or "")
+
+    def _probe_mdm_order(self) -> Optional[str]:
+        """Probe the configured MDMs concurrently and order them by latency.
+
+        :return: the comma separated MDM IPs, reachable MDMs first ordered by
+                 latency, or None when none of the MDMs can be reached
+        """
+        sdc_mdm_ips = self._configured_mdm_ips()
+        addresses = sdc.split_mdm_ips(sdc_mdm_ips)
+        if not addresses:
+            self._stored.mdm_unreachable = []
+            self._stored.mdm_order = {"mdm_ips": sdc_mdm_ips, "order": sdc_mdm_ips}
+            return sdc_mdm_ips
+
+        with self.timer.span("mdm_probe"):
+            probes = sdc.probe_mdms(
+                addresses, timeout=float(self.config["powerflex-sdc-mdm-probe-timeout"])
+            )
+
+        for probe in probes:
+            if probe.latency is None:
+                logger.warning("MDM %s is unreachable: %s", probe.address, probe.error)
+            else:
+                logger.info("MDM %s reachable in %.1fms", probe.address, probe.latency * 1000)
+
+        self._stored.mdm_unreachable = [probe.address for probe in probes if probe.error]
+        order = None
+        if len(self._stored.mdm_unreachable) < len(probes):
+            order = ",".join(probe.address for probe in probes)
+        self._stored.mdm_order = {"mdm_ips": sdc_mdm_ips, "order": order}
+        return order
+
+    def _finish_sdc_install(
+        self, exit_code: int, stdout: str, stderr: str, sdc_package_sha256: str
+    ):
+        """Record the outcome of the SDC package installation.
+
+        :param exit_code: the exit code of dpkg
+        :param stdout: the standard output of dpkg
+        :param stderr: the standard error of dpkg
+        :param sdc_package_sha256: the checksum of the installed package
+        """
         # If the installation process failed, then log the error and return
         # The install_status() status check method will determine that there is
         # an error based on the self._stored.install_failed flag and report the
         # error.
+        upgrading = self._stored.sdc_upgrade.get("state") == rolling.UPGRADING
         if exit_code != 0:
-            logger.error("An error occurred during the SDC installation: %s", result.stderr)
+            logger.error("An error occurred during the SDC installation: %s", stderr)
             self._stored.installed = False
             self._stored.install_failed = True
+            self._record_sdc_install_outcome(failed=True)
+            if upgrading:
+                self._set_upgrade_state(rolling.FAILED)
             return
 
         self._stored.installed = True
         self._stored.install_failed = False
-        logger.info("SDC installed successfully, stdout: %s", result.stdout)
+        self._stored.sdc_package_sha256 = sdc_package_sha256
+        self._record_sdc_install_outcome(failed=False)
+        logger.info("SDC installed successfully, stdout: %s", stdout)
+        self._check_sdc_started()
+        self.configure_sdc_parameters()
+        self.configure_backend_mdms()
+        self.apply_sdc_performance_profile()
+        if upgrading:
+            self._set_upgrade_state(rolling.VERIFYING)
+            self._check_upgrade_health()
+
+    def _start_background_install(self, install_cmd: list[str], sdc_package_sha256: str):
+        """Run the SDC package installation in a detached worker process.
+
+        The worker runs outside of the Juju machine lock, so it waits for the
+        dpkg frontend lock before running dpkg. It records its progress in
+        the SDC install state file, which is collected by the next
+        update-status hook.
+
+        :param install_cmd: the installation command
+        :param sdc_package_sha256: the checksum of the package being installed
+        """
+        if self._stored.sdc_install_pending and not self._collect_background_install():
+            logger.info("SDC installation already running in the background")
+            return
+
+        state_file = self._state_dir / SDC_INSTALL_STATE_FILE
+        state_file.unlink(missing_ok=True)
+        worker = Path(__file__).parent / "sdc_worker.py"
+        process = subprocess.Popen(
+            [
+                sys.executable,
+                str(worker),
+                str(state_file),
+                "--lock",
+                DPKG_FRONTEND_LOCK,
+                str(DPKG_LOCK_TIMEOUT),
+                "--",
+                *install_cmd,
+            ],
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            start_new_session=True,
+        )
+        logger.info("SDC installation started in the background (pid %d)", process.pid)
+        self._stored.sdc_install_pending = {
+            "pid": process.pid,
+            "sha256": sdc_package_sha256,
+            "command": install_cmd,
+        }
+
+    def _collect_background_install(self) -> bool:
+        """Collect the outcome of a background SDC package installation.
+
+        An installation which could not take the dpkg lock, because another
+        package manager held it, did not run and is started again.
+
+        :return: True when no installation is running anymore
+        """
+        pending = self._stored.sdc_install_pending
+        try:
+            state: dict = json.loads((self._state_dir / SDC_INSTALL_STATE_FILE).read_text())
+        except (OSError, ValueError):
+            state = {"state": "running"}
+
+        if state["state"] == "running":
+            if _process_alive(pending["pid"]):
+                return False
+            state = {
+                "state": "failed",
+                "exit_code": -1,
+                "stderr": "the installation worker exited unexpectedly",
+            }
+
+        self._stored.sdc_install_pending = None
+        if state["state"] == "locked":
+            logger.warning("Background SDC installation not run: %s", state.get("stderr"))
+            self._start_background_install(list(pending["command"]), pending["sha256"])
+            return False
+
+        logger.info(
+            "Background SDC installation %s with exit code %s", state["state"], state["exit_code"]
+        )
+        self._finish_sdc_install(
+            state["exit_code"], state.get("stdout", ""), state.get("stderr", ""), pending["sha256"]
+        )
+        return True
+
+    def _sdc_package_installed(
+        self, package: Optional[sdc.DebPackage], sdc_package_sha256: str
+    ) -> bool:
+        """Check whether the provided SDC package is the one already installed.
+
+        The package is considered installed when it is the same file that was
+        last installed by the charm and the dpkg database holds its version
+        as installed.
+
+        :param package: the name and version of the SDC Debian package
+        :param sdc_package_sha256: the checksum of the SDC Debian package
+        :return: True when installing the package again can be skipped
+        """
+        if sdc_package_sha256 != self._stored.sdc_package_sha256 or not package:
+            return False
+
+        state = self._sdc_dpkg_state() or {}
+        installed_version = state.get("version") if state.get("status") == "installed" else None
+        if installed_version != package.version:
+            logger.info(
+                "SDC package %s %s is not installed (installed version: %s)",
+                package.name,
+                package.version,
+                installed_version,
+            )
+            return False
+
+        logger.info(
+            "SDC package %s %s (sha256 %s) is already installed, skipping installation",
+            package.name,
+            package.version,
+            sdc_package_sha256,
+        )
+        return True
+
+    def _check_sdc_started(self):
+        """Record whether the SDC scini service is running."""
         # Check if service scini is running
         if service_running("scini"):
             logger.info("SDC scini service running. SDC Installation complete.")
@@ -238,5 +1922,114 @@ class CinderPowerflexCharm(CinderStoragePluginCharm):
             self._stored.is_started = False
 
 
+def _image_volume_cache_enabled(charm_config) -> bool:
+    """Return whether the image-volume cache is enabled and fully configured."""
+    cget = charm_config.get
+    return bool(
+        cget("image-volume-cache-enabled")
+        and cget("cinder-internal-tenant-project-id")
+        and cget("cinder-internal-tenant-user-id")
+    )
+
+
+def _replication_device(charm_config) -> Optional[replication.ReplicationDevice]:
+    """Return the replication device of a backend.
+
+    An invalid replication device is ignored here and reported by
+    replication_status() or backends_status().
+    """
+    try:
+        return replication.parse_replication_device(
+            charm_config.get("powerflex-replication-config")
+        )
+    except ValueError as e:
+        logger.error("Ignoring invalid powerflex-replication-config: %s", e)
+        return None
+
+
+def _process_alive(pid: int) -> bool:
+    """Return whether a process is still running."""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _add_sections(subordinate_configuration: str, sections: dict) -> str:
+    """Add cinder.conf sections to a subordinate_configuration value.
+
+    :param subordinate_configuration: the JSON document published to cinder
+    :param sections: the options to add, keyed by section name
+    :return: the updated JSON document
+    """
+    if not sections:
+        return subordinate_configuration
+
+    conf = json.loads(subordinate_configuration)
+    conf["cinder"]["/etc/cinder/cinder.conf"]["sections"].update(sections)
+    return json.dumps(conf)
+
+
+def _set_backend_sections(subordinate_configuration: str, sections: dict) -> str:
+    """Replace the backend sections of a subordinate_configuration value.
+
+    :param subordinate_configuration: the JSON document published to cinder
+    :param sections: the options of each backend, keyed by section name
+    :return: the updated JSON document
+    """
+    conf = json.loads(subordinate_configuration)
+    conf["cinder"]["/etc/cinder/cinder.conf"]["sections"] = sections
+    return json.dumps(conf)
+
+
+def _section_options(subordinate_configuration: Optional[str]) -> dict:
+    """Return the cinder.conf options found in a subordinate_configuration value.
+
+    :param subordinate_configuration: the JSON document published to cinder
+    :return: a dictionary keyed by "section/option" with the option values
+    """
+    if not subordinate_configuration:
+        return {}
+
+    try:
+        conf = json.loads(subordinate_configuration)
+        sections = conf["cinder"]["/etc/cinder/cinder.conf"]["sections"]
+    except (ValueError, KeyError, TypeError):
+        return {}
+
+    return {
+        f"{section}/{option}": value
+        for section, options in sections.items()
+        for option, value in options
+    }
+
+
+def _diff_backend_options(previous: Optional[str], current: Optional[str]) -> str:
+    """Describe which cinder.conf options differ between two publications.
+
+    Only the option names are reported as the values may hold credentials.
+
+    :param previous: the subordinate_configuration last published
+    :param current: the subordinate_configuration about to be published
+    :return: a human readable summary, empty when nothing differs
+    """
+    old = _section_options(previous)
+    new = _section_options(current)
+
+    summary = []
+    for label, names in (
+        ("added", new.keys() - old.keys()),
+        ("removed", old.keys() - new.keys()),
+        ("modified", {name for name in old.keys() & new.keys() if old[name] != new[name]}),
+    ):
+        if names:
+            summary.append("{}: {}".format(label, ", ".join(sorted(names))))
+
+    return "; ".join(summary)
+
+
 if __name__ == "__main__":
     main(CinderPowerflexCharm)
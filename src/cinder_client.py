@@ -0,0 +1,249 @@
+# Copyright 2024 Canonical Ltd
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Minimal client for the Keystone v3 and Cinder v3 REST APIs."""
+
+import http.client
+import json
+import logging
+import ssl
+import urllib.error
+import urllib.parse
+import urllib.request
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Catalog types of the Cinder v3 API, newest first
+VOLUME_SERVICE_TYPES = ("block-storage", "volumev3")
+# Microversion failing over clusters as well as hosts
+FAILOVER_MICROVERSION = "3.26"
+
+
+class OpenStackError(Exception):
+    """Raised when an OpenStack API cannot be reached or rejects a request."""
+
+
+def _message(body: Any) -> Any:
+    """Return the error message of an OpenStack error response."""
+    if isinstance(body, dict):
+        for value in body.values():
+            if isinstance(value, dict) and "message" in value:
+                return value["message"]
+    return body
+
+
+class CinderClient:
+    """Client for the Cinder v3 API, authenticated with a Keystone v3 password.
+
+    The token and the Cinder endpoint are obtained on the first request and
+    reused by the following ones.
+    """
+
+    def __init__(
+        self,
+        auth_url: str,
+        username: str,
+        password: str,
+        project_name: str,
+        user_domain_name: str = "Default",
+        project_domain_name: str = "Default",
+        region_name: Optional[str] = None,
+        interface: str = "public",
+        timeout: float = 30,
+        insecure: bool = False,
+    ):
+        self.auth_url = auth_url.rstrip("/")
+        if not self.auth_url.endswith("/v3"):
+            self.auth_url += "/v3"
+        self.username = username
+        self.password = password
+        self.project_name = project_name
+        self.user_domain_name = user_domain_name
+        self.project_domain_name = project_domain_name
+        self.region_name = region_name
+        self.interface = interface
+        self.timeout = timeout
+        self._context = ssl.create_default_context()
+        if insecure:
+            self._context.check_hostname = False
+            self._context.verify_mode = ssl.CERT_NONE
+        self._token: Optional[str] = None
+        self._endpoint: Optional[str] = None
+
+    def _send(self, method: str, url: str, body: Any = None, headers: Optional[dict] = None):
+        """Send a request and return the response headers and decoded body."""
+        request = urllib.request.Request(
+            url, method=method, headers={"Accept": "application/json"}
+        )
+        if body is not None:
+            request.data = json.dumps(body).encode()
+            request.add_header("Content-Type", "application/json")
+        for name, value in (headers or {}).items():
+            request.add_header(name, value)
+
+        try:
+            with urllib.request.urlopen(
+                request, timeout=self.timeout, context=self._context
+            ) as response:
+                status, response_headers, data = response.status, response.headers, response.read()
+        except urllib.error.HTTPError as e:
+            status, response_headers, data = e.code, e.headers, e.read()
+        except (OSError, http.client.HTTPException) as e:
+            reason = getattr(e, "reason", None) or str(e) or e.__class__.__name__
+            raise OpenStackError(f"{method} {url} failed: {reason}") from e
+
+        try:
+            decoded = json.loads(data) if data else None
+        except ValueError:
+            decoded = data.decode(errors="replace")
+        if status >= 400:
+            raise OpenStackError(f"{method} {url} failed with HTTP {status}: {_message(decoded)}")
+        return response_headers, decoded
+
+    def authenticate(self):
+        """Obtain a token and look the Cinder endpoint up in the service catalog.
+
+        :raises OpenStackError: when the authentication fails or no Cinder v3
+                                endpoint is published
+        """
+        headers, body = self._send(
+            "POST",
+            f"{self.auth_url}/auth/tokens",
+            {
+                "auth": {
+                    "identity": {
+                        "methods": ["password"],
+                        "password": {
+                            "user": {
+                                "name": self.username,
+                                "domain": {"name": self.user_domain_name},
+                                "password": self.password,
+                            }
+                        },
+                    },
+                    "scope": {
+                        "project": {
+                            "name": self.project_name,
+                            "domain": {"name": self.project_domain_name},
+                        }
+                    },
+                }
+            },
+        )
+        token = headers.get("X-Subject-Token")
+        if not token:
+            raise OpenStackError("Keystone returned no token")
+
+        catalog: List[dict] = []
+        if isinstance(body, dict):
+            catalog = body.get("token", {}).get("catalog", [])
+        services = {service.get("type"): service for service in catalog}
+        for service_type in VOLUME_SERVICE_TYPES:
+            for endpoint in services.get(service_type, {}).get("endpoints", []):
+                if endpoint.get("interface") != self.interface:
+                    continue
+                if self.region_name and self.region_name not in (
+                    endpoint.get("region_id"),
+                    endpoint.get("region"),
+                ):
+                    continue
+                self._token = token
+                self._endpoint = endpoint["url"].rstrip("/")
+                logger.debug("Using the Cinder endpoint %s", self._endpoint)
+                return
+
+        raise OpenStackError(f"no {self.interface} Cinder v3 endpoint in the service catalog")
+
+    def request(
+        self, method: str, path: str, body: Any = None, microversion: Optional[str] = None
+    ) -> Any:
+        """Send an authenticated request to Cinder and return the decoded response.
+
+        :param method: the HTTP method
+        :param path: the path of the resource relative to the endpoint, e.g. /types
+        :param body: an optional object sent as the JSON request body
+        :param microversion: the API microversion requested, the base version when None
+        :return: the decoded JSON response
+        :raises OpenStackError: when the request fails
+        """
+        if self._token is None:
+            self.authenticate()
+        headers = {"X-Auth-Token": self._token}
+        if microversion:
+            headers["OpenStack-API-Version"] = f"volume {microversion}"
+        _, data = self._send(method, f"{self._endpoint}{path}", body, headers=headers)
+        return data
+
+    def qos_specs(self) -> List[dict]:
+        """Return every QoS specs."""
+        return self.request("GET", "/qos-specs")["qos_specs"]
+
+    def create_qos_specs(self, name: str, consumer: str, specs: Dict[str, str]) -> dict:
+        """Create QoS specs and return them."""
+        body = {"qos_specs": {"name": name, "consumer": consumer, **specs}}
+        return self.request("POST", "/qos-specs", body)["qos_specs"]
+
+    def set_qos_keys(self, qos_specs_id: str, specs: Dict[str, str]):
+        """Add or update keys of QoS specs."""
+        self.request("PUT", f"/qos-specs/{qos_specs_id}", {"qos_specs": specs})
+
+    def unset_qos_keys(self, qos_specs_id: str, keys: List[str]):
+        """Remove keys from QoS specs."""
+        self.request("PUT", f"/qos-specs/{qos_specs_id}/delete_keys", {"keys": keys})
+
+    def associate_qos(self, qos_specs_id: str, volume_type_id: str):
+        """Associate QoS specs with a volume type."""
+        query = urllib.parse.urlencode({"vol_type_id": volume_type_id})
+        self.request("GET", f"/qos-specs/{qos_specs_id}/associate?{query}")
+
+    def disassociate_qos(self, qos_specs_id: str, volume_type_id: str):
+        """Disassociate QoS specs from a volume type."""
+        query = urllib.parse.urlencode({"vol_type_id": volume_type_id})
+        self.request("GET", f"/qos-specs/{qos_specs_id}/disassociate?{query}")
+
+    def volume_types(self) -> List[dict]:
+        """Return every volume type, public or private, with its extra specs."""
+        return self.request("GET", "/types?is_public=None")["volume_types"]
+
+    def create_volume_type(self, name: str, extra_specs: Dict[str, str]) -> dict:
+        """Create a volume type and return it."""
+        body = {"volume_type": {"name": name, "extra_specs": extra_specs}}
+        return self.request("POST", "/types", body)["volume_type"]
+
+    def set_extra_specs(self, volume_type_id: str, extra_specs: Dict[str, str]):
+        """Add or update extra specs of a volume type."""
+        self.request("POST", f"/types/{volume_type_id}/extra_specs", {"extra_specs": extra_specs})
+
+    def volume_services(self) -> List[dict]:
+        """Return the cinder-volume services with their cluster and replication status."""
+        return self.request(
+            "GET", "/os-services?binary=cinder-volume", microversion=FAILOVER_MICROVERSION
+        )["services"]
+
+    def failover(self, backend_id: str, host: Optional[str] = None, cluster: Optional[str] = None):
+        """Fail the backend of a cinder-volume host or cluster over to a replication target.
+
+        :param backend_id: the backend_id of the replication device, or
+                           "default" to fail back to the primary system
+        :param host: the host of the service, e.g. juju-1@cinder-powerflex
+        :param cluster: the cluster of the services in active/active mode
+        """
+        body: Dict[str, Any] = {"backend_id": backend_id}
+        if cluster:
+            body["cluster"] = cluster
+        else:
+            body["host"] = host
+        # cinder routes the os-services actions as updates of the resource
+        self.request("PUT", "/os-services/failover", body, microversion=FAILOVER_MICROVERSION)
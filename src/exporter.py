@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+# Copyright 2024 Canonical Ltd
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Prometheus exporter of the charm and SDC telemetry of a unit.
+
+The exporter runs as a systemd service next to the charm and serves the
+metrics in the Prometheus text format on /metrics:
+
+    exporter.py --state-dir DIR [--port PORT] [--cache-ttl SECONDS]
+
+The charm state and hook timings are read from the files the charm keeps
+in the state directory, the scini service state and the volume counters
+are read from the host. Only the standard library and the stdlib-only
+charm modules are used, so the exporter does not depend on the charm
+virtual environment.
+"""
+
+import argparse
+import json
+import logging
+import subprocess
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Callable, List
+
+import sdc_stats
+import timing
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PORT = 9657
+DEFAULT_CACHE_TTL = 15.0
+# Files kept by the charm in its state directory
+STATE_FILE = "powerflex-metrics-state.json"
+TIMINGS_FILE = "powerflex-hook-timings.json"
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class Cached:
+    """Memoize the result of an expensive collector for ttl seconds."""
+
+    def __init__(self, func: Callable[[], Any], ttl: float):
+        self.func = func
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._value = None
+        self._expires = 0.0
+
+    def __call__(self) -> Any:
+        """Return the cached value, collecting it again once it expired."""
+        with self._lock:
+            now = time.monotonic()
+            if now >= self._expires:
+                self._value = self.func()
+                self._expires = now + self.ttl
+            return self._value
+
+
+def scini_active() -> bool:
+    """Indicate whether the scini service is active."""
+    result = subprocess.run(["systemctl", "is-active", "--quiet", "scini"], capture_output=True)
+    return result.returncode == 0
+
+
+def volume_counters() -> dict:
+    """Return the I/O counters of the scini devices and the volume ID of each."""
+    return {"stats": sdc_stats.sample(), "volumes": sdc_stats.volume_devices()}
+
+
+def _labels(**labels) -> str:
+    """Format Prometheus labels, escaping their values."""
+    if not labels:
+        return ""
+    escaped = (
+        '{}="{}"'.format(k, str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for k, v in labels.items()
+    )
+    return "{" + ",".join(escaped) + "}"
+
+
+class Metrics:
+    """Renders the metrics of a unit in the Prometheus text format."""
+
+    def __init__(self, state_dir: Path, cache_ttl: float = DEFAULT_CACHE_TTL):
+        self.state_dir = state_dir
+        self.scini_active = Cached(scini_active, cache_ttl)
+        self.volume_counters = Cached(volume_counters, cache_ttl)
+
+    def _read_state(self) -> dict:
+        try:
+            return json.loads((self.state_dir / STATE_FILE).read_text())
+        except (OSError, ValueError):
+            return {}
+
+    def _metric(self, lines: List[str], name: str, kind: str, doc: str, samples):
+        lines.append(f"# HELP {name} {doc}")
+        lines.append(f"# TYPE {name} {kind}")
+        for labels, value in samples:
+            lines.append(f"{name}{_labels(**labels)} {value}")
+
+    def _charm_metrics(self, lines: List[str]):
+        state = self._read_state()
+        for key in ("installed", "install_failed", "is_started"):
+            self._metric(
+                lines,
+                f"powerflex_sdc_{key}",
+                "gauge",
+                f"Charm {key} flag of the SDC installation.",
+                [({}, int(bool(state.get(key))))] if key in state else [],
+            )
+
+        probe = state.get("gateway_probe") or {}
+        self._metric(
+            lines,
+            "powerflex_gateway_up",
+            "gauge",
+            "Whether the last probe of the PowerFlex Gateway succeeded.",
+            [({}, int("latency_ms" in probe))] if probe else [],
+        )
+        self._metric(
+            lines,
+            "powerflex_gateway_probe_latency_seconds",
+            "gauge",
+            "Round-trip latency of the last PowerFlex Gateway API probe.",
+            [({}, probe["latency_ms"] / 1000)] if "latency_ms" in probe else [],
+        )
+
+        samples = timing.load(self.state_dir / TIMINGS_FILE)
+        summary = []
+        for phase, durations in sorted(samples.items()):
+            if not durations:
+                continue
+            for quantile in (0.5, 0.95, 1.0):
+                value = timing.percentile(durations, quantile * 100)
+                summary.append(({"phase": phase, "quantile": quantile}, value))
+        self._metric(
+            lines,
+            "powerflex_charm_phase_duration_seconds",
+            "gauge",
+            "Quantiles of the recent durations of each hook phase.",
+            summary,
+        )
+        self._metric(
+            lines,
+            "powerflex_charm_phase_samples",
+            "gauge",
+            "Number of recent durations kept for each hook phase.",
+            [({"phase": p}, len(d)) for p, d in sorted(samples.items()) if d],
+        )
+
+    def _sdc_metrics(self, lines: List[str]):
+        self._metric(
+            lines,
+            "powerflex_scini_service_active",
+            "gauge",
+            "Whether the scini service is active.",
+            [({}, int(self.scini_active()))],
+        )
+
+        counters = self.volume_counters()
+        names = {device: volume for volume, device in counters["volumes"].items()}
+        stats = sorted(counters["stats"].items())
+        for name, kind, doc, value in (
+            ("reads_total", "counter", "Read I/Os completed", lambda s: s.reads),
+            ("writes_total", "counter", "Write I/Os completed", lambda s: s.writes),
+            (
+                "read_bytes_total",
+                "counter",
+                "Bytes read",
+                lambda s: s.read_sectors * sdc_stats.SECTOR_SIZE,
+            ),
+            (
+                "written_bytes_total",
+                "counter",
+                "Bytes written",
+                lambda s: s.write_sectors * sdc_stats.SECTOR_SIZE,
+            ),
+            (
+                "read_time_seconds_total",
+                "counter",
+                "Time spent reading",
+                lambda s: s.read_ms / 1000,
+            ),
+            (
+                "write_time_seconds_total",
+                "counter",
+                "Time spent writing",
+                lambda s: s.write_ms / 1000,
+            ),
+            (
+                "io_time_seconds_total",
+                "counter",
+                "Time spent doing I/Os",
+                lambda s: s.io_ms / 1000,
+            ),
+            ("in_flight", "gauge", "I/Os currently in flight", lambda s: s.in_flight),
+        ):
+            self._metric(
+                lines,
+                f"powerflex_sdc_volume_{name}",
+                kind,
+                f"{doc} by the scini device.",
+                [
+                    ({"device": device, "volume": names.get(device, "")}, value(stat))
+                    for device, stat in stats
+                ],
+            )
+
+    def render(self) -> str:
+        """Return every metric in the Prometheus text format."""
+        lines = []
+        self._charm_metrics(lines)
+        self._sdc_metrics(lines)
+        return "\n".join(lines) + "\n"
+
+
+def make_handler(metrics: Metrics):
+    """Return the request handler class serving metrics."""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):  # noqa: N802
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            try:
+                body = metrics.render().encode()
+            except Exception:
+                logger.exception("Unable to collect the metrics")
+                self.send_error(500)
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", CONTENT_TYPE)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            logger.debug(format, *args)
+
+    return Handler
+
+
+def main(argv=None) -> int:
+    """Parse the command line and serve the metrics until interrupted."""
+    parser = argparse.ArgumentParser(description="PowerFlex charm Prometheus exporter")
+    parser.add_argument("--state-dir", type=Path, required=True)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--cache-ttl", type=float, default=DEFAULT_CACHE_TTL)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    server = ThreadingHTTPServer(
+        ("", args.port), make_handler(Metrics(args.state_dir, args.cache_ttl))
+    )
+    logger.info("Serving metrics on port %d", args.port)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
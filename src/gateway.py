@@ -0,0 +1,239 @@
+# Copyright 2024 Canonical Ltd
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Minimal client for the PowerFlex Gateway REST API."""
+
+import base64
+import http.client
+import json
+import logging
+import ssl
+import time
+from typing import Any, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+# Performance profiles of the SDCs, Default being named Compact since 3.0
+SDC_PERFORMANCE_PROFILES = ("Compact", "Default", "HighPerformance")
+
+
+class GatewayError(Exception):
+    """Raised when the PowerFlex Gateway cannot be reached or rejects a request."""
+
+
+class GatewayAuthError(GatewayError):
+    """Raised when the PowerFlex Gateway rejects the configured credentials."""
+
+
+class PowerFlexGateway:
+    """Client for the PowerFlex Gateway REST API.
+
+    A single HTTP connection is kept open and reused for every request made
+    through the client. As with the cinder PowerFlex driver defaults, the
+    gateway certificate is only verified when asked to.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        username: str,
+        password: str,
+        timeout: float = 30,
+        scheme: str = "https",
+        verify: bool = False,
+    ):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.timeout = timeout
+        self.scheme = scheme
+        self.verify = verify
+        self._token: Optional[str] = None
+        self._conn: Optional[http.client.HTTPConnection] = None
+
+    def _connection(self) -> http.client.HTTPConnection:
+        """Return the HTTP connection to the gateway, opening it if needed."""
+        if self._conn is None:
+            if self.scheme == "https":
+                self._conn = http.client.HTTPSConnection(
+                    self.host,
+                    self.port,
+                    timeout=self.timeout,
+                    context=self._ssl_context(),
+                )
+            else:
+                self._conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+        return self._conn
+
+    def _ssl_context(self) -> ssl.SSLContext:
+        """Return the TLS context of the connection, verifying the gateway if asked to."""
+        context = ssl.create_default_context()
+        if not self.verify:
+            context.check_hostname = False
+            context.verify_mode = ssl.CERT_NONE
+        return context
+
+    def close(self):
+        """Close the connection to the gateway."""
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def _send(self, method: str, path: str, secret: str, body: Any = None):
+        """Send a request and return the response status and decoded body."""
+        credentials = base64.b64encode(f"{self.username}:{secret}".encode()).decode()
+        headers = {"Authorization": f"Basic {credentials}", "Accept": "application/json"}
+        payload = None
+        if body is not None:
+            payload = json.dumps(body)
+            headers["Content-Type"] = "application/json"
+
+        # A kept-alive connection may have been closed by the gateway since
+        # the previous request, in which case it is reopened once.
+        attempt = 0
+        while True:
+            conn = self._connection()
+            try:
+                conn.request(method, path, body=payload, headers=headers)
+                response = conn.getresponse()
+                data = response.read()
+                break
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                self.close()
+                if attempt:
+                    raise
+                attempt += 1
+            except (OSError, http.client.HTTPException):
+                self.close()
+                raise
+
+        try:
+            decoded = json.loads(data) if data else None
+        except ValueError:
+            decoded = data.decode(errors="replace")
+        return response.status, decoded
+
+    def login(self) -> str:
+        """Authenticate against the gateway and return the session token."""
+        try:
+            status, token = self._send("GET", "/api/login", self.password)
+        except (OSError, http.client.HTTPException) as e:
+            raise GatewayError(str(e) or e.__class__.__name__) from e
+
+        if status == 401:
+            raise GatewayAuthError("credentials rejected")
+        if status != 200 or not isinstance(token, str):
+            raise GatewayError(f"login failed with HTTP {status}")
+
+        self._token = token
+        return token
+
+    def request(self, method: str, path: str, body: Any = None) -> Any:
+        """Send an authenticated request and return the decoded response.
+
+        :param method: the HTTP method
+        :param path: the path of the REST resource, e.g. /api/version
+        :param body: an optional object sent as the JSON request body
+        :return: the decoded JSON response
+        :raises GatewayError: when the request fails
+        """
+        token = self._token or self.login()
+
+        try:
+            status, data = self._send(method, path, token, body)
+            if status == 401:
+                # The session token expired, authenticate again
+                token = self.login()
+                status, data = self._send(method, path, token, body)
+        except (OSError, http.client.HTTPException) as e:
+            raise GatewayError(str(e) or e.__class__.__name__) from e
+
+        if status >= 400:
+            message = data.get("message") if isinstance(data, dict) else data
+            raise GatewayError(f"{method} {path} failed with HTTP {status}: {message}")
+
+        return data
+
+    def _set_timeout(self, timeout: float):
+        """Change the timeout of the requests, including on an open connection."""
+        self.timeout = timeout
+        if self._conn is not None:
+            self._conn.timeout = timeout
+            if self._conn.sock is not None:
+                self._conn.sock.settimeout(timeout)
+
+    def probe(self, timeout: Optional[float] = None) -> float:
+        """Check the gateway accepts the credentials and answers API requests.
+
+        The session token of the client is reused, the gateway is only
+        logged in to when the client has none or the token expired.
+
+        :param timeout: the timeout of the probe requests, in seconds,
+                        instead of the timeout of the client
+        :return: the round-trip latency of the version request, in seconds
+        :raises GatewayError: when the gateway cannot be reached or used
+        """
+        previous = self.timeout
+        if timeout is not None:
+            self._set_timeout(timeout)
+        try:
+            if self._token is None:
+                self.login()
+            start = time.monotonic()
+            self.request("GET", "/api/version")
+            return time.monotonic() - start
+        finally:
+            self._set_timeout(previous)
+
+    def find_sdc(
+        self, guid: Optional[str] = None, addresses: Iterable[str] = ()
+    ) -> Optional[dict]:
+        """Look up an SDC registered with the cluster.
+
+        :param guid: the GUID of the SDC, matched first
+        :param addresses: IP addresses of the host, matched when no SDC has the GUID
+        :return: the SDC object, or None when no SDC matches
+        :raises GatewayError: when the request fails
+        """
+        sdcs = self.request("GET", "/api/types/Sdc/instances") or []
+        if guid:
+            for sdc in sdcs:
+                if (sdc.get("sdcGuid") or "").lower() == guid.lower():
+                    return sdc
+
+        addresses = set(addresses)
+        for sdc in sdcs:
+            ips = set(sdc.get("sdcIps") or []) | {sdc.get("sdcIp")}
+            if ips & addresses:
+                return sdc
+        return None
+
+    def get_sdc(self, sdc_id: str) -> dict:
+        """Return the SDC object with the given ID."""
+        return self.request("GET", f"/api/instances/Sdc::{sdc_id}")
+
+    def set_sdc_performance_profile(self, sdc_id: str, profile: str):
+        """Set the performance profile of an SDC.
+
+        :param sdc_id: the ID of the SDC
+        :param profile: one of SDC_PERFORMANCE_PROFILES
+        :raises GatewayError: when the request fails
+        """
+        self.request(
+            "POST",
+            f"/api/instances/Sdc::{sdc_id}/action/setSdcPerformanceParameters",
+            {"perfProfile": profile},
+        )
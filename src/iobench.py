@@ -0,0 +1,353 @@
+# Copyright 2024 Canonical Ltd
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Random I/O workload measuring the IOPS and latency of a block device or file.
+
+The workload runs with fio when it is installed, and otherwise with a
+Python engine issuing synchronous I/Os from one thread per queue slot.
+"""
+
+import errno
+import json
+import math
+import mmap
+import os
+import random
+import re
+import shutil
+import stat
+import subprocess
+import threading
+import time
+from pathlib import Path
+from typing import Dict, NamedTuple, Optional
+
+# Direct I/O requires offsets and sizes aligned on the logical sector size
+SECTOR_SIZE = 512
+# Chunk used to fill a newly created scratch file
+FILL_CHUNK = 1024 * 1024
+# Upper bounds keeping an action from running for too long
+MAX_DURATION = 600
+MAX_QUEUE_DEPTH = 256
+# Latency histogram buckets, from 1us and each 1% wider than the previous one
+HISTOGRAM_MIN = 1e-6
+HISTOGRAM_GROWTH = 1.01
+# Seconds fio may take on top of the workload duration, e.g. to lay out files
+FIO_GRACE = 60
+
+_SIZE = re.compile(r"^(\d+)([kmg]?)$", re.IGNORECASE)
+_UNITS = {"": 1, "k": 1024, "m": 1024**2, "g": 1024**3}
+
+
+class Workload(NamedTuple):
+    """Parameters of a random I/O workload."""
+
+    block_size: int = 4096
+    queue_depth: int = 16
+    read_percent: int = 70
+    duration: float = 30.0
+
+
+class _Histogram:
+    """Latency counts in fixed logarithmic buckets.
+
+    The memory used does not depend on the number of I/Os, and the
+    percentiles are accurate to the bucket width, i.e. 1%.
+    """
+
+    _LOG_GROWTH = math.log(HISTOGRAM_GROWTH)
+
+    def __init__(self):
+        self.counts: Dict[int, int] = {}
+        self.total = 0
+        self.max = 0.0
+
+    def add(self, latency: float):
+        """Count one latency, in seconds."""
+        bucket = 0
+        if latency > HISTOGRAM_MIN:
+            bucket = math.ceil(math.log(latency / HISTOGRAM_MIN) / self._LOG_GROWTH)
+        self.counts[bucket] = self.counts.get(bucket, 0) + 1
+        self.total += 1
+        if latency > self.max:
+            self.max = latency
+
+    def merge(self, other: "_Histogram"):
+        """Add the counts of another histogram."""
+        for bucket, count in other.counts.items():
+            self.counts[bucket] = self.counts.get(bucket, 0) + count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+
+    def percentile(self, pct: float) -> float:
+        """Return the nearest-rank percentile, the upper bound of its bucket."""
+        rank = max(math.ceil(pct / 100 * self.total), 1)
+        seen = 0
+        for bucket in sorted(self.counts):
+            seen += self.counts[bucket]
+            if seen >= rank:
+                return min(HISTOGRAM_MIN * HISTOGRAM_GROWTH**bucket, self.max)
+        return self.max
+
+
+class _Samples:
+    """Latencies recorded by one I/O thread, and the error which stopped it."""
+
+    def __init__(self):
+        self.latencies = {"read": _Histogram(), "write": _Histogram()}
+        self.error: Optional[OSError] = None
+
+
+def parse_size(value: str) -> int:
+    """Parse a size in bytes with an optional k, m or g binary suffix.
+
+    :raises ValueError: when the size is malformed
+    """
+    match = _SIZE.match(str(value).strip())
+    if not match:
+        raise ValueError(f"{value} is not a size such as 4096, 4k or 1m")
+    return int(match.group(1)) * _UNITS[match.group(2).lower()]
+
+
+def validate(workload: Workload):
+    """Check the workload parameters.
+
+    :raises ValueError: when a parameter is out of range
+    """
+    if workload.block_size < SECTOR_SIZE or workload.block_size % SECTOR_SIZE:
+        raise ValueError(f"block size must be a multiple of {SECTOR_SIZE} bytes")
+    if not 1 <= workload.queue_depth <= MAX_QUEUE_DEPTH:
+        raise ValueError(f"queue depth must be between 1 and {MAX_QUEUE_DEPTH}")
+    if not 0 <= workload.read_percent <= 100:
+        raise ValueError("read percentage must be between 0 and 100")
+    if not 1 <= workload.duration <= MAX_DURATION:
+        raise ValueError(f"duration must be between 1 and {MAX_DURATION} seconds")
+
+
+def is_block_device(path: Path) -> bool:
+    """Indicate whether path is a block device, e.g. a scini or loop device."""
+    try:
+        return stat.S_ISBLK(os.stat(path).st_mode)
+    except FileNotFoundError:
+        return False
+
+
+def create_scratch_file(path: Path, size: int):
+    """Create a file of the given size filled with data, not holes.
+
+    Reading the holes of a sparse file never reaches the storage, so the
+    file is written in full before the workload runs.
+    """
+    chunk = os.urandom(FILL_CHUNK)
+    with open(path, "wb") as f:
+        remaining = size
+        while remaining > 0:
+            remaining -= f.write(chunk[: min(remaining, FILL_CHUNK)])
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def _open(path: Path, writable: bool, direct: bool) -> int:
+    """Open path bypassing the page cache when the filesystem allows it."""
+    flags = os.O_RDWR if writable else os.O_RDONLY
+    if direct and hasattr(os, "O_DIRECT"):
+        try:
+            return os.open(path, flags | os.O_DIRECT)
+        except OSError as e:
+            # tmpfs and some other filesystems do not support direct I/O
+            if e.errno != errno.EINVAL:
+                raise
+    return os.open(path, flags)
+
+
+def _summarize(latencies: _Histogram, block_size: int, elapsed: float) -> Dict[str, float]:
+    """Return the IOPS, bandwidth and latency percentiles of one I/O direction."""
+    if not latencies.total:
+        return {"ops": 0, "iops": 0.0, "bandwidth-kib": 0.0}
+    return {
+        "ops": latencies.total,
+        "iops": round(latencies.total / elapsed, 1),
+        "bandwidth-kib": round(latencies.total * block_size / 1024 / elapsed, 1),
+        "latency-p50-us": round(latencies.percentile(50) * 1e6, 1),
+        "latency-p95-us": round(latencies.percentile(95) * 1e6, 1),
+        "latency-p99-us": round(latencies.percentile(99) * 1e6, 1),
+        "latency-max-us": round(latencies.max * 1e6, 1),
+    }
+
+
+def _issue_ios(
+    fd: int, blocks: int, workload: Workload, deadline: float, seed: int, samples: _Samples
+):
+    """Issue random I/Os until the deadline, recording their latency in samples."""
+    rng = random.Random(seed)
+    # Anonymous mappings are page aligned, as direct I/O requires
+    buf = mmap.mmap(-1, workload.block_size)
+    buf.write(os.urandom(workload.block_size))
+    try:
+        while True:
+            offset = rng.randrange(blocks) * workload.block_size
+            is_read = rng.random() * 100 < workload.read_percent
+            start = time.monotonic()
+            if is_read:
+                os.preadv(fd, [buf], offset)
+            else:
+                os.pwrite(fd, buf, offset)
+            end = time.monotonic()
+            samples.latencies["read" if is_read else "write"].add(end - start)
+            if end >= deadline:
+                break
+    except OSError as e:
+        samples.error = e
+    finally:
+        buf.close()
+
+
+def default_engine() -> str:
+    """Return the engine running the workloads, "fio" when installed or "python"."""
+    return "fio" if shutil.which("fio") else "python"
+
+
+def run(
+    path: Path,
+    workload: Workload,
+    direct: bool = True,
+    seed: Optional[int] = None,
+    engine: Optional[str] = None,
+) -> Dict[str, Dict[str, float]]:
+    """Run a random I/O workload against a block device or existing file.
+
+    :param path: the block device or file the I/Os are issued against
+    :param workload: the workload parameters
+    :param direct: bypass the page cache when the target supports it
+    :param seed: seed of the offset and read/write choices, for repeatable runs
+    :param engine: "fio" or "python", the default engine when not given
+    :return: the "read" and "write" statistics
+    :raises ValueError: when the workload or target is invalid
+    :raises OSError: when an I/O fails
+    """
+    validate(workload)
+    if (engine or default_engine()) == "fio":
+        return _run_fio(path, workload, direct, seed)
+    return _run_python(path, workload, direct, seed)
+
+
+def _run_fio(
+    path: Path, workload: Workload, direct: bool, seed: Optional[int]
+) -> Dict[str, Dict[str, float]]:
+    """Run the workload with fio, through libaio with queue_depth I/Os in flight."""
+    command = [
+        "fio",
+        "--name=benchmark-backend",
+        # fio splits file names on colons
+        "--filename={}".format(str(path).replace(":", "\\:")),
+        "--ioengine=libaio",
+        "--rw=randrw",
+        f"--rwmixread={workload.read_percent}",
+        f"--bs={workload.block_size}",
+        f"--iodepth={workload.queue_depth}",
+        f"--direct={int(direct)}",
+        "--norandommap",
+        "--time_based",
+        f"--runtime={math.ceil(workload.duration)}",
+        "--percentile_list=50:95:99",
+        "--output-format=json",
+    ]
+    if seed is not None:
+        command.append(f"--randseed={seed}")
+
+    try:
+        result = subprocess.run(
+            command,
+            capture_output=True,
+            text=True,
+            timeout=workload.duration + FIO_GRACE,
+        )
+    except subprocess.TimeoutExpired as e:
+        raise OSError(errno.ETIMEDOUT, f"fio did not finish in {e.timeout} seconds") from e
+    if result.returncode != 0:
+        raise OSError(f"fio failed: {(result.stderr or result.stdout).strip()[-500:]}")
+    try:
+        job = json.loads(result.stdout)["jobs"][0]
+    except (ValueError, KeyError, IndexError) as e:
+        raise OSError(f"unable to parse the fio output: {e}") from e
+    if job.get("error"):
+        raise OSError(job["error"], os.strerror(job["error"]))
+
+    return {direction: _summarize_fio(job[direction]) for direction in ("read", "write")}
+
+
+def _summarize_fio(stats: dict) -> Dict[str, float]:
+    """Return the statistics of one I/O direction from the fio job results."""
+    if not stats["total_ios"]:
+        return {"ops": 0, "iops": 0.0, "bandwidth-kib": 0.0}
+    latency = stats["clat_ns"]
+    percentiles = latency.get("percentile", {})
+    summary = {
+        "ops": stats["total_ios"],
+        "iops": round(stats["iops"], 1),
+        "bandwidth-kib": round(stats["bw"], 1),
+    }
+    for pct in (50, 95, 99):
+        summary[f"latency-p{pct}-us"] = round(percentiles.get(f"{pct}.000000", 0) / 1000, 1)
+    summary["latency-max-us"] = round(latency["max"] / 1000, 1)
+    return summary
+
+
+def _run_python(
+    path: Path, workload: Workload, direct: bool, seed: Optional[int]
+) -> Dict[str, Dict[str, float]]:
+    """Run the workload with one thread per queue slot.
+
+    Each thread issues synchronous I/Os of block_size bytes at random aligned
+    offsets until the duration elapses; the GIL is released while each I/O
+    runs, so the device sees up to queue_depth requests, but the threads
+    compete for the GIL in between and fio reaches higher rates.
+    """
+    fd = _open(path, workload.read_percent < 100, direct)
+    try:
+        blocks = os.lseek(fd, 0, os.SEEK_END) // workload.block_size
+        if blocks < 1:
+            raise ValueError(f"{path} is smaller than the block size")
+
+        seeds = random.Random(seed)
+        samples = [_Samples() for _ in range(workload.queue_depth)]
+        start = time.monotonic()
+        threads = [
+            threading.Thread(
+                target=_issue_ios,
+                args=(fd, blocks, workload, start + workload.duration, seeds.getrandbits(32), s),
+            )
+            for s in samples
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.monotonic() - start
+
+        for s in samples:
+            if s.error is not None:
+                raise s.error
+        if any(s.latencies["write"].total for s in samples):
+            os.fsync(fd)
+    finally:
+        os.close(fd)
+
+    results = {}
+    for direction in ("read", "write"):
+        latencies = _Histogram()
+        for s in samples:
+            latencies.merge(s.latencies[direction])
+        results[direction] = _summarize(latencies, workload.block_size, elapsed)
+    return results
@@ -0,0 +1,201 @@
+# Copyright 2024 Canonical Ltd
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""QoS tiers enforced by PowerFlex through cinder QoS specs and volume types.
+
+Each tier, e.g.
+
+    gold:
+      maxIOPS: 20000
+      maxBWS: 409600
+
+becomes, for each volume backend name, QoS specs and a volume type named
+<volume backend name>-<tier>, the volume type being bound to the volume
+backend and associated with the QoS specs. The existing specs and types
+are compared with the tiers first, so only what differs is changed.
+"""
+
+import re
+from typing import Dict, Iterable, List, NamedTuple, Optional
+
+import yaml
+
+# Limits enforced by the PowerFlex driver on each volume, bandwidths in KiB/s
+QOS_KEYS = ("maxIOPS", "maxBWS", "maxIOPSperGB", "maxBWSperGB")
+# The PowerFlex driver applies the limits itself when it maps the volumes
+CONSUMER = "back-end"
+
+_TIER_NAME = re.compile(r"^[a-z0-9][a-z0-9_-]*$")
+
+
+class Operation(NamedTuple):
+    """Change to the cinder QoS specs or volume types."""
+
+    # create-qos-specs, set-qos-specs, unset-qos-specs, create-volume-type,
+    # set-volume-type, disassociate or associate
+    action: str
+    # Name of the QoS specs or volume type changed
+    name: str
+    data: dict
+
+    def describe(self) -> str:
+        """Describe the operation in a human readable way."""
+        details = ", ".join(
+            "{}={}".format(key, ",".join(value) if isinstance(value, list) else value)
+            for key, value in sorted(self.data.items())
+        )
+        return f"{self.action} {self.name}" + (f" ({details})" if details else "")
+
+
+def parse_tiers(raw: Optional[str]) -> Dict[str, Dict[str, str]]:
+    """Parse the QoS tiers option.
+
+    :param raw: the YAML mapping of the limits keyed by tier name
+    :return: the limits of each tier, as the strings cinder stores
+    :raises ValueError: when the option is malformed or a limit is invalid
+    """
+    if not raw or not raw.strip():
+        return {}
+
+    try:
+        declared = yaml.safe_load(raw)
+    except yaml.YAMLError as e:
+        raise ValueError(f"not valid YAML: {e}") from e
+    if not isinstance(declared, dict):
+        raise ValueError("expected a mapping of tiers")
+
+    tiers = {}
+    for tier, limits in declared.items():
+        if not isinstance(tier, str) or not _TIER_NAME.match(tier):
+            raise ValueError(f"invalid tier name {tier!r}")
+        if not isinstance(limits, dict) or not limits:
+            raise ValueError(f"tier {tier} sets no limit")
+        unknown = sorted(set(limits) - set(QOS_KEYS))
+        if unknown:
+            raise ValueError("tier {}: unknown limits {}".format(tier, ", ".join(unknown)))
+        for key, value in limits.items():
+            if isinstance(value, bool) or not isinstance(value, int) or value < 1:
+                raise ValueError(f"tier {tier}: {key} is not a positive integer")
+        tiers[tier] = {key: str(value) for key, value in limits.items()}
+
+    return tiers
+
+
+def plan(
+    tiers: Dict[str, Dict[str, str]],
+    backend_names: Iterable[str],
+    qos_specs: List[dict],
+    volume_types: List[dict],
+) -> List[Operation]:
+    """Return the operations bringing cinder in line with the QoS tiers.
+
+    Keys, extra specs, QoS specs and volume types which are not part of the
+    tiers are left untouched.
+
+    :param tiers: the limits of each tier
+    :param backend_names: the volume backend names the volume types are bound to
+    :param qos_specs: the existing QoS specs
+    :param volume_types: the existing volume types
+    :return: the operations, the QoS specs and volume types created first
+    """
+    specs_by_name = {specs["name"]: specs for specs in qos_specs}
+    types_by_name = {volume_type["name"]: volume_type for volume_type in volume_types}
+
+    changes, associations = [], []
+    for backend_name in sorted(set(backend_names)):
+        for tier, limits in sorted(tiers.items()):
+            name = f"{backend_name}-{tier}"
+            wanted = {"consumer": CONSUMER, **limits}
+            specs = specs_by_name.get(name)
+            if specs is None:
+                changes.append(Operation("create-qos-specs", name, dict(limits)))
+            else:
+                current = {"consumer": specs.get("consumer"), **(specs.get("specs") or {})}
+                updated = {
+                    key: value for key, value in wanted.items() if current.get(key) != value
+                }
+                if updated:
+                    changes.append(Operation("set-qos-specs", name, updated))
+                # Limits removed from the tier are removed from the specs
+                removed = sorted(key for key in current if key in QOS_KEYS and key not in limits)
+                if removed:
+                    changes.append(Operation("unset-qos-specs", name, {"keys": removed}))
+
+            extra_specs = {"volume_backend_name": backend_name}
+            volume_type = types_by_name.get(name)
+            if volume_type is None:
+                changes.append(Operation("create-volume-type", name, extra_specs))
+            elif (volume_type.get("extra_specs") or {}).get("volume_backend_name") != backend_name:
+                changes.append(Operation("set-volume-type", name, extra_specs))
+
+            associated = volume_type.get("qos_specs_id") if volume_type else None
+            if specs is None or associated != specs["id"]:
+                if associated:
+                    associations.append(
+                        Operation("disassociate", name, {"qos-specs-id": associated})
+                    )
+                associations.append(Operation("associate", name, {"qos-specs": name}))
+
+    return changes + associations
+
+
+def apply(client, operations: List[Operation], qos_specs: List[dict], volume_types: List[dict]):
+    """Run the planned operations.
+
+    :param client: the cinder_client.CinderClient to use
+    :param operations: the operations returned by plan()
+    :param qos_specs: the existing QoS specs given to plan()
+    :param volume_types: the existing volume types given to plan()
+    :raises cinder_client.OpenStackError: when an operation fails
+    """
+    specs_ids = {specs["name"]: specs["id"] for specs in qos_specs}
+    type_ids = {volume_type["name"]: volume_type["id"] for volume_type in volume_types}
+    for operation in operations:
+        name, data = operation.name, operation.data
+        if operation.action == "create-qos-specs":
+            specs_ids[name] = client.create_qos_specs(name, CONSUMER, data)["id"]
+        elif operation.action == "set-qos-specs":
+            client.set_qos_keys(specs_ids[name], data)
+        elif operation.action == "unset-qos-specs":
+            client.unset_qos_keys(specs_ids[name], data["keys"])
+        elif operation.action == "create-volume-type":
+            type_ids[name] = client.create_volume_type(name, data)["id"]
+        elif operation.action == "set-volume-type":
+            client.set_extra_specs(type_ids[name], data)
+        elif operation.action == "disassociate":
+            client.disassociate_qos(data["qos-specs-id"], type_ids[name])
+        elif operation.action == "associate":
+            client.associate_qos(specs_ids[data["qos-specs"]], type_ids[name])
+        else:
+            raise ValueError(f"unknown operation {operation.action}")
+
+
+def sync(
+    client, tiers: Dict[str, Dict[str, str]], backend_names: Iterable[str], dry_run: bool = False
+) -> List[Operation]:
+    """Create or update the QoS specs and volume types of the tiers.
+
+    :param client: the cinder_client.CinderClient to use
+    :param tiers: the limits of each tier
+    :param backend_names: the volume backend names the volume types are bound to
+    :param dry_run: only plan the operations when True
+    :return: the operations run, or which would run in a dry run
+    :raises cinder_client.OpenStackError: when cinder cannot be queried or updated
+    """
+    qos_specs = client.qos_specs()
+    volume_types = client.volume_types()
+    operations = plan(tiers, backend_names, qos_specs, volume_types)
+    if not dry_run:
+        apply(client, operations, qos_specs, volume_types)
+    return operations
@@ -0,0 +1,133 @@
+# Copyright 2024 Canonical Ltd
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Replication device of a backend, and the checks run before switching it."""
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, NamedTuple, Optional
+
+# Keys every replication device sets
+REQUIRED_KEYS = ("backend_id", "san_ip", "san_login", "san_password")
+# Older documentation of the charm spelled backend_id without underscore
+_ALIASES = {"backendid": "backend_id"}
+
+# backend_id failing a backend back to its primary system
+DEFAULT_BACKEND_ID = "default"
+# Replication status of the cinder-volume services once switched
+FAILED_OVER = "failed-over"
+ENABLED = "enabled"
+
+
+class ReplicationDevice(NamedTuple):
+    """Remote PowerFlex system the volumes of a backend are replicated to."""
+
+    backend_id: str
+    san_ip: str
+    san_login: str
+    san_password: str
+    # Every key of the device, in the configured order
+    options: Dict[str, str]
+
+
+class Check(NamedTuple):
+    """Outcome of a preflight check."""
+
+    ok: bool
+    detail: str
+    seconds: float
+
+
+def parse_replication_device(raw: Optional[str]) -> Optional[ReplicationDevice]:
+    """Parse a replication device of the form key:value,key:value,...
+
+    The keys may be given in any order and the values may hold colons.
+
+    :param raw: the replication device, e.g.
+                "backend_id:acme,san_ip:10.20.30.41,san_login:admin,san_password:secret"
+    :return: the replication device, None when raw is empty
+    :raises ValueError: when an item is malformed, a key is repeated or missing
+    """
+    if not raw or not raw.strip():
+        return None
+
+    options = {}
+    for index, item in enumerate(raw.split(","), 1):
+        key, sep, value = item.partition(":")
+        key, value = key.strip(), value.strip()
+        key = _ALIASES.get(key, key)
+        if not sep or not key or not value:
+            # The item is not echoed as it may be a part of the password
+            raise ValueError(f"item {index} is not of the form key:value")
+        if key in options:
+            raise ValueError(f"{key} is set twice")
+        options[key] = value
+
+    missing = [key for key in REQUIRED_KEYS if key not in options]
+    if missing:
+        raise ValueError("missing {}".format(", ".join(missing)))
+
+    return ReplicationDevice(
+        options["backend_id"],
+        options["san_ip"],
+        options["san_login"],
+        options["san_password"],
+        options,
+    )
+
+
+def format_replication_device(device: ReplicationDevice) -> str:
+    """Return the replication_device value cinder expects."""
+    return ",".join(f"{key}:{value}" for key, value in device.options.items())
+
+
+def run_checks(checks: Dict[str, Callable[[], str]]) -> Dict[str, Check]:
+    """Run the checks concurrently.
+
+    :param checks: functions returning a description of their success, or
+                   raising an exception describing their failure, keyed by name
+    :return: the outcome of each check keyed by name
+    """
+
+    def run(check: Callable[[], str]) -> Check:
+        start = time.monotonic()
+        try:
+            detail, ok = check(), True
+        except Exception as e:
+            detail, ok = str(e) or e.__class__.__name__, False
+        return Check(ok, detail, time.monotonic() - start)
+
+    if not checks:
+        return {}
+    with ThreadPoolExecutor(max_workers=len(checks)) as executor:
+        futures = {name: executor.submit(run, check) for name, check in checks.items()}
+    return {name: future.result() for name, future in futures.items()}
+
+
+def wait_for(condition: Callable[[], bool], timeout: float, interval: float = 5.0) -> bool:
+    """Wait until condition() is true.
+
+    :param condition: the function polled
+    :param timeout: the number of seconds after which to give up
+    :param interval: the number of seconds between two polls
+    :return: whether the condition became true in time
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        if condition():
+            return True
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return False
+        time.sleep(min(interval, remaining))
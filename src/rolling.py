@@ -0,0 +1,84 @@
+# Copyright 2024 Canonical Ltd
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Scheduling of the rolling SDC upgrades of the units of the application.
+
+Each unit publishes the state of its SDC upgrade on the peer relation and
+the leader grants upgrade slots to the waiting units, never letting more
+than the configured number of units upgrade at once. A unit keeps its slot
+until its upgrade passed the health gate, so a failed upgrade holds the
+rollout until it is resolved.
+"""
+
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# A new SDC package is waiting for a slot
+WAITING = "waiting"
+# The unit holds a slot and installs the package
+UPGRADING = "upgrading"
+# The package is installed, the unit waits for scini and its volumes
+VERIFYING = "verifying"
+# The upgrade passed the health gate
+DONE = "done"
+# The installation failed
+FAILED = "failed"
+
+# States holding an upgrade slot
+IN_PROGRESS = (UPGRADING, VERIFYING, FAILED)
+
+
+def unit_sort_key(unit: str) -> Tuple[str, int]:
+    """Order unit names by application then unit number, e.g. app/2 before app/10."""
+    application, _, number = unit.rpartition("/")
+    return application, int(number) if number.isdigit() else -1
+
+
+def grant(
+    states: Dict[str, Optional[str]], granted: Iterable[str], max_concurrent: int
+) -> List[str]:
+    """Return the units allowed to upgrade their SDC.
+
+    :param states: the upgrade state of every unit keyed by unit name
+    :param granted: the units granted a slot so far
+    :param max_concurrent: the maximum number of units upgrading at once,
+                           no limit when lower than 1
+    :return: the units holding a slot, the granted units first
+    """
+    # Units keep their slot until their upgrade is done or they leave
+    kept = [unit for unit in granted if states.get(unit) in (WAITING,) + IN_PROGRESS]
+    candidates = sorted(
+        (unit for unit, state in states.items() if state == WAITING and unit not in kept),
+        key=unit_sort_key,
+    )
+    if max_concurrent < 1:
+        return kept + candidates
+    return kept + candidates[: max(max_concurrent - len(kept), 0)]
+
+
+def is_healthy(
+    scini_running: bool, volumes_before: Iterable[str], volumes_after: Optional[Iterable[str]]
+) -> bool:
+    """Indicate whether an upgraded unit passes the health gate.
+
+    :param scini_running: whether the scini service runs
+    :param volumes_before: the volumes mapped before the upgrade
+    :param volumes_after: the volumes mapped now, None when unknown
+    :return: True when scini runs and every volume is mapped again
+    """
+    if not scini_running:
+        return False
+    before = set(volumes_before)
+    if not before:
+        return True
+    return volumes_after is not None and before <= set(volumes_after)
@@ -0,0 +1,273 @@
+# Copyright 2024 Canonical Ltd
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Helpers for managing the PowerFlex SDC package on the host."""
+
+import contextlib
+import hashlib
+import logging
+import os
+import re
+import socket
+import subprocess
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Read the package in 1MiB chunks so large packages are never fully loaded in memory
+CHUNK_SIZE = 1024 * 1024
+
+# TCP port the MDMs listen on for SDC connections
+MDM_PORT = 9011
+
+# Runtime parameters of the loaded scini kernel module
+SCINI_PARAMETERS_DIR = Path("/sys/module/scini/parameters")
+# Parameters used when the scini kernel module is loaded
+SCINI_MODPROBE_CONF = Path("/etc/modprobe.d/scini.conf")
+# Database of the state of the Debian packages, maintained by dpkg
+DPKG_STATUS = Path("/var/lib/dpkg/status")
+
+_PARAMETER_NAME = re.compile(r"^[a-z][a-z0-9_]*$")
+_PARAMETER_VALUE = re.compile(r"^[A-Za-z0-9_.:-]+$")
+
+
+class DebPackage(NamedTuple):
+    """Name and version of a Debian package."""
+
+    name: str
+    version: str
+
+
+class MdmProbe(NamedTuple):
+    """Outcome of a connection attempt to an MDM."""
+
+    address: str
+    latency: Optional[float] = None
+    error: Optional[str] = None
+
+
+def file_sha256(path: Path) -> str:
+    """Return the SHA-256 checksum of a file, reading it in chunks.
+
+    :param path: the file to checksum
+    :return: the hexadecimal digest of the file content
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def deb_package_info(path: Path) -> Optional[DebPackage]:
+    """Return the name and version of a Debian package file.
+
+    :param path: the Debian package file
+    :return: the DebPackage read from the package control data, or None
+             when it could not be read
+    """
+    result = subprocess.run(
+        ["dpkg-deb", "--show", "--showformat=${Package}\\t${Version}", str(path)],
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        logger.warning("Unable to read the package information of %s: %s", path, result.stderr)
+        return None
+
+    name, _, version = result.stdout.strip().partition("\t")
+    if not name or not version:
+        return None
+
+    return DebPackage(name, version)
+
+
+def _dpkg_stanzas(lines: Iterable[str], package: str) -> Iterator[Dict[str, str]]:
+    """Yield the Status and Version fields of the stanzas of a package."""
+    fields = None
+    for line in lines:
+        line = line.rstrip("\n")
+        if fields is None:
+            if line == f"Package: {package}":
+                fields = {}
+        elif not line:
+            yield fields
+            fields = None
+        elif line.startswith("Status: "):
+            # Status: <want> <error flag> <status>
+            fields["status"] = line.split()[-1]
+        elif line.startswith("Version: "):
+            fields["version"] = line.partition(" ")[2]
+    if fields is not None:
+        yield fields
+
+
+def dpkg_status(package: str, status_file: Optional[Path] = None) -> Optional[Tuple[str, str]]:
+    """Read the state of a package from the dpkg database, without running dpkg.
+
+    :param package: the name of the package
+    :param status_file: the dpkg status file
+    :return: the package status (e.g. installed, half-configured) and version,
+             or None when dpkg does not know the package
+    :raises OSError: when the status file cannot be read
+    """
+    found = None
+    with open(status_file or DPKG_STATUS, encoding="utf-8", errors="replace") as f:
+        # Several stanzas share the name of a multi-arch package
+        for fields in _dpkg_stanzas(f, package):
+            if fields.get("status") in (None, "not-installed"):
+                continue
+            found = fields
+            if found["status"] == "installed":
+                break
+
+    if not found:
+        return None
+    return found["status"], found.get("version", "")
+
+
+def split_mdm_ips(mdm_ips: Optional[str]) -> List[str]:
+    """Return the addresses of a comma separated list of MDM IPs."""
+    return [address.strip() for address in (mdm_ips or "").split(",") if address.strip()]
+
+
+def probe_mdm(address: str, port: int = MDM_PORT, timeout: float = 2.0) -> MdmProbe:
+    """Measure the time taken to open a TCP connection to an MDM.
+
+    :param address: the IP address or hostname of the MDM
+    :param port: the MDM port
+    :param timeout: the maximum number of seconds to wait for the connection
+    :return: the MdmProbe holding either the latency in seconds or the error
+    """
+    start = time.monotonic()
+    try:
+        with socket.create_connection((address, port), timeout=timeout):
+            return MdmProbe(address, latency=time.monotonic() - start)
+    except OSError as e:
+        return MdmProbe(address, error=str(e) or e.__class__.__name__)
+
+
+def probe_mdms(addresses: List[str], port: int = MDM_PORT, timeout: float = 2.0) -> List[MdmProbe]:
+    """Probe all MDMs concurrently.
+
+    :param addresses: the IP addresses or hostnames of the MDMs
+    :param port: the MDM port
+    :param timeout: the maximum number of seconds to wait for each MDM
+    :return: the reachable MDMs ordered by latency, followed by the
+             unreachable MDMs in their original order
+    """
+    if not addresses:
+        return []
+    if len(addresses) == 1:
+        # No thread is needed to probe a single MDM
+        return [probe_mdm(addresses[0], port, timeout)]
+
+    with ThreadPoolExecutor(max_workers=len(addresses)) as executor:
+        probes = list(executor.map(lambda address: probe_mdm(address, port, timeout), addresses))
+
+    reachable = sorted(((p.latency, i) for i, p in enumerate(probes) if p.latency is not None))
+    return [probes[i] for _, i in reachable] + [p for p in probes if p.latency is None]
+
+
+def parse_module_parameters(parameters: Optional[str]) -> Dict[str, str]:
+    """Parse a comma separated list of name=value scini module parameters.
+
+    :param parameters: the parameters, e.g. "io_queue_depth=64,num_queues=8"
+    :return: the parameter values keyed by name
+    :raises ValueError: when a parameter is malformed
+    """
+    values = {}
+    for item in (parameters or "").split(","):
+        if not item.strip():
+            continue
+
+        name, _, value = (part.strip() for part in item.partition("="))
+        if not _PARAMETER_NAME.match(name) or not _PARAMETER_VALUE.match(value):
+            raise ValueError(f"{item.strip()} is not of the form name=value")
+        values[name] = value
+
+    return values
+
+
+def render_modprobe_conf(parameters: Dict[str, str]) -> str:
+    """Return the modprobe.d content setting the scini module parameters."""
+    if not parameters:
+        return ""
+
+    options = " ".join(f"{name}={value}" for name, value in sorted(parameters.items()))
+    return f"# Managed by the cinder-dell-powerflex charm\noptions scini {options}\n"
+
+
+def apply_module_parameters(
+    parameters: Dict[str, str], parameters_dir: Optional[Path] = None
+) -> Tuple[Dict[str, str], List[str]]:
+    """Apply scini module parameters to the loaded module where possible.
+
+    :param parameters: the parameter values keyed by name
+    :param parameters_dir: the sysfs directory of the module parameters
+    :return: the values in effect for the applied parameters, and the names
+             of the parameters only applied when the module is reloaded
+    """
+    parameters_dir = parameters_dir or SCINI_PARAMETERS_DIR
+    applied = {}
+    pending = []
+    for name, value in sorted(parameters.items()):
+        path = parameters_dir / name
+        try:
+            if path.read_text().strip() != value:
+                if not path.stat().st_mode & 0o200:
+                    pending.append(name)
+                    continue
+                path.write_text(value)
+            applied[name] = path.read_text().strip()
+        except OSError as e:
+            # The module is not loaded, or the parameter is not exposed at
+            # runtime: it takes effect when the module is loaded next
+            logger.info("scini parameter %s not applied at runtime: %s", name, e)
+            pending.append(name)
+
+    return applied, pending
+
+
+def write_file_atomic(path: Path, content: str, perms: int = 0o644) -> bool:
+    """Write content to path atomically, unless the file already holds it.
+
+    :return: True when the file was written
+    """
+    try:
+        if path.read_text() == content:
+            return False
+    except FileNotFoundError:
+        pass
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # A new temporary file is created with owner-only permissions, so that
+    # a secret is never readable before the requested permissions are set
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.")
+    try:
+        with open(fd, "w") as f:
+            os.fchmod(f.fileno(), perms)
+            f.write(content)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.unlink(tmp)
+        raise
+    return True
@@ -0,0 +1,231 @@
+# Copyright 2024 Canonical Ltd
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Collection of the PowerFlex SDC state and volume I/O statistics."""
+
+import re
+import subprocess
+import time
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional
+
+# SDC configuration tool installed by the SDC package
+DRV_CFG = Path("/opt/emc/scaleio/sdc/bin/drv_cfg")
+# MDMs the SDC connects to when scini is loaded
+DRV_CFG_FILE = Path("/etc/emc/scaleio/drv_cfg.txt")
+# Statistics of the block devices, see Documentation/block/stat.rst
+SYS_BLOCK_DIR = Path("/sys/block")
+# udev links naming the scini devices after their MDM and volume IDs
+DISK_BY_ID_DIR = Path("/dev/disk/by-id")
+
+# Unit of the sector counters of /sys/block/*/stat, whatever the device
+SECTOR_SIZE = 512
+
+_VOLUME = re.compile(r"VOL-ID\s+(?P<volume>[0-9a-fA-F]+)\s+MDM-ID\s+(?P<mdm>[0-9a-fA-F]+)")
+_MDM = re.compile(
+    r"MDM-ID\s+(?P<mdm>[0-9a-fA-F]+)\s+SDC ID\s+(?P<sdc>[0-9a-fA-F]+)"
+    r"(?:.*?\bIPs\s+(?P<ips>.*))?"
+)
+_MDM_IP = re.compile(r"\[\d+\]-(\S+)")
+_GUID = re.compile(r"\b[0-9A-Fa-f]{8}(?:-[0-9A-Fa-f]{4}){3}-[0-9A-Fa-f]{12}\b")
+_VOLUME_LINK = re.compile(r"^emc-vol-(?P<mdm>[0-9a-fA-F]+)-(?P<volume>[0-9a-fA-F]+)$")
+
+
+class MappedVolume(NamedTuple):
+    """Volume mapped to the SDC."""
+
+    volume_id: str
+    mdm_id: str
+
+
+class MdmConnection(NamedTuple):
+    """MDM cluster the SDC is connected to."""
+
+    mdm_id: str
+    sdc_id: str
+    ips: List[str]
+
+
+class BlockStat(NamedTuple):
+    """I/O counters of a block device."""
+
+    reads: int
+    read_sectors: int
+    read_ms: int
+    writes: int
+    write_sectors: int
+    write_ms: int
+    in_flight: int
+    io_ms: int
+
+
+def parse_query_vols(output: str) -> List[MappedVolume]:
+    """Parse the output of drv_cfg --query_vols."""
+    return [
+        MappedVolume(m.group("volume").lower(), m.group("mdm").lower())
+        for m in _VOLUME.finditer(output)
+    ]
+
+
+def parse_query_mdms(output: str) -> List[MdmConnection]:
+    """Parse the output of drv_cfg --query_mdms."""
+    connections = []
+    for line in output.splitlines():
+        match = _MDM.search(line)
+        if match:
+            connections.append(
+                MdmConnection(
+                    match.group("mdm").lower(),
+                    match.group("sdc").lower(),
+                    _MDM_IP.findall(match.group("ips") or ""),
+                )
+            )
+    return connections
+
+
+def parse_query_guid(output: str) -> Optional[str]:
+    """Parse the output of drv_cfg --query_guid."""
+    match = _GUID.search(output)
+    return match.group(0).upper() if match else None
+
+
+def parse_block_stat(content: str) -> BlockStat:
+    """Parse the content of /sys/block/<device>/stat.
+
+    :raises ValueError: when the content is not a block device stat line
+    """
+    fields = content.split()
+    if len(fields) < 11:
+        raise ValueError(f"expected at least 11 fields, got {len(fields)}")
+    values = [int(field) for field in fields]
+    return BlockStat(
+        reads=values[0],
+        read_sectors=values[2],
+        read_ms=values[3],
+        writes=values[4],
+        write_sectors=values[6],
+        write_ms=values[7],
+        in_flight=values[8],
+        io_ms=values[9],
+    )
+
+
+def query_drv_cfg(option: str) -> str:
+    """Return the output of drv_cfg run with the given query option.
+
+    :raises OSError: when drv_cfg is missing or fails, e.g. scini is not loaded
+    """
+    result = subprocess.run([str(DRV_CFG), option], capture_output=True, text=True)
+    if result.returncode != 0:
+        raise OSError(f"{DRV_CFG.name} {option} failed: {result.stderr.strip() or result.stdout}")
+    return result.stdout
+
+
+def add_mdm(mdm_ips: List[str]):
+    """Connect the SDC to the MDMs of another PowerFlex system.
+
+    The MDMs are also added to the drv_cfg configuration file, so that the
+    SDC connects to them again when scini is reloaded.
+
+    :param mdm_ips: the IP addresses of the MDMs of the system
+    :raises OSError: when drv_cfg is missing or fails
+    """
+    option = "--add_mdm"
+    result = subprocess.run(
+        [str(DRV_CFG), option, "--ip", ",".join(mdm_ips), "--file", str(DRV_CFG_FILE)],
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise OSError(f"{DRV_CFG.name} {option} failed: {result.stderr.strip() or result.stdout}")
+
+
+def volume_devices(by_id_dir: Optional[Path] = None) -> Dict[str, str]:
+    """Return the scini device names keyed by the ID of their volume."""
+    devices = {}
+    try:
+        links = list((by_id_dir or DISK_BY_ID_DIR).iterdir())
+    except FileNotFoundError:
+        return devices
+    for link in links:
+        match = _VOLUME_LINK.match(link.name)
+        if match:
+            devices[match.group("volume").lower()] = Path(link.resolve()).name
+    return devices
+
+
+def sample(sys_block_dir: Optional[Path] = None) -> Dict[str, BlockStat]:
+    """Return the I/O counters of every scini device keyed by device name."""
+    stats = {}
+    for device in sorted((sys_block_dir or SYS_BLOCK_DIR).glob("scini*")):
+        try:
+            stats[device.name] = parse_block_stat((device / "stat").read_text())
+        except (OSError, ValueError):
+            # The volume was unmapped while sampling
+            continue
+    return stats
+
+
+def rates(before: BlockStat, after: BlockStat, interval: float) -> Dict[str, float]:
+    """Return the I/O rates of a device between two samples.
+
+    :param before: the first sample
+    :param after: the second sample
+    :param interval: the number of seconds between both samples
+    :return: the IOPS, KiB/s, average latency (ms) and utilisation (%)
+    """
+    reads = after.reads - before.reads
+    writes = after.writes - before.writes
+    return {
+        "read-iops": round(reads / interval, 1),
+        "write-iops": round(writes / interval, 1),
+        "read-kib-s": round(
+            (after.read_sectors - before.read_sectors) * SECTOR_SIZE / 1024 / interval, 1
+        ),
+        "write-kib-s": round(
+            (after.write_sectors - before.write_sectors) * SECTOR_SIZE / 1024 / interval, 1
+        ),
+        "read-latency-ms": round((after.read_ms - before.read_ms) / reads, 2) if reads else 0.0,
+        "write-latency-ms": (
+            round((after.write_ms - before.write_ms) / writes, 2) if writes else 0.0
+        ),
+        "util-percent": round(min((after.io_ms - before.io_ms) / interval / 10, 100.0), 1),
+        "in-flight": after.in_flight,
+    }
+
+
+def collect(interval: float) -> dict:
+    """Gather the SDC state and the volume I/O rates over interval seconds.
+
+    :return: the MDM connections, and the I/O rates of each mapped volume
+             keyed by volume ID, or by device name when its volume is unknown
+    :raises OSError: when the SDC cannot be queried
+    """
+    mdms = parse_query_mdms(query_drv_cfg("--query_mdms"))
+    volumes = parse_query_vols(query_drv_cfg("--query_vols"))
+
+    before = sample()
+    time.sleep(interval)
+    after = sample()
+
+    names = {device: volume for volume, device in volume_devices().items()}
+    stats = {
+        names.get(device, device): {
+            "device": device,
+            **rates(before[device], after[device], interval),
+        }
+        for device in sorted(after)
+        if device in before
+    }
+    return {"mdms": mdms, "volumes": volumes, "stats": stats}
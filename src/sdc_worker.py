@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+# Copyright 2024 Canonical Ltd
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Detached worker running the SDC installation outside of a hook.
+
+The worker runs the given command and records its progress in a JSON
+state file which the charm reads from later hooks:
+
+    sdc_worker.py STATE_FILE [--lock LOCK_FILE TIMEOUT] -- COMMAND [ARG ...]
+
+With --lock, the command only runs once the worker holds LOCK_FILE, e.g.
+the dpkg frontend lock, waiting up to TIMEOUT seconds for other package
+managers to release it. The worker runs outside of the Juju machine lock,
+so this keeps it from racing the hooks of other charms running apt or dpkg.
+
+The state is "running" while the command runs, then "succeeded" or
+"failed" along with the exit code and the tail of the command output, or
+"locked" when the lock could not be taken in time and nothing was run.
+Only the standard library is used since the worker outlives the hook.
+"""
+
+import errno
+import fcntl
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Optional
+
+# Number of output characters kept in the state file
+OUTPUT_TAIL = 4000
+# Exit code of the worker when the lock could not be taken, EX_TEMPFAIL
+LOCKED_EXIT_CODE = 75
+# Seconds between two attempts to take the lock
+LOCK_INTERVAL = 1
+
+
+def write_state(path: Path, state: dict):
+    """Atomically replace the state file content."""
+    with tempfile.NamedTemporaryFile(
+        "w", dir=path.parent, prefix=f".{path.name}.", delete=False
+    ) as f:
+        json.dump(state, f)
+    os.replace(f.name, path)
+
+
+def acquire_lock(path: Path, timeout: float) -> Optional[int]:
+    """Take an exclusive fcntl lock on path, as dpkg and apt do.
+
+    :param path: the lock file
+    :param timeout: the number of seconds to wait for the lock
+    :return: the file descriptor holding the lock, or None on timeout
+    """
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o640)
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            fcntl.lockf(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return fd
+        except OSError as e:
+            if e.errno not in (errno.EACCES, errno.EAGAIN):
+                os.close(fd)
+                raise
+        if time.monotonic() >= deadline:
+            os.close(fd)
+            return None
+        time.sleep(LOCK_INTERVAL)
+
+
+def run(
+    state_file: Path,
+    command: list,
+    lock_file: Optional[Path] = None,
+    lock_timeout: float = 0,
+) -> int:
+    """Run command, recording its progress in state_file.
+
+    :param state_file: the file the progress is recorded in
+    :param command: the command to run
+    :param lock_file: a lock file held while the command runs
+    :param lock_timeout: the number of seconds to wait for the lock
+    :return: the exit code of the command
+    """
+    state = {"state": "running", "pid": os.getpid(), "started_at": time.time()}
+    write_state(state_file, state)
+
+    lock = None
+    if lock_file is not None:
+        lock = acquire_lock(lock_file, lock_timeout)
+        if lock is None:
+            state.update(
+                state="locked",
+                exit_code=LOCKED_EXIT_CODE,
+                stderr=f"{lock_file} still locked after {lock_timeout} seconds",
+                finished_at=time.time(),
+            )
+            write_state(state_file, state)
+            return LOCKED_EXIT_CODE
+
+    try:
+        result = subprocess.run(command, capture_output=True, text=True)
+        exit_code, stdout, stderr = result.returncode, result.stdout, result.stderr
+    except OSError as e:
+        exit_code, stdout, stderr = 127, "", str(e)
+    finally:
+        if lock is not None:
+            os.close(lock)
+
+    state.update(
+        state="succeeded" if exit_code == 0 else "failed",
+        exit_code=exit_code,
+        stdout=stdout[-OUTPUT_TAIL:],
+        stderr=stderr[-OUTPUT_TAIL:],
+        finished_at=time.time(),
+    )
+    write_state(state_file, state)
+    return exit_code
+
+
+def main(argv: list) -> int:
+    """Parse the command line and run the worker."""
+    lock_file, lock_timeout = None, 0.0
+    if argv[1:2] == ["--lock"]:
+        try:
+            lock_file, lock_timeout = Path(argv[2]), float(argv[3])
+        except (IndexError, ValueError):
+            argv = []
+        argv = argv[:1] + argv[4:]
+
+    if len(argv) < 3 or argv[1] != "--":
+        print(__doc__, file=sys.stderr)
+        return 2
+
+    return run(Path(argv[0]), argv[2:], lock_file, lock_timeout)
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
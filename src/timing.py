@@ -0,0 +1,138 @@
+# Copyright 2024 Canonical Ltd
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Hook latency instrumentation kept in a bounded on-disk ring buffer."""
+
+import functools
+import json
+import logging
+import math
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List
+
+logger = logging.getLogger(__name__)
+
+# Number of samples kept for each phase, older samples are discarded first
+DEFAULT_CAPACITY = 100
+
+
+def timed(phase: str):
+    """Decorate a charm method so its duration is recorded under phase.
+
+    The decorated method's instance must provide a ``timer`` attribute
+    holding a HookTimer.
+    """
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(self, *args, **kwargs):
+            with self.timer.span(phase):
+                return func(self, *args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+class HookTimer:
+    """Collect the duration of the phases of a hook and persist them."""
+
+    def __init__(self, path: Path, hook: str, capacity: int = DEFAULT_CAPACITY):
+        self.path = Path(path)
+        self.hook = hook
+        self.capacity = capacity
+        self.spans: List[tuple[str, float]] = []
+        self._started = time.monotonic()
+
+    @contextmanager
+    def span(self, phase: str) -> Iterator[None]:
+        """Time the enclosed block and record it under phase."""
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.spans.append((phase, time.monotonic() - start))
+
+    def flush(self):
+        """Append the recorded spans and the hook duration to the ring buffer."""
+        spans = self.spans + [(f"hook-{self.hook}", time.monotonic() - self._started)]
+        self.spans = []
+
+        samples = load(self.path)
+        for phase, duration in spans:
+            samples.setdefault(phase, []).append(round(duration, 6))
+        for phase, durations in samples.items():
+            del durations[: -self.capacity]
+
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with tempfile.NamedTemporaryFile(
+                "w", dir=self.path.parent, prefix=f".{self.path.name}.", delete=False
+            ) as f:
+                json.dump(samples, f)
+            os.replace(f.name, self.path)
+        except OSError as e:
+            # Instrumentation must never be the reason a hook fails
+            logger.warning("Unable to save hook timings to %s: %s", self.path, e)
+
+
+def load(path: Path) -> Dict[str, List[float]]:
+    """Return the durations recorded for each phase.
+
+    :param path: the ring buffer file
+    :return: the list of durations, in seconds, keyed by phase
+    """
+    try:
+        with open(path) as f:
+            samples = json.load(f)
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        logger.warning("Discarding unreadable hook timings in %s: %s", path, e)
+        return {}
+
+    if not isinstance(samples, dict):
+        return {}
+
+    return samples
+
+
+def percentile(durations: List[float], pct: float) -> float:
+    """Return the nearest-rank percentile of a list of durations."""
+    ordered = sorted(durations)
+    rank = max(math.ceil(pct / 100 * len(ordered)), 1)
+    return ordered[rank - 1]
+
+
+def summarize(samples: Dict[str, List[float]]) -> Dict[str, Dict[str, float]]:
+    """Return the count, p50, p95 and max duration of each phase.
+
+    :param samples: the durations keyed by phase, as returned by load()
+    :return: the statistics keyed by phase, durations are in milliseconds
+    """
+    summary = {}
+    for phase, durations in sorted(samples.items()):
+        if not durations:
+            continue
+        summary[phase] = {
+            "count": len(durations),
+            "p50": round(percentile(durations, 50) * 1000, 3),
+            "p95": round(percentile(durations, 95) * 1000, 3),
+            "max": round(max(durations) * 1000, 3),
+        }
+    return summary
@@ -0,0 +1,120 @@
+# Copyright 2024 Canonical Ltd
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Performance profiles expanding into cinder backend options."""
+
+from typing import Callable, Dict, Optional, Union
+
+OptionValue = Union[str, int, bool]
+
+
+def _positive_int(value: str) -> int:
+    number = int(value)
+    if number < 1:
+        raise ValueError(f"{value} is not a positive integer")
+    return number
+
+
+def _non_negative_int(value: str) -> int:
+    number = int(value)
+    if number < 0:
+        raise ValueError(f"{value} is a negative integer")
+    return number
+
+
+def _bool(value: str) -> bool:
+    if value.lower() in ("true", "yes", "1"):
+        return True
+    if value.lower() in ("false", "no", "0"):
+        return False
+    raise ValueError(f"{value} is not a boolean")
+
+
+# Backend options which may be tuned, with the parser validating their value
+TUNABLE_OPTIONS: Dict[str, Callable[[str], OptionValue]] = {
+    # Size of the native threads pool running the driver calls
+    "backend_native_threads_pool_size": _positive_int,
+    # Bandwidth limit, in bytes per second, of volume copies (0 is unlimited)
+    "volume_copy_bps_limit": _non_negative_int,
+    # Unmap volumes from all SDCs before deleting them
+    "powerflex_unmap_volume_before_deletion": _bool,
+    # Timeouts, in seconds, of each PowerFlex Gateway REST call
+    "rest_api_connect_timeout": _positive_int,
+    "rest_api_read_timeout": _positive_int,
+}
+
+PROFILES: Dict[str, Dict[str, OptionValue]] = {
+    # Driver and charm defaults
+    "default": {},
+    # Many concurrent volume operations, e.g. create/delete bursts
+    "high-throughput": {
+        "backend_native_threads_pool_size": 60,
+        "volume_copy_bps_limit": 0,
+        "powerflex_unmap_volume_before_deletion": False,
+        "rest_api_connect_timeout": 30,
+        "rest_api_read_timeout": 120,
+    },
+    # Fast failure and short queues for interactive workloads
+    "low-latency": {
+        "backend_native_threads_pool_size": 40,
+        "powerflex_unmap_volume_before_deletion": False,
+        "rest_api_connect_timeout": 10,
+        "rest_api_read_timeout": 30,
+    },
+}
+
+
+def profile_options(profile: Optional[str]) -> Dict[str, OptionValue]:
+    """Return the backend options of a performance profile.
+
+    :param profile: the name of the profile, the default profile when empty
+    :return: the backend options keyed by option name
+    :raises ValueError: when the profile is unknown
+    """
+    if not profile:
+        return {}
+
+    if profile not in PROFILES:
+        raise ValueError(
+            "unknown profile {}, expected one of {}".format(profile, ", ".join(PROFILES))
+        )
+
+    return dict(PROFILES[profile])
+
+
+def parse_overrides(overrides: Optional[str]) -> Dict[str, OptionValue]:
+    """Parse a comma separated list of option=value overrides.
+
+    :param overrides: the overrides, e.g. "rest_api_read_timeout=60"
+    :return: the validated backend options keyed by option name
+    :raises ValueError: when an override is malformed, unknown or invalid
+    """
+    options = {}
+    for item in (overrides or "").split(","):
+        if not item.strip():
+            continue
+
+        name, sep, value = item.partition("=")
+        name, value = name.strip(), value.strip()
+        if not sep or not value:
+            raise ValueError(f"{item.strip()} is not of the form option=value")
+        if name not in TUNABLE_OPTIONS:
+            raise ValueError(f"{name} cannot be tuned")
+
+        try:
+            options[name] = TUNABLE_OPTIONS[name](value)
+        except ValueError as e:
+            raise ValueError(f"invalid {name}: {e}") from e
+
+    return options
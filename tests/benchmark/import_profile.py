@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+# Copyright 2024 Canonical Ltd
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Report the import time of the charm entry point.
+
+The charm module is imported in fresh interpreters with -X importtime and
+the median of the runs is reported, first the total, then the modules with
+the highest cumulative and self import times.
+
+    python tests/benchmark/import_profile.py [--runs 5] [--top 15] [module]
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+SRC_DIR = Path(__file__).parents[2] / "src"
+
+
+def profile(module: str) -> dict:
+    """Import module in a fresh interpreter and return its import times.
+
+    :param module: the name of the module to import
+    :return: (self, cumulative) import times in microseconds keyed by module
+    """
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [str(SRC_DIR), env.get("PYTHONPATH")]))
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        env=env,
+        check=True,
+    )
+
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|")
+        times[name.strip()] = (int(self_us), int(cumulative_us))
+    return times
+
+
+def main():
+    """Print the import time report."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("module", nargs="?", default="charm")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    runs = [profile(args.module) for _ in range(args.runs)]
+    modules = set().union(*runs)
+    median = {
+        name: (
+            statistics.median(run.get(name, (0, 0))[0] for run in runs),
+            statistics.median(run.get(name, (0, 0))[1] for run in runs),
+        )
+        for name in modules
+    }
+
+    print(f"import {args.module}: {median[args.module][1] / 1000:.1f}ms (median of {args.runs})")
+    for title, index in (("cumulative", 1), ("self", 0)):
+        print(f"\nTop {args.top} modules by {title} import time:")
+        ranked = sorted(median.items(), key=lambda item: item[1][index], reverse=True)
+        for name, times in ranked[: args.top]:
+            print(f"  {times[index] / 1000:8.1f}ms  {name}")
+
+
+if __name__ == "__main__":
+    main()
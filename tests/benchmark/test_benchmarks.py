@@ -0,0 +1,186 @@
+# Copyright 2024 Canonical Ltd
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Latency benchmarks of the charm hot paths.
+
+Each benchmark is compared with the baseline stored in baselines.json and
+fails when it is slower than the baseline by more than the threshold
+factor, plus a small absolute allowance absorbing timer noise on
+sub-millisecond paths. Baselines are in microseconds and are scaled up by
+a calibration workload timed next to each benchmark, so that a slower or
+busier machine does not report a regression. Set
+BENCHMARK_THRESHOLD to change the factor (default 1.5),
+BENCHMARK_NOISE_US to change the allowance (default 50) and
+BENCHMARK_UPDATE_BASELINES=1 to record new baselines instead.
+"""
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+import ops
+import ops.testing
+from import_profile import profile
+
+from charm import CinderPowerflexCharm
+from sdc import MdmProbe
+
+BASELINES_FILE = Path(__file__).parent / "baselines.json"
+THRESHOLD = float(os.environ.get("BENCHMARK_THRESHOLD", "1.5"))
+NOISE_US = float(os.environ.get("BENCHMARK_NOISE_US", "50"))
+UPDATE_BASELINES = os.environ.get("BENCHMARK_UPDATE_BASELINES") == "1"
+ROUNDS = 7
+ITERATIONS = 50
+
+
+def measure(func, iterations: int = ITERATIONS, rounds: int = ROUNDS) -> float:
+    """Return the fastest duration, in microseconds, of a single call of func."""
+    func()
+    durations = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for _ in range(iterations):
+            func()
+        durations.append((time.perf_counter() - start) / iterations)
+    return round(min(durations) * 1e6, 1)
+
+
+def calibrate() -> float:
+    """Return the duration, in microseconds, of a fixed reference workload."""
+    payload = {f"option-{i}": [i, str(i), i % 2 == 0] for i in range(50)}
+    return measure(lambda: json.loads(json.dumps(payload)))
+
+
+class BenchmarkTestCase(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.baselines = json.loads(BASELINES_FILE.read_text()) if BASELINES_FILE.exists() else {}
+        cls.results = {}
+
+    @classmethod
+    def tearDownClass(cls):
+        if UPDATE_BASELINES:
+            baselines = {**cls.baselines, **cls.results}
+            BASELINES_FILE.write_text(json.dumps(baselines, indent=2, sort_keys=True) + "\n")
+
+    def assert_within_baseline(self, name: str, duration: float):
+        """Check the measured duration against the stored baseline."""
+        calibration = calibrate()
+        self.results[name] = duration
+        self.results["calibration"] = min(
+            calibration, self.results.get("calibration", calibration)
+        )
+        baseline = self.baselines.get(name)
+        if UPDATE_BASELINES or baseline is None:
+            self.skipTest(f"recorded {name} baseline: {duration}us")
+
+        speed = max(calibration / self.baselines.get("calibration", calibration), 1.0)
+        self.assertLessEqual(
+            duration,
+            baseline * speed * THRESHOLD + NOISE_US,
+            f"{name} took {duration}us, baseline is {baseline}us "
+            f"(machine speed x{speed:.2f}, threshold x{THRESHOLD} + {NOISE_US}us)",
+        )
+
+
+class TestImportTime(BenchmarkTestCase):
+    def test_import_charm(self):
+        durations = [profile("charm")["charm"][1] for _ in range(ROUNDS)]
+        self.assert_within_baseline("import_charm", min(durations))
+
+    def test_import_defers_templating(self):
+        """Test importing the charm does not load the templating modules."""
+        result = subprocess.run(
+            [
+                sys.executable,
+                "-c",
+                "import sys, charm; "
+                "print([m for m in ('jinja2', 'charmhelpers.core.templating') "
+                "if m in sys.modules])",
+            ],
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        self.assertEqual(result.stdout.strip(), "[]")
+
+
+class TestBenchmarks(BenchmarkTestCase):
+    def setUp(self):
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        for patcher in (
+            patch.object(CinderPowerflexCharm, "_state_dir", Path(tmpdir.name)),
+            patch("ops_openstack.plugins.classes.CinderStoragePluginCharm.install_pkgs"),
+            patch("charmhelpers.core.host.mkdir"),
+            patch("charmhelpers.contrib.openstack.utils.service_running", return_value=True),
+            patch("charm.service_running", return_value=True),
+            patch("charm.render", return_value="content"),
+            patch("charm.CONNECTOR_DIR", tmpdir.name),
+            patch("charm.SYSTEMD_DIR", tmpdir.name),
+            patch("gateway.PowerFlexGateway.probe", return_value=0.001),
+            patch("sdc.probe_mdm", side_effect=lambda address, *args: MdmProbe(address, 0.001)),
+            patch("sdc.SCINI_MODPROBE_CONF", Path(tmpdir.name) / "scini.conf"),
+            patch(
+                "subprocess.run",
+                return_value=MagicMock(returncode=0, stdout="", stderr=""),
+            ),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        self.harness = ops.testing.Harness(CinderPowerflexCharm)
+        self.addCleanup(self.harness.cleanup)
+        self.harness.set_leader(True)
+        self.harness.add_resource("sdc-deb-package", "test-content")
+        self.harness.update_config(
+            {
+                "powerflexgw-ip": "10.0.0.1",
+                "powerflex-sdc-mdm-ips": "10.0.0.2",
+                "powerflex-replication-config": (
+                    "backend_id:acme,san_ip:10.0.0.3,san_login:admin,san_password:password"
+                ),
+            }
+        )
+        self.harness.begin()
+        self.harness.add_relation("storage-backend", "cinder-volume", unit_data={"nonce": ""})
+        self.charm = self.harness.charm
+
+    def test_cinder_configuration(self):
+        config = dict(self.charm.config)
+        duration = measure(lambda: self.charm.cinder_configuration(config))
+        self.assert_within_baseline("cinder_configuration", duration)
+
+    def test_create_connector(self):
+        duration = measure(self.charm.create_connector)
+        self.assert_within_baseline("create_connector", duration)
+
+    def test_status_checks(self):
+        duration = measure(self.charm.update_status)
+        self.assert_within_baseline("update_status", duration)
+
+    def test_hook_cycle(self):
+        def cycle():
+            self.charm.on.install.emit()
+            self.charm.on.config_changed.emit()
+            self.charm.on.update_status.emit()
+
+        duration = measure(cycle, iterations=10)
+        self.assert_within_baseline("install_config_changed_update_status", duration)
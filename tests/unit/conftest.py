@@ -0,0 +1,314 @@
+# Copyright 2024 Canonical Ltd
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Stand-in REST services shared by the unit tests."""
+
+import base64
+import json
+import threading
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+
+
+class FakeGatewayHandler(BaseHTTPRequestHandler):
+    """Stand-in for the PowerFlex Gateway REST API."""
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _credentials(self):
+        encoded = self.headers.get("Authorization", "").removeprefix("Basic ")
+        return base64.b64decode(encoded).decode().partition(":")[::2]
+
+    def _reply(self, status, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def handle_one_request(self):
+        self.server.requests += 1
+        super().handle_one_request()
+
+    def setup(self):
+        super().setup()
+        self.server.connections += 1
+
+    def do_GET(self):
+        user, secret = self._credentials()
+        if self.path == "/api/login":
+            self.server.logins += 1
+            if (user, secret) == ("admin", "secret"):
+                self._reply(200, "token-1")
+            else:
+                self._reply(401, {"message": "Unauthorized"})
+        elif secret != "token-1":
+            self._reply(401, {"message": "Unauthorized"})
+        elif self.path == "/api/version":
+            self._reply(200, "4.5")
+        elif self.path == "/api/types/Sdc/instances":
+            self._reply(200, list(self.server.sdcs.values()))
+        elif self.path.startswith("/api/instances/Sdc::"):
+            sdc = self.server.sdcs.get(self.path.removeprefix("/api/instances/Sdc::"))
+            self._reply(200 if sdc else 404, sdc or {"message": "Not found"})
+        else:
+            self._reply(404, {"message": "Not found"})
+
+    def do_POST(self):
+        _, secret = self._credentials()
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or "null")
+        sdc_id, _, action = self.path.removeprefix("/api/instances/Sdc::").partition("/")
+        if secret != "token-1":
+            self._reply(401, {"message": "Unauthorized"})
+        elif sdc_id not in self.server.sdcs or action != "action/setSdcPerformanceParameters":
+            self._reply(404, {"message": "Not found"})
+        elif body.get("perfProfile") not in ("Compact", "HighPerformance"):
+            self._reply(500, {"message": "Invalid profile"})
+        else:
+            if not self.server.ignore_profile:
+                self.server.sdcs[sdc_id]["perfProfile"] = body["perfProfile"]
+            self._reply(200, {})
+
+
+VOLUME_PREFIX = "/volume/v3/project-id"
+
+
+class FakeOpenStackHandler(BaseHTTPRequestHandler):
+    """Stand-in for the Keystone v3 and Cinder v3 REST APIs."""
+
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self, status, body=None, headers=None):
+        data = json.dumps(body).encode() if body is not None else b""
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _body(self):
+        return json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or "null")
+
+    def _authenticate(self):
+        auth = self._body()["auth"]
+        user = auth["identity"]["password"]["user"]
+        if (user["name"], user["password"]) != ("admin", "secret"):
+            self._reply(
+                401,
+                {
+                    "error": {
+                        "code": 401,
+                        "message": "The request you have made requires authentication.",
+                    }
+                },
+            )
+            return
+        port = self.server.server_address[1]
+        catalog = [
+            {
+                "type": "volumev3",
+                "endpoints": [
+                    {
+                        "interface": interface,
+                        "region_id": "RegionOne",
+                        "url": f"http://127.0.0.1:{port}{VOLUME_PREFIX}",
+                    }
+                    for interface in ("public", "internal")
+                ],
+            }
+        ]
+        self._reply(201, {"token": {"catalog": catalog}}, {"X-Subject-Token": "token-1"})
+
+    def _handle(self, method):
+        url = urlsplit(self.path)
+        if method == "POST" and url.path == "/v3/auth/tokens":
+            self._authenticate()
+            return
+        if self.headers.get("X-Auth-Token") != "token-1":
+            self._reply(401, {"error": {"message": "Unauthorized"}})
+            return
+        if not url.path.startswith(VOLUME_PREFIX):
+            self._reply(404, {"itemNotFound": {"message": "Not found"}})
+            return
+
+        path = url.path.removeprefix(VOLUME_PREFIX).strip("/").split("/")
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+        body = self._body() if method in ("POST", "PUT") else None
+        if method != "GET" or path[-1] in ("associate", "disassociate"):
+            self.server.changes.append((method, url.path.removeprefix(VOLUME_PREFIX)))
+        self._route(method, path, query, body)
+
+    def _services(self, method, path, query, body):
+        microversion = self.headers.get("OpenStack-API-Version", "volume 3.0").split()[-1]
+        services = self.server.volume_services
+        if path == ["os-services"] and method == "GET":
+            for service in services:
+                # The switch completes by the next listing
+                status = service.pop("switching_to", None)
+                if status:
+                    service["replication_status"] = status
+            self._reply(200, {"services": [s for s in services if s["binary"] == query["binary"]]})
+        elif path == ["os-services", "failover"] and method != "PUT":
+            self._reply(405, {"error": {"message": "The method is not allowed"}})
+        elif path == ["os-services", "failover"]:
+            if tuple(map(int, microversion.split("."))) < (3, 26):
+                self._reply(404, {"itemNotFound": {"message": "Not found"}})
+                return
+            self.server.failovers.append(body)
+            key = "cluster" if "cluster" in body else "host"
+            matched = [s for s in services if s[key] == body[key]]
+            if not matched:
+                self._reply(400, {"badRequest": {"message": "No service found"}})
+                return
+            for service in matched:
+                failback = body["backend_id"] == "default"
+                service["replication_status"] = "failing-over"
+                service["switching_to"] = "enabled" if failback else "failed-over"
+                service["active_backend_id"] = None if failback else body["backend_id"]
+            self._reply(202)
+        else:
+            self._reply(404, {"itemNotFound": {"message": "Not found"}})
+
+    def _route(self, method, path, query, body):  # noqa: C901
+        specs, types = self.server.qos_specs, self.server.volume_types
+        if path[0] == "os-services":
+            self._services(method, path, query, body)
+        elif path == ["qos-specs"] and method == "GET":
+            self._reply(200, {"qos_specs": list(specs.values())})
+        elif path == ["qos-specs"] and method == "POST":
+            values = dict(body["qos_specs"])
+            name, consumer = values.pop("name"), values.pop("consumer", "back-end")
+            if any(s["name"] == name for s in specs.values()):
+                self._reply(409, {"conflictingRequest": {"message": f"{name} exists"}})
+                return
+            created = {
+                "id": str(uuid.uuid4()),
+                "name": name,
+                "consumer": consumer,
+                "specs": values,
+            }
+            specs[created["id"]] = created
+            self._reply(200, {"qos_specs": created})
+        elif path[0] == "qos-specs" and path[1] not in specs:
+            self._reply(404, {"itemNotFound": {"message": "QoS specs not found"}})
+        elif len(path) == 2 and method == "PUT":
+            values = dict(body["qos_specs"])
+            if "consumer" in values:
+                specs[path[1]]["consumer"] = values.pop("consumer")
+            specs[path[1]]["specs"].update(values)
+            self._reply(200, {"qos_specs": body["qos_specs"]})
+        elif path[2:] == ["delete_keys"]:
+            for key in body["keys"]:
+                specs[path[1]]["specs"].pop(key, None)
+            self._reply(202)
+        elif path[2:] in (["associate"], ["disassociate"]):
+            volume_type = types.get(query.get("vol_type_id"))
+            if volume_type is None:
+                self._reply(404, {"itemNotFound": {"message": "Volume type not found"}})
+            elif path[2] == "associate" and volume_type["qos_specs_id"]:
+                self._reply(400, {"badRequest": {"message": "Type already associated"}})
+            else:
+                volume_type["qos_specs_id"] = path[1] if path[2] == "associate" else None
+                self._reply(202)
+        elif path == ["types"] and method == "GET":
+            self._reply(200, {"volume_types": list(types.values())})
+        elif path == ["types"] and method == "POST":
+            values = body["volume_type"]
+            created = {
+                "id": str(uuid.uuid4()),
+                "name": values["name"],
+                "extra_specs": dict(values.get("extra_specs") or {}),
+                "qos_specs_id": None,
+            }
+            types[created["id"]] = created
+            self._reply(200, {"volume_type": created})
+        elif path[0] == "types" and path[2:] == ["extra_specs"] and path[1] in types:
+            types[path[1]]["extra_specs"].update(body["extra_specs"])
+            self._reply(200, body)
+        else:
+            self._reply(404, {"itemNotFound": {"message": "Not found"}})
+
+    def do_GET(self):  # noqa: N802
+        self._handle("GET")
+
+    def do_POST(self):  # noqa: N802
+        self._handle("POST")
+
+    def do_PUT(self):  # noqa: N802
+        self._handle("PUT")
+
+
+@pytest.fixture
+def fake_gateway(request):
+    """Start a stand-in PowerFlex Gateway for the duration of a test."""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeGatewayHandler)
+    server.connections = 0
+    server.requests = 0
+    server.logins = 0
+    server.ignore_profile = False
+    server.sdcs = {
+        "9b9a2b6a00000003": {
+            "id": "9b9a2b6a00000003",
+            "sdcGuid": "6A3B8C0E-2F4D-1A2B-9C8D-7E6F5A4B3C2D",
+            "sdcIp": "10.0.0.20",
+            "sdcIps": ["10.0.0.20", "10.0.1.20"],
+            "perfProfile": "Compact",
+        },
+        "9b9a2b6a00000004": {
+            "id": "9b9a2b6a00000004",
+            "sdcGuid": "0F1E2D3C-4B5A-6978-8796-A5B4C3D2E1F0",
+            "sdcIp": "10.0.0.21",
+            "perfProfile": "Compact",
+        },
+    }
+    thread = threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True)
+    thread.start()
+    # Available to the unittest test cases as an attribute
+    if request.instance is not None:
+        setattr(request.instance, "fake_gateway", server)
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def fake_openstack(request):
+    """Start a stand-in Keystone and Cinder for the duration of a test."""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeOpenStackHandler)
+    server.auth_url = "http://127.0.0.1:{}/v3".format(server.server_address[1])
+    server.qos_specs = {}
+    server.volume_types = {}
+    # Requests changing the QoS specs or volume types
+    server.changes = []
+    server.volume_services = []
+    # Bodies of the failover requests
+    server.failovers = []
+    thread = threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True)
+    thread.start()
+    # Available to the unittest test cases as an attribute
+    if request.instance is not None:
+        setattr(request.instance, "fake_openstack", server)
+    yield server
+    server.shutdown()
+    server.server_close()
@@ -0,0 +1,75 @@
+# Copyright 2024 Canonical Ltd
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+
+import backends
+
+BACKENDS = """
+- name: powerflex-a
+  powerflexgw-ip: 10.0.0.10
+  powerflex-storage-pools: pd1:sp1
+- name: powerflex-b
+  volume-backend-name: powerflex
+  powerflexgw-ip: 10.0.1.10
+  powerflex-rest-server-port: 8443
+  performance-profile: high-throughput
+"""
+
+
+class TestBackends(unittest.TestCase):
+    def test_parse_backends(self):
+        """Test the backends are parsed in order."""
+        parsed = backends.parse_backends(BACKENDS)
+
+        self.assertEqual([backend["name"] for backend in parsed], ["powerflex-a", "powerflex-b"])
+        self.assertEqual(parsed[1]["powerflex-rest-server-port"], 8443)
+        self.assertEqual(backends.parse_backends(""), [])
+        self.assertEqual(backends.parse_backends(None), [])
+
+    def test_parse_backends_invalid(self):
+        """Test malformed lists and invalid backends are rejected."""
+        for raw, error in (
+            ("name: powerflex-a", "expected a list of backends"),
+            ("[", "not valid YAML"),
+            ("- powerflex-a", "backend 1 is not a mapping"),
+            ("- powerflexgw-ip: 10.0.0.10", "backend 1 has an invalid name None"),
+            ("- name: 'a b'", "backend 1 has an invalid name 'a b'"),
+            ("- name: DEFAULT", "backend name DEFAULT is reserved"),
+            ("- name: a\n- name: a", "backend a is defined twice"),
+            ("- name: a\n  sdc-module-parameters: num_queues=8", "unknown options sdc-module"),
+            ("- name: a\n  powerflex-sdc-mdm-ips: ''", "powerflex-sdc-mdm-ips is not a list"),
+            ("- name: a\n  performance-profile: fast", "backend a: invalid performance-profile"),
+        ):
+            with self.subTest(raw=raw):
+                with self.assertRaisesRegex(ValueError, error):
+                    backends.parse_backends(raw)
+
+    def test_backend_config(self):
+        """Test the options a backend does not set come from the charm configuration."""
+        charm_config = {
+            "volume-backend-name": "charm",
+            "powerflexgw-ip": "10.0.9.10",
+            "powerflexgw-login": "admin",
+        }
+        first, second = backends.parse_backends(BACKENDS)
+
+        config = backends.backend_config(charm_config, first)
+        self.assertEqual(config["powerflexgw-ip"], "10.0.0.10")
+        self.assertEqual(config["powerflexgw-login"], "admin")
+        self.assertEqual(config["volume-backend-name"], "powerflex-a")
+        self.assertEqual(
+            backends.backend_config(charm_config, second)["volume-backend-name"], "powerflex"
+        )
+        self.assertEqual(charm_config["powerflexgw-ip"], "10.0.9.10")
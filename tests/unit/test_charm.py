@@ -12,19 +12,47 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import functools
 import json
+import tempfile
 import unittest
+from pathlib import Path
 from unittest.mock import MagicMock, patch
 
 import ops
 import ops.testing
-from ops.model import ActiveStatus, BlockedStatus
+import pytest
+from ops.model import ActiveStatus, BlockedStatus, MaintenanceStatus
 
+import gateway
+import sdc
+import sdc_stats
 from charm import CinderPowerflexCharm
+from sdc import DebPackage, MdmProbe
+
+CHARM_DIR = Path(__file__).parents[2]
 
 
 class TestCharm(unittest.TestCase):
     def setUp(self):
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        self.state_dir = Path(tmpdir.name)
+        self.connector_dir = self.state_dir / "openstack"
+        for patcher in (
+            patch.object(CinderPowerflexCharm, "_state_dir", self.state_dir),
+            patch("charm.CONNECTOR_DIR", str(self.connector_dir)),
+            patch("charm.SYSTEMD_DIR", str(self.state_dir / "systemd")),
+            patch("charmhelpers.core.host.mkdir"),
+            patch("charmhelpers.core.hookenv.charm_dir", return_value=str(CHARM_DIR)),
+            patch("sdc.probe_mdm", side_effect=lambda address, *args: MdmProbe(address, 0.001)),
+            patch("sdc.SCINI_MODPROBE_CONF", self.state_dir / "modprobe.d" / "scini.conf"),
+            patch("sdc.SCINI_PARAMETERS_DIR", self.state_dir / "parameters"),
+            patch("sdc.DPKG_STATUS", self.state_dir / "dpkg" / "status"),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
         self.harness = ops.testing.Harness(CinderPowerflexCharm)
         self.harness.set_leader(True)
         self.addCleanup(self.harness.cleanup)
@@ -89,6 +117,51 @@ class TestCharm(unittest.TestCase):
         self.assertEqual(results["san_thin_provision"], False)
         self.assertEqual(results["powerflex_rest_server_port"], 1234)
 
+    def test_cinder_configuration_performance_profile(self):
+        """Test the performance profile and overrides expand into backend options."""
+        self.harness.disable_hooks()
+        self.harness.update_config(
+            {
+                "performance-profile": "high-throughput",
+                "performance-overrides": "rest_api_read_timeout=60",
+            }
+        )
+        options = self.charm.cinder_configuration(self.charm.config)
+        results = dict(options)
+
+        self.assertEqual(results["backend_native_threads_pool_size"], 60)
+        self.assertEqual(results["volume_copy_bps_limit"], 0)
+        self.assertEqual(results["powerflex_unmap_volume_before_deletion"], False)
+        self.assertEqual(results["rest_api_read_timeout"], 60)
+        # Tuned options are set once, in place of the configured value
+        self.assertEqual(len(options), len(results))
+
+    def test_tuning_status(self):
+        """Test invalid tuning settings are reported and not published."""
+        self.harness.disable_hooks()
+        self.assertEqual(self.charm.tuning_status(), ActiveStatus())
+
+        self.harness.update_config({"performance-overrides": "volume_copy_bps_limit=-1"})
+        self.assertEqual(
+            self.charm.tuning_status(),
+            BlockedStatus(
+                "Invalid performance-overrides: invalid volume_copy_bps_limit: "
+                "-1 is a negative integer"
+            ),
+        )
+        self.assertNotIn(
+            "volume_copy_bps_limit", dict(self.charm.cinder_configuration(self.charm.config))
+        )
+
+        self.harness.update_config({"performance-profile": "fastest"})
+        self.assertEqual(
+            self.charm.tuning_status(),
+            BlockedStatus(
+                "Invalid performance-profile: unknown profile fastest, expected one "
+                "of default, high-throughput, low-latency"
+            ),
+        )
+
     def test_relation_changed(self):
         """Tests that the cinder backend is presented as stateless but not active/active."""
         rel_id = self.harness.add_relation(
@@ -175,26 +248,285 @@ class TestCharm(unittest.TestCase):
             },
         )
 
+    def test_config_changed_unrelated_option_not_published(self):
+        """Test an option which is not sent to cinder leaves the relation data untouched."""
+        rel_id = self.harness.add_relation(
+            "storage-backend", "cinder-volume", unit_data={"nonce": ""}
+        )
+        before = dict(self.harness.get_relation_data(rel_id, self.charm.unit.name))
+
+        with self.assertLogs("charm", level="INFO") as logs:
+            self.harness.update_config({"powerflex-sdc-mdm-ips": "10.0.0.1"})
+
+        self.assertEqual(self.harness.get_relation_data(rel_id, self.charm.unit.name), before)
+        self.assertIn("storage-backend data unchanged", "\n".join(logs.output))
+
+    def test_config_changed_publishes_changed_options(self):
+        """Test only the modified backend options are reported when republishing."""
+        rel_id = self.harness.add_relation(
+            "storage-backend", "cinder-volume", unit_data={"nonce": ""}
+        )
+
+        with self.assertLogs("charm", level="INFO") as logs:
+            self.harness.update_config(
+                {"powerflexgw-ip": "10.0.0.2", "powerflex-rest-server-port": 8443}
+            )
+
+        output = "\n".join(logs.output)
+        self.assertIn("keys subordinate_configuration", output)
+        self.assertIn(
+            "added: cinder-dell-powerflex/san_ip; "
+            "modified: cinder-dell-powerflex/powerflex_rest_server_port",
+            output,
+        )
+        data = self.harness.get_relation_data(rel_id, self.charm.unit.name)
+        options = json.loads(data["subordinate_configuration"])["cinder"][
+            "/etc/cinder/cinder.conf"
+        ]["sections"]["cinder-dell-powerflex"]
+        self.assertIn(["san_ip", "10.0.0.2"], options)
+
+    def test_relation_changed_active_active(self):
+        """Tests the cluster and coordination settings are published in active/active mode."""
+        self.harness.update_config(
+            {
+                "active-active": True,
+                "coordination-backend-url": "etcd3+http://10.0.0.10:2379",
+            }
+        )
+        rel_id = self.harness.add_relation(
+            "storage-backend", "cinder-volume", unit_data={"nonce": ""}
+        )
+
+        data = self.harness.get_relation_data(rel_id, self.charm.unit.name)
+        self.assertEqual(data["active_active"], str(True))
+        sections = json.loads(data["subordinate_configuration"])["cinder"][
+            "/etc/cinder/cinder.conf"
+        ]["sections"]
+        self.assertEqual(sections["DEFAULT"], [["cluster", "powerflex"]])
+        self.assertEqual(
+            sections["coordination"], [["backend_url", "etcd3+http://10.0.0.10:2379"]]
+        )
+        self.assertIn("cinder-dell-powerflex", sections)
+
+    def test_relation_changed_backends(self):
+        """Tests each configured backend is published and enabled as its own section."""
+        self.harness.update_config(
+            {
+                "powerflexgw-ip": "10.0.9.10",
+                "powerflexgw-password": "secret",
+                "backends": (
+                    "- name: powerflex-a\n"
+                    "  powerflexgw-ip: 10.0.0.10\n"
+                    "  powerflex-storage-pools: pd1:sp1\n"
+                    "- name: powerflex-b\n"
+                    "  powerflexgw-ip: 10.0.1.10\n"
+                    "  powerflexgw-password: other\n"
+                    "  performance-overrides: rest_api_read_timeout=60\n"
+                ),
+            }
+        )
+        rel_id = self.harness.add_relation(
+            "storage-backend", "cinder-volume", unit_data={"nonce": ""}
+        )
+
+        data = self.harness.get_relation_data(rel_id, self.charm.unit.name)
+        self.assertEqual(data["backend_name"], "powerflex-a,powerflex-b")
+        sections = json.loads(data["subordinate_configuration"])["cinder"][
+            "/etc/cinder/cinder.conf"
+        ]["sections"]
+        self.assertEqual(sorted(sections), ["powerflex-a", "powerflex-b"])
+        first, second = dict(sections["powerflex-a"]), dict(sections["powerflex-b"])
+        self.assertEqual(first["volume_backend_name"], "powerflex-a")
+        self.assertEqual(first["san_ip"], "10.0.0.10")
+        self.assertEqual(first["san_password"], "secret")
+        self.assertEqual(first["powerflex_storage_pools"], "pd1:sp1")
+        self.assertEqual(second["san_ip"], "10.0.1.10")
+        self.assertEqual(second["rest_api_read_timeout"], 60)
+        self.assertEqual(first["rest_api_read_timeout"], 30)
+
+        connector = (self.connector_dir / "connector.conf").read_text()
+        self.assertEqual(
+            connector,
+            "[powerflex-a]\nsan_password = secret\n\n[powerflex-b]\nsan_password = other",
+        )
+
+    def test_backends_status_invalid(self):
+        """Test invalid backends block the unit and the charm backend is published."""
+        self.harness.update_config({"backends": "- name: DEFAULT"})
+        rel_id = self.harness.add_relation(
+            "storage-backend", "cinder-volume", unit_data={"nonce": ""}
+        )
+
+        self.assertEqual(
+            self.charm.backends_status(),
+            BlockedStatus("Invalid backends: backend name DEFAULT is reserved by cinder"),
+        )
+        data = self.harness.get_relation_data(rel_id, self.charm.unit.name)
+        self.assertEqual(data["backend_name"], self.charm.app.name)
+
+    @patch("sdc_stats.add_mdm")
+    @patch("sdc_stats.query_drv_cfg")
+    def test_backend_mdms(self, _query_drv_cfg, _add_mdm):
+        """Test the MDMs of the backends on other PowerFlex systems are added to the SDC."""
+        _query_drv_cfg.return_value = (
+            Path(__file__).parent / "fixtures" / "drv_cfg_query_mdms.txt"
+        ).read_text()
+        self.charm._stored.installed = True
+
+        self.harness.update_config(
+            {
+                "backends": (
+                    "- name: powerflex-a\n"
+                    "  powerflex-sdc-mdm-ips: 10.0.0.3\n"
+                    "- name: powerflex-b\n"
+                    "  powerflex-sdc-mdm-ips: 10.0.1.11, 10.0.1.12\n"
+                    "- name: powerflex-c\n"
+                )
+            }
+        )
+
+        _query_drv_cfg.assert_called_once_with("--query_mdms")
+        _add_mdm.assert_called_once_with(["10.0.1.11", "10.0.1.12"])
+        self.assertEqual(self.charm.backends_status(), ActiveStatus())
+
+        _add_mdm.side_effect = OSError("drv_cfg --add_mdm failed: MDM unreachable")
+        self.harness.update_config(
+            {"backends": "- name: powerflex-b\n  powerflex-sdc-mdm-ips: 10.0.2.1"}
+        )
+        self.assertEqual(
+            self.charm.backends_status(),
+            BlockedStatus(
+                "Unable to add the MDMs of backend powerflex-b: "
+                "drv_cfg --add_mdm failed: MDM unreachable"
+            ),
+        )
+
+    def test_active_active_status_requires_coordination(self):
+        """Test active/active is not published without a coordination backend."""
+        self.harness.update_config({"active-active": True})
+
+        self.assertFalse(self.charm.active_active)
+        self.assertEqual(
+            self.charm.active_active_status(),
+            BlockedStatus("active-active requires coordination-backend-url"),
+        )
+
+    def test_relation_changed_image_volume_cache(self):
+        """Tests the image-volume cache and internal tenant settings are published."""
+        self.harness.update_config(
+            {
+                "image-volume-cache-enabled": True,
+                "image-volume-cache-max-size-gb": 200,
+                "image-volume-cache-max-count": 50,
+                "cinder-internal-tenant-project-id": "project-id",
+                "cinder-internal-tenant-user-id": "user-id",
+            }
+        )
+        rel_id = self.harness.add_relation(
+            "storage-backend", "cinder-volume", unit_data={"nonce": ""}
+        )
+
+        data = self.harness.get_relation_data(rel_id, self.charm.unit.name)
+        sections = json.loads(data["subordinate_configuration"])["cinder"][
+            "/etc/cinder/cinder.conf"
+        ]["sections"]
+        self.assertEqual(
+            sections["DEFAULT"],
+            [
+                ["cinder_internal_tenant_project_id", "project-id"],
+                ["cinder_internal_tenant_user_id", "user-id"],
+            ],
+        )
+        backend = sections["cinder-dell-powerflex"]
+        self.assertIn(["image_volume_cache_enabled", True], backend)
+        self.assertIn(["image_volume_cache_max_size_gb", 200], backend)
+        self.assertIn(["image_volume_cache_max_count", 50], backend)
+
+    def test_image_volume_cache_status_requires_internal_tenant(self):
+        """Test the image-volume cache is not enabled without the internal tenant."""
+        self.harness.disable_hooks()
+        self.harness.update_config(
+            {
+                "image-volume-cache-enabled": True,
+                "cinder-internal-tenant-project-id": "project-id",
+            }
+        )
+
+        self.assertNotIn(
+            "image_volume_cache_enabled", dict(self.charm.cinder_configuration(self.charm.config))
+        )
+        self.assertEqual(self.charm.cinder_sections(self.charm.config), {})
+        self.assertEqual(
+            self.charm.image_volume_cache_status(),
+            BlockedStatus(
+                "image-volume-cache-enabled requires cinder-internal-tenant-project-id "
+                "and cinder-internal-tenant-user-id"
+            ),
+        )
+
+    def test_image_volume_cache_backend(self):
+        """Test a backend enabling the image-volume cache publishes the internal tenant."""
+        self.harness.disable_hooks()
+        self.harness.update_config(
+            {
+                "backends": (
+                    "- name: powerflex-a\n"
+                    "- name: powerflex-b\n"
+                    "  image-volume-cache-enabled: true\n"
+                ),
+            }
+        )
+
+        self.assertEqual(self.charm.cinder_sections(self.charm.config), {})
+        self.assertEqual(
+            self.charm.image_volume_cache_status(),
+            BlockedStatus(
+                "image-volume-cache-enabled requires cinder-internal-tenant-project-id "
+                "and cinder-internal-tenant-user-id (backends: powerflex-b)"
+            ),
+        )
+
+        self.harness.update_config(
+            {
+                "cinder-internal-tenant-project-id": "project-id",
+                "cinder-internal-tenant-user-id": "user-id",
+            }
+        )
+        self.assertEqual(
+            self.charm.cinder_sections(self.charm.config)["DEFAULT"],
+            [
+                ("cinder_internal_tenant_project_id", "project-id"),
+                ("cinder_internal_tenant_user_id", "user-id"),
+            ],
+        )
+        self.assertEqual(self.charm.image_volume_cache_status(), ActiveStatus())
+
     @patch("charmhelpers.core.host.mkdir")
     @patch("charm.render")
     def test_create_connector(self, _render, _mkdir):
         """Test the connector renders non-replication settings."""
         self.harness.disable_hooks()
-        self.charm.create_connector()
+        _render.return_value = "content"
+        with patch("sdc.write_file_atomic") as _write_file_atomic:
+            self.charm.create_connector()
 
-        _mkdir.assert_called_once_with("/opt/emc/scaleio/openstack")
+        _mkdir.assert_called_once_with(str(self.connector_dir))
         _render.assert_called_once_with(
             source="connector.conf",
-            target="/opt/emc/scaleio/openstack/connector.conf",
-            context = ({"backends": {"cinder_name": "cinder-dell-powerflex",
-                                     "san_password": "password"}}),
-            perms=0o600,
+            target=None,
+            context={
+                "backends": [{"cinder_name": "cinder-dell-powerflex", "san_password": "password"}]
+            },
+        )
+        _write_file_atomic.assert_called_once_with(
+            self.connector_dir / "connector.conf", "content", perms=0o600
         )
 
     @patch("charmhelpers.core.host.mkdir")
     @patch("charm.render")
     def test_create_connector_with_replication(self, _render, _mkdir):
         """Test the connector renders replication settings."""
+        _render.return_value = "content"
         self.harness.update_config(
             {
                 "powerflex-replication-config": (
@@ -203,19 +535,81 @@ class TestCharm(unittest.TestCase):
             }
         )
         _render.reset_mock()
-        self.charm.create_connector()
+        with patch("sdc.write_file_atomic") as _write_file_atomic:
+            self.charm.create_connector()
         _render.assert_called_once_with(
             source="connector.conf",
-            target="/opt/emc/scaleio/openstack/connector.conf",
+            target=None,
             context={
-                "backends": {
-                    "cinder_name": "cinder-dell-powerflex",
-                    "san_password": "password",
-                    "rep_san_password": "password",
-                }
+                "backends": [
+                    {
+                        "cinder_name": "cinder-dell-powerflex",
+                        "san_password": "password",
+                        "rep_san_password": "password",
+                    }
+                ]
             },
-            perms=0o600,
         )
+        _write_file_atomic.assert_called_once_with(
+            self.connector_dir / "connector.conf", "content", perms=0o600
+        )
+
+    def test_replication_config_any_order(self):
+        """Test the replication device is parsed whatever the order of its keys."""
+        rel_id = self.harness.add_relation(
+            "storage-backend", "cinder-volume", unit_data={"nonce": ""}
+        )
+        self.harness.update_config(
+            {
+                "powerflex-replication-config": (
+                    "san_password: rep:secret, san_ip: 10.20.30.41, backendid: acme, "
+                    "san_login: admin"
+                )
+            }
+        )
+
+        self.assertIn(
+            "replicating_san_password = rep:secret",
+            (self.connector_dir / "connector.conf").read_text(),
+        )
+        data = self.harness.get_relation_data(rel_id, self.charm.unit.name)
+        options = dict(
+            json.loads(data["subordinate_configuration"])["cinder"]["/etc/cinder/cinder.conf"][
+                "sections"
+            ]["cinder-dell-powerflex"]
+        )
+        self.assertEqual(
+            options["replication_device"],
+            "san_password:rep:secret,san_ip:10.20.30.41,backend_id:acme,san_login:admin",
+        )
+
+        self.harness.update_config({"powerflex-replication-config": "backend_id:acme"})
+        self.assertEqual(
+            self.charm.replication_status(),
+            BlockedStatus(
+                "Invalid powerflex-replication-config: missing san_ip, san_login, san_password"
+            ),
+        )
+        self.assertNotIn(
+            "replicating_san_password", (self.connector_dir / "connector.conf").read_text()
+        )
+
+    @patch("charm.service_restart")
+    def test_config_changed_rewrites_connector_without_restart(self, _service_restart):
+        """Test credential changes rewrite connector.conf without restarting scini."""
+        connector = self.connector_dir / "connector.conf"
+        self.harness.update_config({"powerflexgw-password": "secret"})
+        self.assertIn("san_password = secret", connector.read_text())
+        self.assertEqual(connector.stat().st_mode & 0o777, 0o600)
+
+        mtime = connector.stat().st_mtime_ns
+        self.harness.update_config({"powerflexgw-login": "admin"})
+        self.assertEqual(connector.stat().st_mtime_ns, mtime)
+        self.harness.update_config({"powerflexgw-password": "other"})
+        self.assertIn("san_password = other", connector.read_text())
+
+        _service_restart.assert_not_called()
+        self.assertEqual(self.charm.services(), ["scini"])
 
     @patch("ops_openstack.plugins.classes.CinderStoragePluginCharm.on_install")
     @patch("charmhelpers.contrib.openstack.utils.service_running")
@@ -225,9 +619,7 @@ class TestCharm(unittest.TestCase):
         self, _subprocess_run, _service_running, _ch_service_running, _on_install
     ):
         """Test install sdc when service is running."""
-        self.harness.add_relation(
-            "storage-backend", "cinder-volume", unit_data={"nonce": ""}
-        )
+        self.harness.add_relation("storage-backend", "cinder-volume", unit_data={"nonce": ""})
         self.charm.install_pkgs = MagicMock()
         self.charm.create_connector = MagicMock()
 
@@ -247,9 +639,7 @@ class TestCharm(unittest.TestCase):
         self, _subprocess_run, _service_running, _ch_service_running, _on_install
     ):
         """Test install sdc when service fails to start."""
-        self.harness.add_relation(
-            "storage-backend", "cinder-volume", unit_data={"nonce": ""}
-        )
+        self.harness.add_relation("storage-backend", "cinder-volume", unit_data={"nonce": ""})
         self.charm.install_pkgs = MagicMock()
         self.charm.create_connector = MagicMock()
 
@@ -297,3 +687,906 @@ class TestCharm(unittest.TestCase):
             self.charm.unit.status, BlockedStatus("sdc-deb-package resource is missing")
         )
 
+    @patch("sdc.deb_package_info")
+    @patch("charm.service_running")
+    @patch("subprocess.run")
+    def test_install_sdc_skips_installed_package(
+        self, _subprocess_run, _service_running, _deb_package_info
+    ):
+        """Test the SDC package is not installed again when dpkg already has it."""
+        _subprocess_run.return_value = MagicMock(returncode=0, stdout="", stderr="")
+        _service_running.return_value = True
+        _deb_package_info.return_value = DebPackage("emc-scaleio-sdc", "4.5-2.185")
+
+        self.charm.install_sdc()
+        _subprocess_run.assert_called_once()
+        self.assertTrue(self.charm._stored.installed)
+        self.assertEqual(self.charm._stored.sdc_package_name, "emc-scaleio-sdc")
+
+        _subprocess_run.reset_mock()
+        self._write_dpkg_status("installed")
+        self.charm.install_sdc()
+
+        _subprocess_run.assert_not_called()
+        self.assertTrue(self.charm._stored.installed)
+        self.assertFalse(self.charm._stored.install_failed)
+
+    def _write_dpkg_status(self, status: str, version: str = "4.5-2.185"):
+        path = self.state_dir / "dpkg" / "status"
+        path.parent.mkdir(exist_ok=True)
+        path.write_text(
+            f"Package: emc-scaleio-sdc\nStatus: install ok {status}\nVersion: {version}\n\n"
+        )
+
+    @patch("sdc.dpkg_status", wraps=sdc.dpkg_status)
+    def test_install_status_from_dpkg(self, _dpkg_status):
+        """Test install_status follows the dpkg state, parsed only when it changes."""
+        self.charm._stored.sdc_package_name = "emc-scaleio-sdc"
+        self.charm._stored.installed = True
+        self._write_dpkg_status("installed")
+
+        self.assertEqual(self.charm.install_status(), ActiveStatus())
+        self.assertEqual(self.charm.install_status(), ActiveStatus())
+        _dpkg_status.assert_called_once()
+
+        # The package is removed by hand
+        (self.state_dir / "dpkg" / "status").write_text("")
+        self.assertEqual(
+            self.charm.install_status(), BlockedStatus("SDC Debian package is not installed")
+        )
+
+        self._write_dpkg_status("half-configured")
+        self.assertEqual(
+            self.charm.install_status(), BlockedStatus("SDC Debian package is half-configured")
+        )
+        self.assertEqual(_dpkg_status.call_count, 3)
+
+    def test_install_status_without_package_name(self):
+        """Test install_status trusts the charm flags until the package name is known."""
+        self._write_dpkg_status("installed")
+        self.charm._stored.install_failed = True
+
+        self.assertEqual(
+            self.charm.install_status(), BlockedStatus("SDC Debian package failed to install")
+        )
+
+    @patch("sdc.deb_package_info")
+    @patch("charm.service_running")
+    @patch("subprocess.run")
+    def test_install_status_failed_upgrade(
+        self, _subprocess_run, _service_running, _deb_package_info
+    ):
+        """Test a failed upgrade blocks the unit until the dpkg state changes."""
+        _service_running.return_value = True
+        _deb_package_info.return_value = DebPackage("emc-scaleio-sdc", "4.5-1.0")
+        self._write_dpkg_status("installed", "4.5-1.0")
+        _subprocess_run.return_value = MagicMock(returncode=0, stdout="", stderr="")
+        self.charm.install_sdc()
+        self.assertEqual(self.charm._stored.sdc_package_name, "emc-scaleio-sdc")
+        self.assertEqual(self.charm.install_status(), ActiveStatus())
+
+        # The new package fails to install, the previous version stays
+        self.charm._stored.sdc_package_sha256 = None
+        _subprocess_run.return_value = MagicMock(returncode=1, stdout="", stderr="Error")
+        self.charm.install_sdc()
+        self.assertEqual(
+            self.charm.install_status(), BlockedStatus("SDC Debian package failed to install")
+        )
+
+        # The operator installs the package by hand
+        self._write_dpkg_status("installed", "4.5-2.185")
+        self.assertEqual(self.charm.install_status(), ActiveStatus())
+
+    @patch("sdc.file_sha256")
+    @patch("sdc.deb_package_info")
+    @patch("charm.service_running")
+    @patch("subprocess.run")
+    def test_install_sdc_new_package_revision(
+        self, _subprocess_run, _service_running, _deb_package_info, _file_sha256
+    ):
+        """Test a different SDC package file is installed even if the version matches."""
+        _subprocess_run.return_value = MagicMock(returncode=0, stdout="", stderr="")
+        _service_running.return_value = True
+        _deb_package_info.return_value = DebPackage("emc-scaleio-sdc", "4.5-2.185")
+        self._write_dpkg_status("installed")
+        _file_sha256.side_effect = ["a" * 64, "b" * 64]
+
+        self.charm.install_sdc()
+        # A new revision of the resource replaces the fetched file
+        self.charm.model.resources.fetch("sdc-deb-package").write_text("new-revision-content")
+        self.charm.install_sdc()
+
+        self.assertEqual(_subprocess_run.call_count, 2)
+
+    @patch("ops_openstack.plugins.classes.CinderStoragePluginCharm.on_install")
+    @patch("charm.service_running")
+    @patch("subprocess.run")
+    def test_timing_report_action(self, _subprocess_run, _service_running, _on_install):
+        """Test the phases timed during a hook are reported by the timing-report action."""
+        self.charm.create_connector = MagicMock()
+        _subprocess_run.return_value = MagicMock(returncode=0, stdout="", stderr="")
+
+        self.charm.on.install.emit()
+        self.charm.timer.flush()
+
+        output = self.harness.run_action("timing-report")
+        for phase in ("on-install", "install-sdc", "dpkg", "resource-status", "install-status"):
+            self.assertIn(phase, output.results)
+            self.assertEqual(output.results[phase]["count"], 1)
+            self.assertIn("p95-ms", output.results[phase])
+
+    def test_timing_report_action_no_timings(self):
+        """Test the timing-report action when nothing was recorded."""
+        output = self.harness.run_action("timing-report")
+        self.assertEqual(output.results, {"message": "No hook timings have been recorded yet"})
+
+    @patch("gateway.PowerFlexGateway.probe")
+    def test_gateway_status_cached(self, _probe):
+        """Test the gateway probe result is reused until its TTL expires."""
+        _probe.return_value = 0.0123
+        self.harness.disable_hooks()
+        self.harness.update_config({"powerflexgw-ip": "10.0.0.1"})
+
+        self.assertEqual(self.charm.gateway_status(), ActiveStatus("gateway 12.3ms"))
+        self.assertEqual(self.charm.gateway_status(), ActiveStatus("gateway 12.3ms"))
+        _probe.assert_called_once_with(timeout=5)
+
+        # Changing the credentials probes the gateway again
+        self.harness.update_config({"powerflexgw-password": "new-password"})
+        self.charm.gateway_status()
+        self.assertEqual(_probe.call_count, 2)
+
+        self.harness.update_config({"powerflexgw-probe-ttl": 0})
+        self.charm.gateway_status()
+        self.assertEqual(_probe.call_count, 3)
+
+    @patch("gateway.PowerFlexGateway.probe")
+    def test_gateway_status_unavailable(self, _probe):
+        """Test an unavailable gateway blocks the unit."""
+        _probe.side_effect = gateway.GatewayAuthError("credentials rejected")
+        self.harness.disable_hooks()
+        self.harness.update_config({"powerflexgw-ip": "10.0.0.1"})
+
+        self.assertEqual(
+            self.charm.gateway_status(),
+            BlockedStatus("PowerFlex Gateway 10.0.0.1 unavailable: credentials rejected"),
+        )
+
+    @patch("sdc.deb_package_info")
+    @patch("charm.service_running")
+    @patch("subprocess.Popen")
+    def test_install_sdc_background(self, _popen, _service_running, _deb_package_info):
+        """Test the SDC package installed in the background is collected later."""
+        _popen.return_value = MagicMock(pid=1234)
+        _service_running.return_value = True
+        _deb_package_info.return_value = None
+        self.harness.disable_hooks()
+        self.harness.update_config({"sdc-background-install": True})
+
+        self.charm.install_sdc()
+
+        command = _popen.call_args.args[0]
+        self.assertEqual(
+            command[2:7],
+            [
+                str(self.state_dir / "powerflex-sdc-install.json"),
+                "--lock",
+                "/var/lib/dpkg/lock-frontend",
+                "600",
+                "--",
+            ],
+        )
+        self.assertEqual(
+            command[7:11], ["sudo", "MDM_IP=192.168.0.0", "DPKG_FRONTEND_LOCKED=1", "dpkg"]
+        )
+
+        with patch("charm._process_alive", return_value=True):
+            self.assertEqual(
+                self.charm.install_status(),
+                MaintenanceStatus("SDC Debian package installation in progress"),
+            )
+            # The installation is not started twice
+            self.charm.install_sdc()
+            _popen.assert_called_once()
+
+        (self.state_dir / "powerflex-sdc-install.json").write_text(
+            json.dumps({"state": "succeeded", "exit_code": 0, "stdout": "", "stderr": ""})
+        )
+        # The status check does not collect the installation itself
+        self.assertEqual(
+            self.charm.install_status(),
+            MaintenanceStatus("SDC Debian package installation in progress"),
+        )
+        self.assertFalse(self.charm._stored.installed)
+
+        self.charm._on_update_status_collect_install(None)
+        self.assertEqual(self.charm.install_status(), ActiveStatus())
+        self.assertTrue(self.charm._stored.installed)
+        self.assertIsNone(self.charm._stored.sdc_install_pending)
+
+    @patch("subprocess.Popen")
+    def test_install_sdc_background_worker_died(self, _popen):
+        """Test a background worker which died without reporting fails the installation."""
+        _popen.return_value = MagicMock(pid=1234)
+        self.harness.disable_hooks()
+        self.harness.update_config({"sdc-background-install": True})
+
+        with patch("subprocess.run", return_value=MagicMock(returncode=1, stdout="")):
+            self.charm.install_sdc()
+
+        with patch("charm._process_alive", return_value=False):
+            self.charm._on_update_status_collect_install(None)
+            self.assertEqual(
+                self.charm.install_status(),
+                BlockedStatus("SDC Debian package failed to install"),
+            )
+
+    @patch("subprocess.Popen")
+    def test_install_sdc_background_locked(self, _popen):
+        """Test a background installation which did not get the dpkg lock is retried."""
+        _popen.return_value = MagicMock(pid=1234)
+        self.harness.disable_hooks()
+        self.harness.update_config({"sdc-background-install": True})
+
+        with patch("subprocess.run", return_value=MagicMock(returncode=1, stdout="")):
+            self.charm.install_sdc()
+        command = _popen.call_args.args[0]
+
+        (self.state_dir / "powerflex-sdc-install.json").write_text(
+            json.dumps({"state": "locked", "exit_code": 75, "stderr": "still locked"})
+        )
+        _popen.return_value = MagicMock(pid=5678)
+        with patch("charm._process_alive", return_value=True):
+            self.charm._on_update_status_collect_install(None)
+            self.assertEqual(
+                self.charm.install_status(),
+                MaintenanceStatus("SDC Debian package installation in progress"),
+            )
+
+        self.assertEqual(_popen.call_count, 2)
+        self.assertEqual(_popen.call_args.args[0], command)
+        self.assertEqual(self.charm._stored.sdc_install_pending["pid"], 5678)
+        self.assertFalse(self.charm._stored.install_failed)
+
+    @patch("sdc.probe_mdm")
+    @patch("charm.service_running")
+    @patch("subprocess.run")
+    def test_install_sdc_orders_mdm_ips(self, _subprocess_run, _service_running, _probe_mdm):
+        """Test the MDMs are passed to the SDC by latency, unreachable ones last."""
+        latencies = {"10.0.0.1": None, "10.0.0.2": 0.020, "10.0.0.3": 0.005}
+        _probe_mdm.side_effect = lambda address, *args: (
+            MdmProbe(address, error="timed out")
+            if latencies[address] is None
+            else MdmProbe(address, latencies[address])
+        )
+        _subprocess_run.return_value = MagicMock(returncode=0, stdout="", stderr="")
+        self.harness.disable_hooks()
+        self.harness.update_config({"powerflex-sdc-mdm-ips": "10.0.0.1, 10.0.0.2,10.0.0.3"})
+
+        self.charm.install_sdc()
+
+        install_cmd = _subprocess_run.call_args_list[-1].args[0]
+        self.assertEqual(install_cmd[1], "MDM_IP=10.0.0.3,10.0.0.2,10.0.0.1")
+        self.assertEqual(self.charm.mdm_status(), ActiveStatus("MDM unreachable: 10.0.0.1"))
+
+    @patch("sdc.probe_mdm")
+    @patch("subprocess.run")
+    def test_install_sdc_no_mdm_reachable(self, _subprocess_run, _probe_mdm):
+        """Test the SDC is not installed when none of the MDMs can be reached."""
+        _probe_mdm.side_effect = lambda address, *args: MdmProbe(address, error="refused")
+        _subprocess_run.return_value = MagicMock(returncode=0, stdout="", stderr="")
+
+        self.charm.install_sdc()
+
+        commands = [call.args[0] for call in _subprocess_run.call_args_list]
+        self.assertFalse(any("dpkg" in command for command in commands))
+        self.assertTrue(self.charm._stored.install_failed)
+        self.assertEqual(self.charm.mdm_status(), BlockedStatus("No MDM reachable: 192.168.0.0"))
+
+    @patch("sdc.probe_mdm")
+    def test_mdm_order_cached(self, _probe_mdm):
+        """Test the MDMs are probed again on update-status or a new configuration only."""
+        _probe_mdm.side_effect = lambda address, *args: MdmProbe(address, 0.001)
+        self.harness.disable_hooks()
+
+        self.assertEqual(self.charm._order_mdm_ips(), "192.168.0.0")
+        self.assertEqual(self.charm._order_mdm_ips(), "192.168.0.0")
+        self.assertEqual(_probe_mdm.call_count, 1)
+
+        self.charm._on_update_status_probe_mdms(None)
+        self.assertEqual(_probe_mdm.call_count, 2)
+
+        self.harness.update_config({"powerflex-sdc-mdm-ips": "10.0.0.1"})
+        self.assertEqual(self.charm._order_mdm_ips(), "10.0.0.1")
+        self.assertEqual(_probe_mdm.call_count, 3)
+
+    @patch("charm.service_running")
+    @patch("subprocess.run")
+    def test_sdc_parameters_applied(self, _subprocess_run, _service_running):
+        """Test the scini parameters are persisted and applied where possible."""
+        _subprocess_run.return_value = MagicMock(returncode=0, stdout="", stderr="")
+        parameters_dir = self.state_dir / "parameters"
+        parameters_dir.mkdir()
+        (parameters_dir / "io_queue_depth").write_text("32\n")
+        (parameters_dir / "num_queues").write_text("4\n")
+        (parameters_dir / "num_queues").chmod(0o444)
+        self.harness.update_config({"sdc-module-parameters": "io_queue_depth=64,num_queues=8"})
+        self.assertFalse((parameters_dir / "io_queue_depth").read_text().startswith("64"))
+
+        self.charm.install_sdc()
+
+        self.assertEqual(
+            (self.state_dir / "modprobe.d" / "scini.conf").read_text(),
+            "# Managed by the cinder-dell-powerflex charm\n"
+            "options scini io_queue_depth=64 num_queues=8\n",
+        )
+        self.assertEqual((parameters_dir / "io_queue_depth").read_text(), "64")
+        self.assertEqual(
+            self.charm.sdc_parameters_status(),
+            ActiveStatus("scini io_queue_depth=64; reload-sdc pending for num_queues"),
+        )
+
+    @patch("charm.service_running")
+    @patch("charm.service_restart")
+    def test_reload_sdc_action(self, _service_restart, _service_running):
+        """Test the reload-sdc action restarts scini and applies the parameters."""
+        _service_running.return_value = True
+        self.charm._stored.installed = True
+        parameters_dir = self.state_dir / "parameters"
+        parameters_dir.mkdir()
+        (parameters_dir / "num_queues").write_text("8\n")
+        self.harness.update_config({"sdc-module-parameters": "num_queues=8"})
+
+        output = self.harness.run_action("reload-sdc")
+
+        _service_restart.assert_called_once_with("scini")
+        self.assertEqual(output.results, {"applied": "num_queues=8", "pending": ""})
+
+    @patch("charm.service_running")
+    @patch("charm.service_restart")
+    def test_reload_sdc_action_not_installed(self, _service_restart, _service_running):
+        """Test the reload-sdc action reports nothing applied before the SDC is installed."""
+        _service_running.return_value = True
+        self.harness.update_config({"sdc-module-parameters": "num_queues=8"})
+
+        output = self.harness.run_action("reload-sdc")
+
+        _service_restart.assert_called_once_with("scini")
+        self.assertEqual(output.results, {"applied": "", "pending": ""})
+
+    @patch("charm.service_restart")
+    def test_reload_sdc_action_invalid_parameters(self, _service_restart):
+        """Test the reload-sdc action fails without restarting scini on invalid parameters."""
+        self.charm._stored.installed = True
+        self.harness.update_config({"sdc-module-parameters": "num_queues"})
+
+        with self.assertRaises(ops.testing.ActionFailed) as cm:
+            self.harness.run_action("reload-sdc")
+
+        self.assertEqual(
+            cm.exception.message,
+            "Invalid sdc-module-parameters: num_queues is not of the form name=value",
+        )
+        _service_restart.assert_not_called()
+
+    def test_sdc_parameters_invalid(self):
+        """Test invalid scini parameters block the unit."""
+        self.harness.update_config({"sdc-module-parameters": "io_queue_depth=64;rm -rf"})
+
+        self.assertEqual(
+            self.charm.sdc_parameters_status(),
+            BlockedStatus(
+                "Invalid sdc-module-parameters: io_queue_depth=64;rm -rf is not of the form "
+                "name=value"
+            ),
+        )
+        self.assertFalse((self.state_dir / "modprobe.d" / "scini.conf").exists())
+
+    @patch("iobench.default_engine", return_value="python")
+    def test_benchmark_backend_action_scratch_file(self, _default_engine):
+        """Test the benchmark runs against a scratch file which is removed afterwards."""
+        target = self.state_dir / "scratch"
+
+        output = self.harness.run_action(
+            "benchmark-backend",
+            {"target": str(target), "size": "1m", "queue-depth": 2, "duration": 1},
+        )
+
+        self.assertFalse(target.exists())
+        self.assertEqual(output.results["target"], str(target))
+        self.assertEqual(output.results["block-size"], 4096)
+        self.assertEqual(output.results["engine"], "python")
+        self.assertGreater(output.results["read"]["iops"], 0)
+        self.assertGreater(output.results["write"]["iops"], 0)
+        self.assertIn("latency-p99-us", output.results["read"])
+
+    def test_benchmark_backend_action_requires_confirmation(self):
+        """Test writes to an existing target must be confirmed."""
+        target = self.state_dir / "volume"
+        target.write_bytes(bytes(8192))
+
+        with self.assertRaises(ops.testing.ActionFailed) as cm:
+            self.harness.run_action("benchmark-backend", {"target": str(target)})
+
+        self.assertIn("i-really-mean-it=true", cm.exception.message)
+        self.assertEqual(target.read_bytes(), bytes(8192))
+
+    def test_benchmark_backend_action_invalid_workload(self):
+        """Test invalid workload parameters fail the action."""
+        with self.assertRaises(ops.testing.ActionFailed) as cm:
+            self.harness.run_action(
+                "benchmark-backend", {"target": "/dev/scinia", "block-size": "1000"}
+            )
+
+        self.assertEqual(
+            cm.exception.message, "Invalid workload: block size must be a multiple of 512 bytes"
+        )
+
+    @patch("sdc_stats.collect")
+    def test_sdc_stats_action(self, _collect):
+        """Test the sdc-stats action summarizes the SDC state and volume rates."""
+        volume = {"device": "scinia", "read-iops": 100.0, "write-iops": 50.0}
+        volume.update({"read-kib-s": 3200.0, "write-kib-s": 1600.0})
+        _collect.return_value = {
+            "mdms": [
+                sdc_stats.MdmConnection(
+                    "4f8a8b3a5dd2f10f", "9b9a2b6a00000003", ["10.0.0.2", "10.0.0.3"]
+                )
+            ],
+            "volumes": [sdc_stats.MappedVolume("6b3e2ab400000001", "4f8a8b3a5dd2f10f")],
+            "stats": {"6b3e2ab400000001": volume, "scinib": dict(volume, device="scinib")},
+        }
+
+        output = self.harness.run_action("sdc-stats", {"interval": 2})
+
+        _collect.assert_called_once_with(2)
+        self.assertEqual(
+            output.results["mdms"], "4f8a8b3a5dd2f10f (sdc 9b9a2b6a00000003): 10.0.0.2, 10.0.0.3"
+        )
+        self.assertEqual(output.results["mapped-volumes"], 1)
+        self.assertEqual(output.results["volumes"]["6b3e2ab400000001"], volume)
+        self.assertEqual(
+            output.results["total"],
+            {"read-iops": 200.0, "write-iops": 100.0, "read-kib-s": 6400.0, "write-kib-s": 3200.0},
+        )
+
+    @patch("sdc_stats.query_drv_cfg")
+    def test_sdc_stats_action_sdc_unavailable(self, _query_drv_cfg):
+        """Test the sdc-stats action fails when the SDC cannot be queried."""
+        _query_drv_cfg.side_effect = OSError("drv_cfg --query_mdms failed: scini is not loaded")
+
+        with self.assertRaises(ops.testing.ActionFailed) as cm:
+            self.harness.run_action("sdc-stats")
+
+        self.assertEqual(
+            cm.exception.message,
+            "Unable to query the SDC: drv_cfg --query_mdms failed: scini is not loaded",
+        )
+
+    def _serve_replicated_backend(self):
+        """Configure a replicated backend served by a stand-in gateway and cinder."""
+        gateway_server, openstack = self.fake_gateway, self.fake_openstack
+        openstack.volume_services.extend(
+            [
+                {
+                    "binary": "cinder-volume",
+                    "host": "juju-1@cinder-dell-powerflex",
+                    "cluster": None,
+                    "replication_status": "enabled",
+                },
+                {
+                    "binary": "cinder-volume",
+                    "host": "juju-1@lvm",
+                    "cluster": None,
+                    "replication_status": "disabled",
+                },
+            ]
+        )
+        for patcher in (
+            patch(
+                "gateway.PowerFlexGateway",
+                functools.partial(gateway.PowerFlexGateway, scheme="http"),
+            ),
+            patch("charm.FAILOVER_POLL_INTERVAL", 0.01),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.harness.update_config(
+            {
+                "powerflexgw-ip": "127.0.0.1",
+                "powerflexgw-password": "secret",
+                "powerflex-rest-server-port": gateway_server.server_port,
+                "powerflex-replication-config": (
+                    "backend_id:acme,san_ip:localhost,san_login:admin,san_password:secret"
+                ),
+            }
+        )
+        self._set_openstack_credentials()
+        params = {"auth-url": openstack.auth_url}
+        return openstack, params
+
+    def _set_openstack_credentials(self, password="secret"):
+        """Point openstack-credentials-secret at a secret granted to the charm."""
+        secret_id = self.harness.add_user_secret({"username": "admin", "password": password})
+        self.harness.grant_secret(secret_id, self.charm.app.name)
+        self.harness.update_config({"openstack-credentials-secret": secret_id})
+
+    @pytest.mark.usefixtures("fake_gateway", "fake_openstack")
+    def test_failover_action(self):
+        """Test the failover action checks both gateways, fails over and waits for cinder."""
+        openstack, params = self._serve_replicated_backend()
+
+        output = self.harness.run_action("failover", dict(params, **{"dry-run": True}))
+        self.assertEqual(openstack.failovers, [])
+        self.assertIn("replica gateway localhost: ok", output.results["preflight"])
+        self.assertIn("cinder: ok (1 services", output.results["preflight"])
+        self.assertNotIn("switch-ms", output.results["phases"])
+
+        output = self.harness.run_action("failover", params)
+
+        self.assertEqual(
+            openstack.failovers,
+            [{"backend_id": "acme", "host": "juju-1@cinder-dell-powerflex"}],
+        )
+        self.assertEqual(output.results["backends"], "cinder-dell-powerflex")
+        self.assertEqual(output.results["services"], "juju-1@cinder-dell-powerflex: failed-over")
+        self.assertEqual(
+            sorted(output.results["phases"]),
+            ["preflight-ms", "switch-ms", "total-ms", "verify-ms"],
+        )
+        self.assertIn("failover_verify", [phase for phase, _ in self.charm.timer.spans])
+
+        output = self.harness.run_action("failback", params)
+        self.assertEqual(openstack.failovers[-1]["backend_id"], "default")
+        self.assertEqual(output.results["services"], "juju-1@cinder-dell-powerflex: enabled")
+
+    @pytest.mark.usefixtures("fake_gateway", "fake_openstack")
+    def test_failover_action_primary_lost(self):
+        """Test a failover proceeds without the primary gateway but a failback does not."""
+        openstack, params = self._serve_replicated_backend()
+        self.harness.update_config({"powerflexgw-password": "wrong"})
+
+        output = self.harness.run_action("failover", params)
+        self.assertIn("primary gateway 127.0.0.1: failed", output.results["preflight"])
+        self.assertEqual(len(openstack.failovers), 1)
+
+        with self.assertRaises(ops.testing.ActionFailed) as cm:
+            self.harness.run_action("failback", params)
+        self.assertEqual(
+            cm.exception.message,
+            "Preflight checks failed: cinder-dell-powerflex primary gateway 127.0.0.1",
+        )
+        self.assertEqual(len(openstack.failovers), 1)
+
+    @pytest.mark.usefixtures("fake_gateway", "fake_openstack")
+    def test_failover_action_fails(self):
+        """Test the failover action fails without replication or a cinder-volume service."""
+        with self.assertRaises(ops.testing.ActionFailed) as cm:
+            self.harness.run_action("failover", {"auth-url": "http://127.0.0.1:1"})
+        self.assertEqual(
+            cm.exception.message, "No backend has a valid powerflex-replication-config"
+        )
+
+        openstack, params = self._serve_replicated_backend()
+        openstack.volume_services.pop(0)
+        with self.assertRaises(ops.testing.ActionFailed) as cm:
+            self.harness.run_action("failover", params)
+        self.assertEqual(cm.exception.message, "Preflight checks failed: cinder")
+        self.assertEqual(openstack.failovers, [])
+
+    @pytest.mark.usefixtures("fake_openstack")
+    def test_apply_qos_tiers_action(self):
+        """Test the apply-qos-tiers action creates the tiers of each volume backend name."""
+        server = self.fake_openstack
+        self.harness.update_config(
+            {
+                "qos-tiers": "{gold: {maxIOPS: 20000}, silver: {maxIOPS: 5000}}",
+                "backends": "- name: powerflex-a\n- name: powerflex-b\n  volume-backend-name: b",
+            }
+        )
+        self._set_openstack_credentials()
+        params = {"auth-url": server.auth_url}
+
+        output = self.harness.run_action("apply-qos-tiers", dict(params, **{"dry-run": True}))
+        self.assertEqual(output.results["changes"], 12)
+        self.assertEqual(server.changes, [])
+
+        output = self.harness.run_action("apply-qos-tiers", params)
+        self.assertFalse(output.results["dry-run"])
+        self.assertIn(
+            "create-volume-type b-gold (volume_backend_name=b)", output.results["operations"]
+        )
+        self.assertEqual(
+            sorted(t["name"] for t in server.volume_types.values()),
+            ["b-gold", "b-silver", "powerflex-a-gold", "powerflex-a-silver"],
+        )
+
+        output = self.harness.run_action("apply-qos-tiers", params)
+        self.assertEqual(output.results, {"dry-run": False, "changes": 0, "operations": "none"})
+
+    @pytest.mark.usefixtures("fake_openstack")
+    def test_apply_qos_tiers_action_fails(self):
+        """Test the apply-qos-tiers action fails without tiers or when cinder rejects it."""
+        server = self.fake_openstack
+        params = {"auth-url": server.auth_url}
+        with self.assertRaises(ops.testing.ActionFailed) as cm:
+            self.harness.run_action("apply-qos-tiers", params)
+        self.assertEqual(cm.exception.message, "qos-tiers is not set")
+
+        self.harness.update_config({"qos-tiers": "{gold: {maxIOPS: 20000}}"})
+        with self.assertRaises(ops.testing.ActionFailed) as cm:
+            self.harness.run_action("apply-qos-tiers", params)
+        self.assertEqual(
+            cm.exception.message,
+            "Unable to read the OpenStack credentials: openstack-credentials-secret is not set",
+        )
+
+        self._set_openstack_credentials(password="wrong")
+        with self.assertRaises(ops.testing.ActionFailed) as cm:
+            self.harness.run_action("apply-qos-tiers", params)
+        self.assertIn("Unable to apply the QoS tiers: POST", cm.exception.message)
+        self.assertIn("HTTP 401", cm.exception.message)
+
+        self.harness.update_config({"qos-tiers": "{gold: {maxIOPS: -1}}"})
+        self.assertEqual(
+            self.charm.qos_tiers_status(),
+            BlockedStatus("Invalid qos-tiers: tier gold: maxIOPS is not a positive integer"),
+        )
+
+    @patch("subprocess.run")
+    @patch("charm.service_running")
+    @patch("charm.service_restart")
+    @patch("charmhelpers.core.host.service_stop")
+    @patch("charmhelpers.core.host.service")
+    def test_metrics_endpoint_relation(
+        self, _service, _service_stop, _service_restart, _service_running, _run
+    ):
+        """Test the exporter runs and is published while metrics-endpoint is related."""
+        _service_running.return_value = True
+        unit_file = self.state_dir / "systemd" / "cinder-dell-powerflex-exporter.service"
+
+        rel_id = self.harness.add_relation("metrics-endpoint", "prometheus")
+        self.harness.add_relation_unit(rel_id, "prometheus/0")
+
+        self.assertIn("--port 9657 --cache-ttl 15", unit_file.read_text())
+        exporter = "cinder-dell-powerflex-exporter"
+        _service.assert_called_once_with("enable", exporter)
+        _service_restart.assert_called_once_with("cinder-dell-powerflex-exporter")
+        self.assertIn("cinder-dell-powerflex-exporter", self.charm.services())
+        app_data = self.harness.get_relation_data(rel_id, "cinder-dell-powerflex")
+        self.assertEqual(
+            json.loads(app_data["scrape_jobs"]),
+            [{"metrics_path": "/metrics", "static_configs": [{"targets": ["*:9657"]}]}],
+        )
+        metadata = json.loads(app_data["scrape_metadata"])
+        self.assertEqual(metadata["application"], "cinder-dell-powerflex")
+        unit_data = self.harness.get_relation_data(rel_id, "cinder-dell-powerflex/0")
+        self.assertEqual(unit_data["prometheus_scrape_unit_name"], "cinder-dell-powerflex/0")
+        self.assertIn("prometheus_scrape_unit_address", unit_data)
+
+        state = json.loads((self.state_dir / "powerflex-metrics-state.json").read_text())
+        self.assertEqual(state["installed"], False)
+        self.assertEqual(state["is_started"], True)
+        _service_running.assert_any_call("scini")
+
+        # An unrelated option leaves the running exporter alone
+        _service_restart.reset_mock()
+        self.harness.update_config({"powerflexgw-login": "admin"})
+        _service_restart.assert_not_called()
+        self.harness.update_config({"metrics-port": 9700})
+        _service_restart.assert_called_once_with("cinder-dell-powerflex-exporter")
+        app_data = self.harness.get_relation_data(rel_id, "cinder-dell-powerflex")
+        self.assertIn("*:9700", app_data["scrape_jobs"])
+
+        self.harness.remove_relation(rel_id)
+
+        _service_stop.assert_called_once_with("cinder-dell-powerflex-exporter")
+        _service.assert_called_with("disable", exporter)
+        self.assertFalse(unit_file.exists())
+        self.assertEqual(self.charm.services(), ["scini"])
+
+    @patch("subprocess.run")
+    @patch("charm.service_running")
+    @patch("charm.service_restart")
+    @patch("charmhelpers.core.host.service")
+    def test_metrics_exporter_enable_failed(
+        self, _service, _service_restart, _service_running, _run
+    ):
+        """Test a failure to enable the exporter at boot is logged."""
+        _service.return_value = False
+        _service_running.return_value = True
+
+        with self.assertLogs("charm", level="WARNING") as logs:
+            rel_id = self.harness.add_relation("metrics-endpoint", "prometheus")
+            self.harness.add_relation_unit(rel_id, "prometheus/0")
+
+        self.assertIn(
+            "Unable to enable the cinder-dell-powerflex-exporter service at boot",
+            "\n".join(logs.output),
+        )
+        _service_restart.assert_called_once_with("cinder-dell-powerflex-exporter")
+
+    @patch("charm.service_running")
+    @patch("sdc.deb_package_info")
+    @patch("subprocess.run")
+    def test_sdc_resource_cached(self, _subprocess_run, _deb_package_info, _service_running):
+        """Test the resource is fetched and checksummed once until it changes."""
+        _subprocess_run.return_value = MagicMock(returncode=0, stdout="", stderr="")
+        _deb_package_info.return_value = DebPackage("emc-scaleio-sdc", "4.5-2.185")
+        self._write_dpkg_status("installed")
+        _service_running.return_value = True
+
+        with patch.object(
+            self.charm.model.resources, "fetch", wraps=self.charm.model.resources.fetch
+        ) as _fetch, patch("sdc.file_sha256", wraps=sdc.file_sha256) as _file_sha256:
+            self.charm.install_sdc()
+            for _ in range(3):
+                self.assertIsInstance(self.charm.resource_status(), ActiveStatus)
+            self.charm.install_sdc()
+            _fetch.assert_called_once_with("sdc-deb-package")
+            _file_sha256.assert_called_once()
+
+            # upgrade-charm fetches the resource again, a new revision may be
+            # attached, but an unchanged file is not checksummed again
+            self.charm.on.upgrade_charm.emit()
+            self.assertEqual(_fetch.call_count, 2)
+            _file_sha256.assert_called_once()
+
+            # A changed file is fetched and checksummed again
+            path = Path(self.charm._stored.sdc_resource["path"])
+            path.write_text("new-revision-content")
+            self.charm.install_sdc()
+            self.assertEqual(_fetch.call_count, 3)
+            self.assertEqual(_file_sha256.call_count, 2)
+
+    @patch("charmhelpers.contrib.openstack.utils.service_running")
+    @patch("charm.service_running")
+    def test_status_checks_memoized(self, _service_running, _ch_service_running):
+        """Test each status check runs once per status evaluation."""
+        _service_running.return_value = True
+        _ch_service_running.return_value = True
+        self.harness.add_relation("storage-backend", "cinder-volume", unit_data={"nonce": ""})
+        self.charm._stored.installed = True
+
+        with patch.object(
+            sdc, "parse_module_parameters", wraps=sdc.parse_module_parameters
+        ) as _parse_module_parameters, patch.object(
+            self.charm, "_get_debian_package_path", wraps=self.charm._get_debian_package_path
+        ) as _get_path:
+            self.charm.update_status()
+            self.charm.update_status()
+
+        self.assertIsInstance(self.harness.model.unit.status, ActiveStatus)
+        self.assertEqual(_get_path.call_count, 2)
+        self.assertEqual(_parse_module_parameters.call_count, 2)
+        self.assertIsNone(self.charm._status_results)
+
+    @patch("sdc_stats.query_drv_cfg")
+    @patch("sdc.deb_package_info")
+    @patch("charm.service_running")
+    @patch("subprocess.run")
+    def test_rolling_sdc_upgrade(
+        self, _subprocess_run, _service_running, _deb_package_info, _query
+    ):
+        """Test the SDC upgrade waits for a slot and for the health gate."""
+        volumes = (Path(__file__).parent / "fixtures" / "drv_cfg_query_vols.txt").read_text()
+        _subprocess_run.return_value = MagicMock(returncode=0, stdout="", stderr="")
+        _service_running.return_value = True
+        _deb_package_info.return_value = DebPackage("emc-scaleio-sdc", "4.5-2.185")
+        self._write_dpkg_status("installed", "4.5-2.100")
+        # The volumes are mapped again on the second check after the upgrade
+        _query.side_effect = [volumes, "Retrieved 0 volume(s)\n", volumes]
+        self.charm._stored.installed = True
+        rel_id = self.harness.add_relation("sdc-peers", "cinder-dell-powerflex")
+        self.harness.add_relation_unit(rel_id, "cinder-dell-powerflex/1")
+        self.harness.update_relation_data(
+            rel_id, "cinder-dell-powerflex/1", {"sdc-upgrade-state": "upgrading"}
+        )
+        self.harness.update_relation_data(
+            rel_id,
+            "cinder-dell-powerflex",
+            {"sdc-upgrade-granted": json.dumps(["cinder-dell-powerflex/1"])},
+        )
+
+        self.charm.install_sdc()
+
+        _subprocess_run.assert_not_called()
+        unit_data = self.harness.get_relation_data(rel_id, "cinder-dell-powerflex/0")
+        self.assertEqual(unit_data["sdc-upgrade-state"], "waiting")
+        self.assertEqual(
+            self.charm.upgrade_status(),
+            ops.model.WaitingStatus("SDC upgrade waiting for a rolling upgrade slot"),
+        )
+
+        # The slot is granted once the other unit is done
+        self.harness.update_relation_data(
+            rel_id, "cinder-dell-powerflex/1", {"sdc-upgrade-state": "done"}
+        )
+
+        _subprocess_run.assert_called_once()
+        self.assertIn("dpkg", _subprocess_run.call_args.args[0])
+        self.assertEqual(unit_data["sdc-upgrade-state"], "verifying")
+        app_data = self.harness.get_relation_data(rel_id, "cinder-dell-powerflex")
+        self.assertEqual(json.loads(app_data["sdc-upgrade-granted"]), ["cinder-dell-powerflex/0"])
+
+        self.charm.on.update_status.emit()
+
+        self.assertEqual(unit_data["sdc-upgrade-state"], "done")
+        self.assertEqual(json.loads(app_data["sdc-upgrade-granted"]), [])
+        self.assertEqual(self.charm.upgrade_status(), ActiveStatus())
+
+    @pytest.mark.usefixtures("fake_gateway")
+    @patch("sdc_stats.query_drv_cfg")
+    def test_sdc_performance_profile(self, _query_drv_cfg):
+        """Test the SDC performance profile is applied through the gateway."""
+        server = self.fake_gateway
+        client = gateway.PowerFlexGateway(
+            "127.0.0.1", server.server_port, "admin", "secret", timeout=5, scheme="http"
+        )
+        self.addCleanup(client.close)
+        self.charm._gateway = client
+        self.charm._stored.installed = True
+        _query_drv_cfg.return_value = "Retrieved GUID: 6A3B8C0E-2F4D-1A2B-9C8D-7E6F5A4B3C2D\n"
+
+        self.harness.update_config({"sdc-performance-profile": "HighPerformance"})
+
+        self.assertEqual(server.sdcs["9b9a2b6a00000003"]["perfProfile"], "HighPerformance")
+        self.assertEqual(server.sdcs["9b9a2b6a00000004"]["perfProfile"], "Compact")
+        self.assertEqual(
+            dict(self.charm._stored.sdc_profile),
+            {"profile": "HighPerformance", "sdc_id": "9b9a2b6a00000003"},
+        )
+        self.assertEqual(self.charm.sdc_profile_status(), ActiveStatus())
+
+        # The gateway is not called again while the profile is unchanged
+        requests = server.requests
+        self.harness.update_config({"powerflexgw-login": "admin"})
+        self.assertEqual(server.requests, requests)
+
+    @pytest.mark.usefixtures("fake_gateway")
+    @patch("sdc_stats.query_drv_cfg")
+    def test_sdc_performance_profile_retried(self, _query_drv_cfg):
+        """Test a profile which could not be applied is reported and retried."""
+        server = self.fake_gateway
+        client = gateway.PowerFlexGateway(
+            "127.0.0.1", server.server_port, "admin", "secret", timeout=5, scheme="http"
+        )
+        self.addCleanup(client.close)
+        self.charm._gateway = client
+        self.charm._stored.installed = True
+        _query_drv_cfg.side_effect = OSError("drv_cfg --query_guid failed: scini is not loaded")
+        server.ignore_profile = True
+        self.harness.update_config({"sdc-performance-profile": "HighPerformance"})
+
+        self.assertEqual(
+            self.charm.sdc_profile_status(),
+            ActiveStatus(
+                "SDC profile HighPerformance not applied: the SDC is not registered with the "
+                "cluster"
+            ),
+        )
+
+        # The SDC is found by IP address, but the profile does not change
+        self.harness.add_network("10.0.1.20", endpoint="juju-info")
+        self.charm.on.update_status.emit()
+        self.assertEqual(
+            self.charm.sdc_profile_status(),
+            ActiveStatus("SDC profile HighPerformance not applied: the profile is still Compact"),
+        )
+
+        server.ignore_profile = False
+        self.charm.on.update_status.emit()
+        self.assertEqual(self.charm.sdc_profile_status(), ActiveStatus())
+        self.assertEqual(server.sdcs["9b9a2b6a00000003"]["perfProfile"], "HighPerformance")
+
+    def test_sdc_performance_profile_invalid(self):
+        """Test an unknown SDC performance profile blocks the unit."""
+        self.harness.update_config({"sdc-performance-profile": "Fastest"})
+
+        self.assertEqual(
+            self.charm.sdc_profile_status(),
+            BlockedStatus(
+                "Invalid sdc-performance-profile: Fastest, expected one of Compact, Default, "
+                "HighPerformance"
+            ),
+        )
@@ -0,0 +1,127 @@
+# Copyright 2024 Canonical Ltd
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import ssl
+import unittest
+
+import pytest
+
+import cinder_client
+
+
+@pytest.mark.usefixtures("fake_openstack")
+class TestCinderClient(unittest.TestCase):
+    def setUp(self):
+        self.server = self.fake_openstack
+
+    def client(self, password="secret", **kwargs):
+        return cinder_client.CinderClient(
+            self.server.auth_url.removesuffix("/v3"), "admin", password, "admin", **kwargs
+        )
+
+    def test_authenticate(self):
+        """Test the Cinder endpoint of the interface is found in the service catalog."""
+        client = self.client(interface="internal", region_name="RegionOne")
+        client.authenticate()
+
+        self.assertTrue(client._endpoint.endswith("/volume/v3/project-id"))
+        self.assertEqual(client.qos_specs(), [])
+
+    def test_ssl_context(self):
+        """Test the certificates are verified unless insecure is set."""
+        self.assertEqual(self.client()._context.verify_mode, ssl.CERT_REQUIRED)
+        self.assertEqual(self.client(insecure=True)._context.verify_mode, ssl.CERT_NONE)
+
+    def test_authenticate_rejected(self):
+        """Test rejected credentials raise OpenStackError with the Keystone message."""
+        with self.assertRaisesRegex(cinder_client.OpenStackError, "HTTP 401: The request"):
+            self.client(password="wrong").qos_specs()
+
+    def test_authenticate_no_endpoint(self):
+        """Test a missing Cinder endpoint raises OpenStackError."""
+        with self.assertRaisesRegex(cinder_client.OpenStackError, "no admin Cinder v3 endpoint"):
+            self.client(interface="admin").authenticate()
+
+    def test_unreachable(self):
+        """Test an unreachable Keystone raises OpenStackError."""
+        port = self.server.server_address[1]
+        self.server.shutdown()
+        self.server.server_close()
+
+        client = cinder_client.CinderClient(
+            f"http://127.0.0.1:{port}", "admin", "secret", "admin", timeout=1
+        )
+        with self.assertRaises(cinder_client.OpenStackError):
+            client.authenticate()
+
+    def test_qos_specs_and_volume_types(self):
+        """Test QoS specs and volume types are created, updated and associated."""
+        client = self.client()
+        specs = client.create_qos_specs("gold", "back-end", {"maxIOPS": "100", "maxBWS": "10"})
+        client.set_qos_keys(specs["id"], {"maxIOPS": "200"})
+        client.unset_qos_keys(specs["id"], ["maxBWS"])
+        volume_type = client.create_volume_type("gold", {"volume_backend_name": "a"})
+        client.set_extra_specs(volume_type["id"], {"volume_backend_name": "b"})
+        client.associate_qos(specs["id"], volume_type["id"])
+
+        self.assertEqual(
+            client.qos_specs(),
+            [
+                {
+                    "id": specs["id"],
+                    "name": "gold",
+                    "consumer": "back-end",
+                    "specs": {"maxIOPS": "200"},
+                }
+            ],
+        )
+        [listed] = client.volume_types()
+        self.assertEqual(listed["extra_specs"], {"volume_backend_name": "b"})
+        self.assertEqual(listed["qos_specs_id"], specs["id"])
+
+        client.disassociate_qos(specs["id"], volume_type["id"])
+        self.assertIsNone(client.volume_types()[0]["qos_specs_id"])
+
+    def test_failover(self):
+        """Test the services of a host or a cluster are failed over with microversion 3.26."""
+        self.server.volume_services.extend(
+            [
+                {"binary": "cinder-volume", "host": "a@b", "cluster": None},
+                {"binary": "cinder-volume", "host": "c@d", "cluster": "cl@d"},
+                {"binary": "cinder-scheduler", "host": "a", "cluster": None},
+            ]
+        )
+        client = self.client()
+
+        client.failover("acme", host="a@b")
+        client.failover("default", cluster="cl@d")
+
+        self.assertEqual(
+            self.server.failovers,
+            [{"backend_id": "acme", "host": "a@b"}, {"backend_id": "default", "cluster": "cl@d"}],
+        )
+        self.assertEqual(
+            [(s["host"], s["replication_status"]) for s in client.volume_services()],
+            [("a@b", "failed-over"), ("c@d", "enabled")],
+        )
+        with self.assertRaisesRegex(cinder_client.OpenStackError, "No service found"):
+            client.failover("acme", host="e@f")
+        # cinder only routes the action as a PUT
+        with self.assertRaisesRegex(cinder_client.OpenStackError, "HTTP 405"):
+            client.request(
+                "POST",
+                "/os-services/failover",
+                {"backend_id": "acme", "host": "a@b"},
+                microversion=cinder_client.FAILOVER_MICROVERSION,
+            )
@@ -0,0 +1,127 @@
+# Copyright 2024 Canonical Ltd
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import http.client
+import json
+import tempfile
+import threading
+import unittest
+from http.server import ThreadingHTTPServer
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+import exporter
+import sdc_stats
+
+FIXTURES = Path(__file__).parent / "fixtures"
+
+
+class TestCached(unittest.TestCase):
+    @patch("time.monotonic")
+    def test_cached_until_ttl_expires(self, _monotonic):
+        """Test the collector only runs again once its result expired."""
+        collector = MagicMock(side_effect=[1, 2])
+        cached = exporter.Cached(collector, ttl=10)
+
+        _monotonic.return_value = 100
+        self.assertEqual(cached(), 1)
+        _monotonic.return_value = 109
+        self.assertEqual(cached(), 1)
+        _monotonic.return_value = 110
+        self.assertEqual(cached(), 2)
+        self.assertEqual(collector.call_count, 2)
+
+
+class TestMetrics(unittest.TestCase):
+    def setUp(self):
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        self.state_dir = Path(tmpdir.name)
+        stat = sdc_stats.parse_block_stat((FIXTURES / "scinia_stat_after.txt").read_text())
+        self.counters = {
+            "stats": {"scinia": stat, "scinib": stat},
+            "volumes": {"6b3e2ab400000001": "scinia"},
+        }
+        for patcher in (
+            patch("exporter.scini_active", return_value=True),
+            patch("exporter.volume_counters", return_value=self.counters),
+        ):
+            self.mock = patcher.start()
+            self.addCleanup(patcher.stop)
+        self.metrics = exporter.Metrics(self.state_dir)
+
+    def test_render(self):
+        """Test the charm state, hook timings and volume counters are exported."""
+        (self.state_dir / exporter.STATE_FILE).write_text(
+            json.dumps(
+                {
+                    "installed": True,
+                    "install_failed": False,
+                    "is_started": True,
+                    "gateway_probe": {"latency_ms": 12.5},
+                }
+            )
+        )
+        (self.state_dir / exporter.TIMINGS_FILE).write_text(
+            json.dumps({"hook-install": [0.5, 1.0, 2.0]})
+        )
+
+        text = self.metrics.render()
+
+        for line in (
+            "powerflex_sdc_installed 1",
+            "powerflex_sdc_install_failed 0",
+            "powerflex_sdc_is_started 1",
+            "powerflex_gateway_up 1",
+            "powerflex_gateway_probe_latency_seconds 0.0125",
+            'powerflex_charm_phase_duration_seconds{phase="hook-install",quantile="0.5"} 1.0',
+            'powerflex_charm_phase_duration_seconds{phase="hook-install",quantile="1.0"} 2.0',
+            'powerflex_charm_phase_samples{phase="hook-install"} 3',
+            "powerflex_scini_service_active 1",
+            'powerflex_sdc_volume_reads_total{device="scinia",volume="6b3e2ab400000001"} 1700',
+            'powerflex_sdc_volume_read_bytes_total{device="scinia",volume="6b3e2ab400000001"} '
+            "55705600",
+            'powerflex_sdc_volume_in_flight{device="scinib",volume=""} 1',
+            "# TYPE powerflex_sdc_volume_writes_total counter",
+        ):
+            self.assertIn(line + "\n", text)
+
+    def test_render_without_state(self):
+        """Test metrics the charm has not recorded yet are left out."""
+        text = self.metrics.render()
+
+        self.assertIn("# TYPE powerflex_sdc_installed gauge\n", text)
+        self.assertNotIn("powerflex_sdc_installed 0", text)
+        self.assertNotIn("powerflex_gateway_up 0", text)
+
+    def test_serve(self):
+        """Test the metrics are served on /metrics only."""
+        server = ThreadingHTTPServer(("127.0.0.1", 0), exporter.make_handler(self.metrics))
+        thread = threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True)
+        thread.start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+
+        conn = http.client.HTTPConnection("127.0.0.1", server.server_port, timeout=5)
+        self.addCleanup(conn.close)
+        conn.request("GET", "/metrics")
+        response = conn.getresponse()
+        self.assertEqual(response.status, 200)
+        self.assertEqual(response.getheader("Content-Type"), exporter.CONTENT_TYPE)
+        self.assertIn(b"powerflex_scini_service_active 1", response.read())
+
+        conn.request("GET", "/")
+        response = conn.getresponse()
+        response.read()
+        self.assertEqual(response.status, 404)
@@ -0,0 +1,107 @@
+# Copyright 2024 Canonical Ltd
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import ssl
+import unittest
+
+import pytest
+
+import gateway
+
+
+@pytest.mark.usefixtures("fake_gateway")
+class TestPowerFlexGateway(unittest.TestCase):
+    def setUp(self):
+        self.server = self.fake_gateway
+
+    def client(self, password="secret"):
+        client = gateway.PowerFlexGateway(
+            "127.0.0.1", self.server.server_port, "admin", password, timeout=5, scheme="http"
+        )
+        self.addCleanup(client.close)
+        return client
+
+    def test_ssl_context(self):
+        """Test the gateway certificate is only verified when asked to."""
+        unverified = gateway.PowerFlexGateway("10.0.0.1", 443, "admin", "secret")._ssl_context()
+        self.assertEqual(unverified.verify_mode, ssl.CERT_NONE)
+        self.assertFalse(unverified.check_hostname)
+
+        verified = gateway.PowerFlexGateway(
+            "10.0.0.1", 443, "admin", "secret", verify=True
+        )._ssl_context()
+        self.assertEqual(verified.verify_mode, ssl.CERT_REQUIRED)
+        self.assertTrue(verified.check_hostname)
+
+    def test_probe_reuses_connection(self):
+        """Test the probes are sent over a single kept-alive connection."""
+        client = self.client()
+
+        self.assertGreaterEqual(client.probe(), 0)
+        self.assertGreaterEqual(client.probe(), 0)
+
+        self.assertEqual(self.server.connections, 1)
+        # The session token is reused by the second probe
+        self.assertEqual(self.server.logins, 1)
+
+    def test_probe_timeout(self):
+        """Test the probe timeout only applies to the probe requests."""
+        client = self.client()
+
+        client.probe(timeout=1)
+
+        self.assertEqual(client.timeout, 5)
+        self.assertEqual(client._conn.sock.gettimeout(), 5)
+
+    def test_probe_rejected_credentials(self):
+        """Test wrong credentials raise an authentication error."""
+        with self.assertRaises(gateway.GatewayAuthError):
+            self.client(password="wrong").probe()
+
+    def test_request_error(self):
+        """Test a failed request reports the HTTP status and message."""
+        with self.assertRaisesRegex(gateway.GatewayError, "HTTP 404: Not found"):
+            self.client().request("GET", "/api/types/Unknown/instances")
+
+    def test_probe_unreachable(self):
+        """Test an unreachable gateway raises a GatewayError."""
+        port = self.server.server_port
+        self.server.shutdown()
+        self.server.server_close()
+
+        client = gateway.PowerFlexGateway("127.0.0.1", port, "admin", "secret", scheme="http")
+        with self.assertRaises(gateway.GatewayError):
+            client.probe()
+
+    def test_find_sdc(self):
+        """Test SDCs are looked up by GUID first, then by IP address."""
+        client = self.client()
+
+        self.assertEqual(
+            client.find_sdc("6a3b8c0e-2f4d-1a2b-9c8d-7e6f5a4b3c2d", ["10.0.0.21"])["id"],
+            "9b9a2b6a00000003",
+        )
+        self.assertEqual(client.find_sdc(None, ["10.0.1.20"])["id"], "9b9a2b6a00000003")
+        self.assertEqual(client.find_sdc("unknown", ["10.0.0.21"])["id"], "9b9a2b6a00000004")
+        self.assertIsNone(client.find_sdc(None, ["10.0.9.9"]))
+
+    def test_set_sdc_performance_profile(self):
+        """Test the performance profile of an SDC is set."""
+        client = self.client()
+
+        client.set_sdc_performance_profile("9b9a2b6a00000003", "HighPerformance")
+
+        self.assertEqual(client.get_sdc("9b9a2b6a00000003")["perfProfile"], "HighPerformance")
+        with self.assertRaisesRegex(gateway.GatewayError, "HTTP 500: Invalid profile"):
+            client.set_sdc_performance_profile("9b9a2b6a00000003", "Fastest")
@@ -0,0 +1,185 @@
+# Copyright 2024 Canonical Ltd
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import subprocess
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+import iobench
+
+
+class TestIobench(unittest.TestCase):
+    def setUp(self):
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        self.target = Path(tmpdir.name) / "scratch"
+
+    def test_parse_size(self):
+        """Test sizes accept binary suffixes."""
+        self.assertEqual(iobench.parse_size("4096"), 4096)
+        self.assertEqual(iobench.parse_size("4k"), 4096)
+        self.assertEqual(iobench.parse_size("1M"), 1024 * 1024)
+        self.assertEqual(iobench.parse_size(" 2g "), 2 * 1024**3)
+        for value in ("", "4kb", "-1", "1.5m"):
+            with self.assertRaises(ValueError):
+                iobench.parse_size(value)
+
+    def test_validate(self):
+        """Test out of range workload parameters are rejected."""
+        iobench.validate(iobench.Workload())
+        for workload in (
+            iobench.Workload(block_size=1000),
+            iobench.Workload(queue_depth=0),
+            iobench.Workload(queue_depth=iobench.MAX_QUEUE_DEPTH + 1),
+            iobench.Workload(read_percent=101),
+            iobench.Workload(duration=0),
+            iobench.Workload(duration=0.5),
+            iobench.Workload(duration=iobench.MAX_DURATION + 1),
+        ):
+            with self.assertRaises(ValueError):
+                iobench.validate(workload)
+
+    def test_create_scratch_file(self):
+        """Test the scratch file is fully written."""
+        iobench.create_scratch_file(self.target, 3 * iobench.FILL_CHUNK // 2)
+        self.assertEqual(self.target.stat().st_size, 3 * iobench.FILL_CHUNK // 2)
+        self.assertNotEqual(self.target.read_bytes()[-4096:], bytes(4096))
+        self.assertFalse(iobench.is_block_device(self.target))
+
+    def test_run_mixed(self):
+        """Test a mixed workload reports both read and write statistics."""
+        iobench.create_scratch_file(self.target, 1024 * 1024)
+        workload = iobench.Workload(block_size=4096, queue_depth=4, read_percent=50, duration=1)
+
+        results = iobench.run(self.target, workload, seed=1, engine="python")
+
+        for direction in ("read", "write"):
+            stats = results[direction]
+            self.assertGreater(stats["ops"], 0)
+            self.assertGreater(stats["iops"], 0)
+            self.assertAlmostEqual(
+                stats["bandwidth-kib"], stats["iops"] * 4, delta=stats["iops"] * 0.01 + 0.5
+            )
+            self.assertLessEqual(stats["latency-p50-us"], stats["latency-p95-us"])
+            self.assertLessEqual(stats["latency-p95-us"], stats["latency-p99-us"])
+            self.assertLessEqual(stats["latency-p99-us"], stats["latency-max-us"])
+
+    def test_run_read_only(self):
+        """Test a read-only workload leaves the target unchanged."""
+        iobench.create_scratch_file(self.target, 64 * 1024)
+        content = self.target.read_bytes()
+        self.target.chmod(0o400)
+        workload = iobench.Workload(block_size=512, queue_depth=2, read_percent=100, duration=1)
+
+        results = iobench.run(self.target, workload, direct=False, engine="python")
+
+        self.assertGreater(results["read"]["ops"], 0)
+        self.assertEqual(results["write"], {"ops": 0, "iops": 0.0, "bandwidth-kib": 0.0})
+        self.assertEqual(self.target.read_bytes(), content)
+
+    def test_run_target_too_small(self):
+        """Test a target smaller than one block is rejected."""
+        self.target.write_bytes(bytes(100))
+        with self.assertRaises(ValueError):
+            iobench.run(self.target, iobench.Workload(duration=1), engine="python")
+
+    def test_histogram(self):
+        """Test the histogram percentiles are within a bucket of the exact ones."""
+        histogram = iobench._Histogram()
+        latencies = [i * 1e-6 for i in range(1, 10001)]
+        for latency in latencies:
+            histogram.add(latency)
+
+        self.assertEqual(histogram.total, 10000)
+        self.assertEqual(histogram.max, latencies[-1])
+        self.assertLess(len(histogram.counts), 1000)
+        for pct, exact in ((50, 5000e-6), (95, 9500e-6), (99, 9900e-6)):
+            self.assertGreaterEqual(histogram.percentile(pct), exact)
+            self.assertLessEqual(histogram.percentile(pct), exact * iobench.HISTOGRAM_GROWTH)
+        self.assertEqual(histogram.percentile(100), latencies[-1])
+
+        other = iobench._Histogram()
+        other.add(0.5)
+        histogram.merge(other)
+        self.assertEqual(histogram.total, 10001)
+        self.assertEqual(histogram.max, 0.5)
+
+    @patch("shutil.which")
+    def test_default_engine(self, _which):
+        """Test fio runs the workloads when it is installed."""
+        _which.return_value = "/usr/bin/fio"
+        self.assertEqual(iobench.default_engine(), "fio")
+        _which.return_value = None
+        self.assertEqual(iobench.default_engine(), "python")
+
+    @patch("subprocess.run")
+    def test_run_fio(self, _run):
+        """Test the workload runs with fio and its results are summarized."""
+        read = {
+            "total_ios": 7000,
+            "iops": 700.04,
+            "bw": 2800.16,
+            "clat_ns": {
+                "max": 9876543,
+                "percentile": {"50.000000": 150528, "95.000000": 403456, "99.000000": 970752},
+            },
+        }
+        write = {"total_ios": 0, "iops": 0, "bw": 0, "clat_ns": {"max": 0}}
+        _run.return_value = MagicMock(
+            returncode=0, stdout=json.dumps({"jobs": [{"error": 0, "read": read, "write": write}]})
+        )
+        workload = iobench.Workload(block_size=4096, queue_depth=32, read_percent=100, duration=10)
+
+        results = iobench.run(Path("/dev/scinia"), workload, seed=7, engine="fio")
+
+        command = _run.call_args.args[0]
+        self.assertEqual(command[0], "fio")
+        for option in (
+            "--filename=/dev/scinia",
+            "--rwmixread=100",
+            "--bs=4096",
+            "--iodepth=32",
+            "--direct=1",
+            "--runtime=10",
+            "--randseed=7",
+            "--output-format=json",
+        ):
+            self.assertIn(option, command)
+        self.assertEqual(
+            results["read"],
+            {
+                "ops": 7000,
+                "iops": 700.0,
+                "bandwidth-kib": 2800.2,
+                "latency-p50-us": 150.5,
+                "latency-p95-us": 403.5,
+                "latency-p99-us": 970.8,
+                "latency-max-us": 9876.5,
+            },
+        )
+        self.assertEqual(results["write"], {"ops": 0, "iops": 0.0, "bandwidth-kib": 0.0})
+
+    @patch("subprocess.run")
+    def test_run_fio_failed(self, _run):
+        """Test a fio failure is reported as an OSError."""
+        _run.return_value = MagicMock(returncode=1, stdout="", stderr="fio: file not found\n")
+        with self.assertRaisesRegex(OSError, "fio failed: fio: file not found"):
+            iobench.run(self.target, iobench.Workload(duration=1), engine="fio")
+
+        _run.side_effect = subprocess.TimeoutExpired("fio", 61)
+        with self.assertRaisesRegex(OSError, "did not finish"):
+            iobench.run(self.target, iobench.Workload(duration=1), engine="fio")
@@ -0,0 +1,123 @@
+# Copyright 2024 Canonical Ltd
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+
+import pytest
+
+import cinder_client
+import qos
+
+TIERS = "{gold: {maxIOPS: 20000, maxBWS: 409600}, bronze: {maxIOPSperGB: 10}}"
+
+
+class TestQos(unittest.TestCase):
+    def test_parse_tiers(self):
+        """Test the limits of the tiers are parsed as strings."""
+        self.assertEqual(
+            qos.parse_tiers(TIERS),
+            {
+                "gold": {"maxIOPS": "20000", "maxBWS": "409600"},
+                "bronze": {"maxIOPSperGB": "10"},
+            },
+        )
+        self.assertEqual(qos.parse_tiers(""), {})
+
+    def test_parse_tiers_invalid(self):
+        """Test malformed tiers and invalid limits are rejected."""
+        for raw, error in (
+            ("[gold]", "expected a mapping of tiers"),
+            ("{", "not valid YAML"),
+            ("{Gold: {maxIOPS: 1}}", "invalid tier name 'Gold'"),
+            ("{gold: {}}", "tier gold sets no limit"),
+            ("{gold: {maxIops: 1}}", "tier gold: unknown limits maxIops"),
+            ("{gold: {maxIOPS: 0}}", "tier gold: maxIOPS is not a positive integer"),
+            ("{gold: {maxIOPS: fast}}", "tier gold: maxIOPS is not a positive integer"),
+        ):
+            with self.subTest(raw=raw):
+                with self.assertRaisesRegex(ValueError, error):
+                    qos.parse_tiers(raw)
+
+    def test_plan(self):
+        """Test only the differences with the existing specs and types are planned."""
+        tiers = qos.parse_tiers(TIERS)
+        qos_specs = [
+            {
+                "id": "q-gold",
+                "name": "powerflex-gold",
+                "consumer": "front-end",
+                "specs": {"maxIOPS": "20000", "maxBWSperGB": "5", "other": "kept"},
+            },
+            {"id": "q-old", "name": "old", "consumer": "back-end", "specs": {}},
+        ]
+        volume_types = [
+            {
+                "id": "t-gold",
+                "name": "powerflex-gold",
+                "extra_specs": {"volume_backend_name": "other"},
+                "qos_specs_id": "q-old",
+            },
+        ]
+
+        self.assertEqual(
+            qos.plan(tiers, ["powerflex"], qos_specs, volume_types),
+            [
+                qos.Operation("create-qos-specs", "powerflex-bronze", {"maxIOPSperGB": "10"}),
+                qos.Operation(
+                    "create-volume-type", "powerflex-bronze", {"volume_backend_name": "powerflex"}
+                ),
+                qos.Operation(
+                    "set-qos-specs", "powerflex-gold", {"consumer": "back-end", "maxBWS": "409600"}
+                ),
+                qos.Operation("unset-qos-specs", "powerflex-gold", {"keys": ["maxBWSperGB"]}),
+                qos.Operation(
+                    "set-volume-type", "powerflex-gold", {"volume_backend_name": "powerflex"}
+                ),
+                qos.Operation("associate", "powerflex-bronze", {"qos-specs": "powerflex-bronze"}),
+                qos.Operation("disassociate", "powerflex-gold", {"qos-specs-id": "q-old"}),
+                qos.Operation("associate", "powerflex-gold", {"qos-specs": "powerflex-gold"}),
+            ],
+        )
+
+    @pytest.mark.usefixtures("fake_openstack")
+    def test_sync(self):
+        """Test the tiers are applied against the Cinder API and a second run changes nothing."""
+        server = self.fake_openstack
+        client = cinder_client.CinderClient(server.auth_url, "admin", "secret", "admin")
+        tiers = qos.parse_tiers(TIERS)
+
+        planned = qos.sync(client, tiers, ["a", "b"], dry_run=True)
+        self.assertEqual(len(planned), 12)
+        self.assertEqual(server.changes, [])
+
+        self.assertEqual(qos.sync(client, tiers, ["a", "b"]), planned)
+        self.assertEqual(len(server.changes), 12)
+        specs = {s["name"]: s for s in server.qos_specs.values()}
+        self.assertEqual(specs["b-gold"]["specs"], {"maxIOPS": "20000", "maxBWS": "409600"})
+        for volume_type in server.volume_types.values():
+            self.assertEqual(volume_type["qos_specs_id"], specs[volume_type["name"]]["id"])
+            self.assertEqual(
+                volume_type["extra_specs"]["volume_backend_name"], volume_type["name"][0]
+            )
+
+        server.changes.clear()
+        self.assertEqual(qos.sync(client, tiers, ["a", "b"]), [])
+        self.assertEqual(server.changes, [])
+
+        tiers["gold"]["maxIOPS"] = "30000"
+        self.assertEqual(
+            qos.sync(client, tiers, ["a"]),
+            [qos.Operation("set-qos-specs", "a-gold", {"maxIOPS": "30000"})],
+        )
+        self.assertEqual(len(server.changes), 1)
@@ -0,0 +1,96 @@
+# Copyright 2024 Canonical Ltd
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import threading
+import time
+import unittest
+
+import replication
+
+
+class TestReplication(unittest.TestCase):
+    def test_parse_replication_device(self):
+        """Test the keys of a replication device may come in any order."""
+        device = replication.parse_replication_device(
+            " san_password: pa:ss , backend_id:acme,san_login:admin,san_ip:10.20.30.41"
+        )
+
+        self.assertEqual(device.backend_id, "acme")
+        self.assertEqual(device.san_ip, "10.20.30.41")
+        self.assertEqual(device.san_login, "admin")
+        self.assertEqual(device.san_password, "pa:ss")
+        self.assertEqual(
+            replication.format_replication_device(device),
+            "san_password:pa:ss,backend_id:acme,san_login:admin,san_ip:10.20.30.41",
+        )
+        self.assertIsNone(replication.parse_replication_device(""))
+        self.assertIsNone(replication.parse_replication_device(None))
+
+    def test_parse_replication_device_alias(self):
+        """Test backendid is accepted for backend_id and extra keys are kept."""
+        device = replication.parse_replication_device(
+            "backendid:acme,san_ip:10.20.30.41,san_login:admin,san_password:secret,"
+            "rest_server_port:8443"
+        )
+
+        self.assertEqual(device.backend_id, "acme")
+        self.assertEqual(
+            replication.format_replication_device(device),
+            "backend_id:acme,san_ip:10.20.30.41,san_login:admin,san_password:secret,"
+            "rest_server_port:8443",
+        )
+
+    def test_parse_replication_device_invalid(self):
+        """Test malformed items, repeated and missing keys are rejected."""
+        for raw, error in (
+            ("backend_id:acme,san_ip", "item 2 is not of the form key:value"),
+            ("backend_id:acme,san_ip:,", "item 2 is not of the form key:value"),
+            ("backend_id:a,backendid:b", "backend_id is set twice"),
+            ("backend_id:acme,san_ip:10.20.30.41", "missing san_login, san_password"),
+        ):
+            with self.subTest(raw=raw):
+                with self.assertRaisesRegex(ValueError, error):
+                    replication.parse_replication_device(raw)
+
+    def test_run_checks_concurrently(self):
+        """Test the checks run at the same time and failures are reported."""
+        barrier = threading.Barrier(3, timeout=5)
+
+        def ok():
+            barrier.wait()
+            return "reachable"
+
+        def failed():
+            barrier.wait()
+            raise ValueError("credentials rejected")
+
+        checks = replication.run_checks({"a": ok, "b": ok, "c": failed})
+
+        self.assertEqual(list(checks), ["a", "b", "c"])
+        self.assertEqual(checks["a"][:2], (True, "reachable"))
+        self.assertEqual(checks["c"][:2], (False, "credentials rejected"))
+        self.assertEqual(replication.run_checks({}), {})
+
+    def test_wait_for(self):
+        """Test the condition is polled until it holds or the timeout expires."""
+        calls = []
+
+        def condition():
+            calls.append(time.monotonic())
+            return len(calls) == 3
+
+        self.assertTrue(replication.wait_for(condition, timeout=5, interval=0.01))
+        self.assertEqual(len(calls), 3)
+        self.assertFalse(replication.wait_for(lambda: False, timeout=0.05, interval=0.01))
+        self.assertFalse(replication.wait_for(lambda: False, timeout=0))
@@ -0,0 +1,161 @@
+# Copyright 2024 Canonical Ltd
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import random
+import unittest
+
+import rolling
+
+
+class SimulatedUnit:
+    """Unit upgrading its SDC in a simulated rolling upgrade."""
+
+    def __init__(self, name: str, rng: random.Random, fail: bool = False):
+        self.name = name
+        self.state = rolling.WAITING
+        self.fail = fail
+        # Hook runs needed to install the package and to map the volumes again
+        self.install_ticks = rng.randint(1, 3)
+        self.remap_ticks = rng.randint(0, 4)
+        self.volumes = [f"{name}-vol-{i}" for i in range(rng.randint(0, 3))]
+        self.mapped = list(self.volumes)
+        self.scini_running = True
+
+    def tick(self, granted: list):
+        """Run the hooks of the unit for one step of the simulation."""
+        if self.state == rolling.WAITING and self.name in granted:
+            self.state = rolling.UPGRADING
+            # Reloading scini unmaps the volumes until the MDMs map them again
+            self.scini_running = False
+            self.mapped = []
+        elif self.state == rolling.UPGRADING:
+            self.install_ticks -= 1
+            if self.install_ticks <= 0:
+                self.state = rolling.FAILED if self.fail else rolling.VERIFYING
+                self.scini_running = not self.fail
+        elif self.state == rolling.VERIFYING:
+            self.remap_ticks -= 1
+            if self.remap_ticks <= 0:
+                self.mapped = list(self.volumes)
+            if rolling.is_healthy(self.scini_running, self.volumes, self.mapped):
+                self.state = rolling.DONE
+
+
+def simulate(units: list, max_concurrent: int, max_ticks: int = 1000):
+    """Run the rolling upgrade until every unit is done or no progress is made.
+
+    :return: the number of ticks run and the highest number of units
+             upgrading at once
+    """
+    granted = []
+    peak = 0
+    for tick in range(max_ticks):
+        states = {unit.name: unit.state for unit in units}
+        if all(state == rolling.DONE for state in states.values()):
+            return tick, peak
+
+        granted = rolling.grant(states, granted, max_concurrent)
+        for unit in units:
+            unit.tick(granted)
+
+        busy = [unit for unit in units if unit.state in rolling.IN_PROGRESS]
+        peak = max(peak, len(busy))
+        assert max_concurrent < 1 or len(busy) <= max_concurrent, busy
+        # Unhealthy units never leave their slot
+        for unit in units:
+            if unit.state == rolling.DONE:
+                assert unit.scini_running and set(unit.volumes) <= set(unit.mapped)
+    return max_ticks, peak
+
+
+class TestGrant(unittest.TestCase):
+    def test_unit_sort_key(self):
+        """Test units are ordered by number rather than name."""
+        units = ["app/10", "app/2", "app/1"]
+        self.assertEqual(sorted(units, key=rolling.unit_sort_key), ["app/1", "app/2", "app/10"])
+
+    def test_grant_limits_concurrency(self):
+        """Test slots go to the waiting units in order, up to the limit."""
+        states = {f"app/{i}": rolling.WAITING for i in range(5)}
+        states["app/3"] = rolling.DONE
+        self.assertEqual(rolling.grant(states, [], 2), ["app/0", "app/1"])
+        self.assertEqual(rolling.grant(states, [], 0), ["app/0", "app/1", "app/2", "app/4"])
+
+    def test_grant_keeps_slots_until_done(self):
+        """Test units keep their slot until their upgrade is done."""
+        states = {
+            "app/0": rolling.VERIFYING,
+            "app/1": rolling.DONE,
+            "app/2": rolling.WAITING,
+            "app/3": rolling.WAITING,
+        }
+        self.assertEqual(rolling.grant(states, ["app/0", "app/1"], 2), ["app/0", "app/2"])
+        # Departed units release their slot
+        del states["app/0"]
+        self.assertEqual(rolling.grant(states, ["app/0", "app/2"], 2), ["app/2", "app/3"])
+
+    def test_grant_failed_holds_slot(self):
+        """Test a failed upgrade holds its slot."""
+        states = {"app/0": rolling.FAILED, "app/1": rolling.WAITING}
+        self.assertEqual(rolling.grant(states, ["app/0"], 1), ["app/0"])
+
+    def test_grant_lowered_limit(self):
+        """Test lowering the limit does not revoke slots already granted."""
+        states = {f"app/{i}": rolling.UPGRADING for i in range(3)}
+        states["app/3"] = rolling.WAITING
+        self.assertEqual(rolling.grant(states, ["app/0", "app/1", "app/2"], 1), list(states)[:3])
+
+    def test_is_healthy(self):
+        """Test the health gate requires scini and every previously mapped volume."""
+        self.assertTrue(rolling.is_healthy(True, ["a", "b"], ["b", "a", "c"]))
+        self.assertTrue(rolling.is_healthy(True, [], None))
+        self.assertFalse(rolling.is_healthy(False, [], []))
+        self.assertFalse(rolling.is_healthy(True, ["a", "b"], ["a"]))
+        self.assertFalse(rolling.is_healthy(True, ["a"], None))
+
+
+class TestSimulation(unittest.TestCase):
+    def test_rolling_upgrade(self):
+        """Test many units all upgrade without exceeding the concurrency limit."""
+        for max_concurrent in (1, 3, 10):
+            rng = random.Random(max_concurrent)
+            units = [SimulatedUnit(f"cinder-powerflex/{i}", rng) for i in range(60)]
+
+            ticks, peak = simulate(units, max_concurrent)
+
+            self.assertTrue(all(unit.state == rolling.DONE for unit in units))
+            self.assertEqual(peak, max_concurrent)
+            self.assertLess(ticks, 1000)
+
+    def test_unlimited_upgrade(self):
+        """Test every unit upgrades at once without a limit."""
+        rng = random.Random(0)
+        units = [SimulatedUnit(f"cinder-powerflex/{i}", rng) for i in range(20)]
+
+        _, peak = simulate(units, 0)
+
+        self.assertEqual(peak, 20)
+
+    def test_failed_upgrade_holds_slot(self):
+        """Test a failed upgrade keeps its slot, stopping a one unit rollout."""
+        for max_concurrent, done in ((1, 2), (2, 9)):
+            rng = random.Random(1)
+            units = [SimulatedUnit(f"cinder-powerflex/{i}", rng) for i in range(10)]
+            units[2].fail = True
+
+            ticks, _ = simulate(units, max_concurrent, max_ticks=200)
+
+            self.assertEqual(ticks, 200)
+            self.assertEqual(units[2].state, rolling.FAILED)
+            self.assertEqual(sum(unit.state == rolling.DONE for unit in units), done)
@@ -0,0 +1,146 @@
+# Copyright 2024 Canonical Ltd
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import socket
+import tempfile
+import time
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+import sdc
+
+FIXTURES = Path(__file__).parent / "fixtures"
+
+
+class TestMdmProbe(unittest.TestCase):
+    def setUp(self):
+        self.listener = socket.create_server(("127.0.0.1", 0))
+        self.addCleanup(self.listener.close)
+        self.port = self.listener.getsockname()[1]
+
+        # A port nothing listens on
+        closed = socket.create_server(("127.0.0.1", 0))
+        self.closed_port = closed.getsockname()[1]
+        closed.close()
+
+    def test_split_mdm_ips(self):
+        """Test the MDM list is split and stripped."""
+        self.assertEqual(sdc.split_mdm_ips(" 10.0.0.1,10.0.0.2 ,,"), ["10.0.0.1", "10.0.0.2"])
+        self.assertEqual(sdc.split_mdm_ips(None), [])
+
+    def test_probe_mdm(self):
+        """Test a listening MDM is reachable and a closed port is not."""
+        self.assertIsNotNone(sdc.probe_mdm("127.0.0.1", self.port).latency)
+
+        probe = sdc.probe_mdm("127.0.0.1", self.closed_port)
+        self.assertIsNone(probe.latency)
+        self.assertIsNotNone(probe.error)
+
+    def test_probe_mdms_concurrently(self):
+        """Test the MDMs are probed concurrently and ordered by latency."""
+        delays = {"slow": 0.3, "fast": 0.05, "dead": None}
+
+        def fake_probe(address, port, timeout):
+            if delays[address] is None:
+                return sdc.MdmProbe(address, error="timed out")
+            time.sleep(delays[address])
+            return sdc.MdmProbe(address, latency=delays[address])
+
+        start = time.monotonic()
+        with patch.object(sdc, "probe_mdm", fake_probe):
+            probes = sdc.probe_mdms(["dead", "slow", "fast"])
+
+        self.assertLess(time.monotonic() - start, 0.3 + 0.2)
+        self.assertEqual([p.address for p in probes], ["fast", "slow", "dead"])
+
+    def test_probe_single_mdm(self):
+        """Test a single MDM is probed without a thread pool."""
+        with patch.object(sdc, "probe_mdm", return_value=sdc.MdmProbe("mdm", 0.001)), patch.object(
+            sdc, "ThreadPoolExecutor"
+        ) as executor:
+            probes = sdc.probe_mdms(["mdm"])
+
+        self.assertEqual(probes, [sdc.MdmProbe("mdm", 0.001)])
+        executor.assert_not_called()
+
+
+class TestModuleParameters(unittest.TestCase):
+    def setUp(self):
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        self.tmpdir = Path(tmpdir.name)
+
+    def test_parse_module_parameters(self):
+        """Test the parameters are parsed and validated."""
+        self.assertEqual(
+            sdc.parse_module_parameters(" io_queue_depth=64, blk_mq=Y,"),
+            {"io_queue_depth": "64", "blk_mq": "Y"},
+        )
+        self.assertEqual(sdc.parse_module_parameters(None), {})
+        for parameters in ("io_queue_depth", "Depth=1", "depth=$(reboot)", "depth=1 2"):
+            with self.assertRaises(ValueError, msg=parameters):
+                sdc.parse_module_parameters(parameters)
+
+    def test_apply_module_parameters_not_loaded(self):
+        """Test the parameters are pending when the module is not loaded."""
+        applied, pending = sdc.apply_module_parameters(
+            {"io_queue_depth": "64"}, self.tmpdir / "missing"
+        )
+
+        self.assertEqual((applied, pending), ({}, ["io_queue_depth"]))
+
+    def test_write_file_atomic(self):
+        """Test a file is only written when its content changes."""
+        path = self.tmpdir / "conf" / "scini.conf"
+
+        self.assertTrue(sdc.write_file_atomic(path, "options scini a=1\n", perms=0o600))
+        self.assertFalse(sdc.write_file_atomic(path, "options scini a=1\n", perms=0o600))
+        self.assertEqual(path.read_text(), "options scini a=1\n")
+        self.assertEqual(path.stat().st_mode & 0o777, 0o600)
+        self.assertEqual(list(path.parent.iterdir()), [path])
+
+    def test_write_file_atomic_perms(self):
+        """Test the requested permissions are set regardless of the umask."""
+        path = self.tmpdir / "connector.conf"
+        previous = os.umask(0o077)
+        self.addCleanup(os.umask, previous)
+
+        sdc.write_file_atomic(path, "[powerflex]\n", perms=0o640)
+
+        self.assertEqual(path.stat().st_mode & 0o777, 0o640)
+
+
+class TestDpkgStatus(unittest.TestCase):
+    def test_dpkg_status(self):
+        """Test the state of a package is read from the dpkg status file."""
+        status_file = FIXTURES / "dpkg_status.txt"
+
+        self.assertEqual(
+            sdc.dpkg_status("emc-scaleio-sdc", status_file), ("installed", "4.5-2.185")
+        )
+        self.assertEqual(
+            sdc.dpkg_status("scaleio-lia", status_file), ("half-configured", "4.5-2.185")
+        )
+        # The installed architecture wins over the removed one
+        self.assertEqual(
+            sdc.dpkg_status("libssl3", status_file), ("installed", "3.0.2-0ubuntu1.18")
+        )
+        self.assertIsNone(sdc.dpkg_status("emc-scaleio", status_file))
+
+    def test_dpkg_status_missing_file(self):
+        """Test an unreadable dpkg status file raises OSError."""
+        with self.assertRaises(OSError):
+            sdc.dpkg_status("emc-scaleio-sdc", Path("/nonexistent/dpkg/status"))
@@ -0,0 +1,176 @@
+# Copyright 2024 Canonical Ltd
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+import sdc_stats
+
+FIXTURES = Path(__file__).parent / "fixtures"
+
+
+def fixture(name: str) -> str:
+    return (FIXTURES / name).read_text()
+
+
+class TestSdcStats(unittest.TestCase):
+    def setUp(self):
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        self.tmp = Path(tmpdir.name)
+
+    def test_parse_query_vols(self):
+        """Test the mapped volumes are parsed, with lowercase IDs."""
+        self.assertEqual(
+            sdc_stats.parse_query_vols(fixture("drv_cfg_query_vols.txt")),
+            [
+                sdc_stats.MappedVolume("6b3e2ab400000001", "4f8a8b3a5dd2f10f"),
+                sdc_stats.MappedVolume("6b3e2ab500000002", "4f8a8b3a5dd2f10f"),
+                sdc_stats.MappedVolume("6b3e2ab600000003", "4f8a8b3a5dd2f10f"),
+            ],
+        )
+        self.assertEqual(sdc_stats.parse_query_vols("Retrieved 0 volume(s)\n"), [])
+
+    def test_parse_query_mdms(self):
+        """Test the MDM connections are parsed with their IPs."""
+        self.assertEqual(
+            sdc_stats.parse_query_mdms(fixture("drv_cfg_query_mdms.txt")),
+            [
+                sdc_stats.MdmConnection(
+                    "4f8a8b3a5dd2f10f", "9b9a2b6a00000003", ["10.0.0.2", "10.0.0.3"]
+                ),
+                sdc_stats.MdmConnection("5e1c0d7a2b3f4c6d", "9b9a2b6a00000007", ["192.168.10.5"]),
+            ],
+        )
+
+    def test_parse_query_guid(self):
+        """Test the SDC GUID is parsed in uppercase."""
+        self.assertEqual(
+            sdc_stats.parse_query_guid("Retrieved GUID: 6a3b8c0e-2f4d-1a2b-9c8d-7e6f5a4b3c2d\n"),
+            "6A3B8C0E-2F4D-1A2B-9C8D-7E6F5A4B3C2D",
+        )
+        self.assertIsNone(sdc_stats.parse_query_guid("Failed to open /dev/scini\n"))
+
+    def test_parse_block_stat(self):
+        """Test the counters of a block device stat line are parsed."""
+        self.assertEqual(
+            sdc_stats.parse_block_stat(fixture("scinia_stat_before.txt")),
+            sdc_stats.BlockStat(
+                reads=1200,
+                read_sectors=76800,
+                read_ms=2400,
+                writes=600,
+                write_sectors=38400,
+                write_ms=1800,
+                in_flight=2,
+                io_ms=3000,
+            ),
+        )
+        with self.assertRaises(ValueError):
+            sdc_stats.parse_block_stat("1 2 3")
+
+    def test_rates(self):
+        """Test the rates between two samples."""
+        before = sdc_stats.parse_block_stat(fixture("scinia_stat_before.txt"))
+        after = sdc_stats.parse_block_stat(fixture("scinia_stat_after.txt"))
+
+        self.assertEqual(
+            sdc_stats.rates(before, after, 5),
+            {
+                "read-iops": 100.0,
+                "write-iops": 50.0,
+                "read-kib-s": 3200.0,
+                "write-kib-s": 1600.0,
+                "read-latency-ms": 2.0,
+                "write-latency-ms": 5.0,
+                "util-percent": 30.0,
+                "in-flight": 1,
+            },
+        )
+        idle = sdc_stats.rates(after, after, 5)
+        self.assertEqual(idle["read-latency-ms"], 0.0)
+        self.assertEqual(idle["write-iops"], 0.0)
+
+    def test_sample_and_volume_devices(self):
+        """Test scini devices are sampled and named after their volume."""
+        for device in ("scinia", "scinib", "sda"):
+            (self.tmp / "sys" / device).mkdir(parents=True)
+            (self.tmp / "sys" / device / "stat").write_text(fixture("scinia_stat_before.txt"))
+        by_id = self.tmp / "by-id"
+        by_id.mkdir()
+        (by_id / "emc-vol-4f8a8b3a5dd2f10f-6b3e2ab400000001").symlink_to(self.tmp / "scinia")
+        (by_id / "wwn-0x5000c500a1b2c3d4").symlink_to(self.tmp / "sda")
+
+        self.assertEqual(list(sdc_stats.sample(self.tmp / "sys")), ["scinia", "scinib"])
+        self.assertEqual(sdc_stats.volume_devices(by_id), {"6b3e2ab400000001": "scinia"})
+        self.assertEqual(sdc_stats.volume_devices(self.tmp / "missing"), {})
+
+    @patch("time.sleep")
+    @patch("subprocess.run")
+    def test_collect(self, _run, _sleep):
+        """Test the SDC state and volume rates are gathered in one pass."""
+        outputs = {
+            "--query_mdms": fixture("drv_cfg_query_mdms.txt"),
+            "--query_vols": fixture("drv_cfg_query_vols.txt"),
+        }
+        _run.side_effect = lambda cmd, **kwargs: MagicMock(returncode=0, stdout=outputs[cmd[1]])
+        samples = iter(
+            [
+                {"scinia": sdc_stats.parse_block_stat(fixture("scinia_stat_before.txt"))},
+                {"scinia": sdc_stats.parse_block_stat(fixture("scinia_stat_after.txt"))},
+            ]
+        )
+
+        with patch("sdc_stats.sample", side_effect=lambda: next(samples)), patch(
+            "sdc_stats.volume_devices", return_value={"6b3e2ab400000001": "scinia"}
+        ):
+            collected = sdc_stats.collect(5)
+
+        _sleep.assert_called_once_with(5)
+        self.assertEqual(len(collected["mdms"]), 2)
+        self.assertEqual(len(collected["volumes"]), 3)
+        self.assertEqual(list(collected["stats"]), ["6b3e2ab400000001"])
+        self.assertEqual(collected["stats"]["6b3e2ab400000001"]["device"], "scinia")
+        self.assertEqual(collected["stats"]["6b3e2ab400000001"]["read-iops"], 100.0)
+
+    @patch("subprocess.run")
+    def test_query_drv_cfg_failure(self, _run):
+        """Test drv_cfg failures are raised as OSError."""
+        _run.return_value = MagicMock(returncode=1, stdout="", stderr="scini is not loaded\n")
+        with self.assertRaisesRegex(OSError, "drv_cfg --query_vols failed: scini is not loaded"):
+            sdc_stats.query_drv_cfg("--query_vols")
+
+    @patch("subprocess.run")
+    def test_add_mdm(self, _run):
+        """Test the MDMs are added to the SDC and to its configuration file."""
+        _run.return_value = MagicMock(returncode=0, stdout="", stderr="")
+        sdc_stats.add_mdm(["10.0.1.11", "10.0.1.12"])
+
+        self.assertEqual(
+            _run.call_args.args[0],
+            [
+                "/opt/emc/scaleio/sdc/bin/drv_cfg",
+                "--add_mdm",
+                "--ip",
+                "10.0.1.11,10.0.1.12",
+                "--file",
+                "/etc/emc/scaleio/drv_cfg.txt",
+            ],
+        )
+
+        _run.return_value = MagicMock(returncode=1, stdout="", stderr="MDM unreachable\n")
+        with self.assertRaisesRegex(OSError, "drv_cfg --add_mdm failed: MDM unreachable"):
+            sdc_stats.add_mdm(["10.0.1.11"])
@@ -0,0 +1,117 @@
+# Copyright 2024 Canonical Ltd
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import subprocess
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+import sdc_worker
+
+
+class TestSdcWorker(unittest.TestCase):
+    def setUp(self):
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        self.state_file = Path(tmpdir.name) / "state.json"
+
+    def test_run_succeeded(self):
+        """Test a successful command is recorded with its output."""
+        exit_code = sdc_worker.main(
+            [str(self.state_file), "--", sys.executable, "-c", "print('installed')"]
+        )
+
+        state = json.loads(self.state_file.read_text())
+        self.assertEqual(exit_code, 0)
+        self.assertEqual(state["state"], "succeeded")
+        self.assertEqual(state["exit_code"], 0)
+        self.assertEqual(state["stdout"], "installed\n")
+        self.assertIn("finished_at", state)
+
+    def test_run_failed(self):
+        """Test a failing command is recorded with its exit code."""
+        sdc_worker.main(
+            [str(self.state_file), "--", sys.executable, "-c", "import sys; sys.exit(3)"]
+        )
+
+        state = json.loads(self.state_file.read_text())
+        self.assertEqual(state["state"], "failed")
+        self.assertEqual(state["exit_code"], 3)
+
+    def test_run_missing_command(self):
+        """Test a command which cannot be executed is recorded as failed."""
+        sdc_worker.main([str(self.state_file), "--", "/nonexistent/dpkg"])
+
+        state = json.loads(self.state_file.read_text())
+        self.assertEqual(state["state"], "failed")
+        self.assertEqual(state["exit_code"], 127)
+
+    def test_run_with_lock(self):
+        """Test the command runs once the lock is taken."""
+        lock_file = self.state_file.parent / "lock-frontend"
+        exit_code = sdc_worker.main(
+            [str(self.state_file), "--lock", str(lock_file), "0", "--", sys.executable, "-V"]
+        )
+
+        state = json.loads(self.state_file.read_text())
+        self.assertEqual(exit_code, 0)
+        self.assertEqual(state["state"], "succeeded")
+
+    def test_run_locked(self):
+        """Test the command does not run while another process holds the lock."""
+        lock_file = self.state_file.parent / "lock-frontend"
+        holder = subprocess.Popen(
+            [
+                sys.executable,
+                "-c",
+                "import fcntl, sys, time\n"
+                f"f = open({str(lock_file)!r}, 'w')\n"
+                "fcntl.lockf(f, fcntl.LOCK_EX)\n"
+                "print('locked', flush=True)\n"
+                "time.sleep(30)\n",
+            ],
+            stdout=subprocess.PIPE,
+            text=True,
+        )
+        self.addCleanup(holder.wait)
+        self.addCleanup(holder.kill)
+        self.assertEqual(holder.stdout.readline(), "locked\n")
+        marker = self.state_file.parent / "ran"
+
+        exit_code = sdc_worker.main(
+            [
+                str(self.state_file),
+                "--lock",
+                str(lock_file),
+                "0",
+                "--",
+                sys.executable,
+                "-c",
+                f"open({str(marker)!r}, 'w')",
+            ]
+        )
+
+        state = json.loads(self.state_file.read_text())
+        self.assertEqual(exit_code, sdc_worker.LOCKED_EXIT_CODE)
+        self.assertEqual(state["state"], "locked")
+        self.assertIn("still locked", state["stderr"])
+        self.assertFalse(marker.exists())
+
+    def test_usage(self):
+        """Test the worker refuses a command line without a command."""
+        self.assertEqual(sdc_worker.main([str(self.state_file)]), 2)
+        self.assertEqual(sdc_worker.main([str(self.state_file), "--lock", "/tmp/lock"]), 2)
+        self.assertFalse(self.state_file.exists())
@@ -0,0 +1,59 @@
+# Copyright 2024 Canonical Ltd
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import tempfile
+import unittest
+from pathlib import Path
+
+import timing
+
+
+class TestTiming(unittest.TestCase):
+    def setUp(self):
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        self.path = Path(tmpdir.name) / "timings.json"
+
+    def test_flush_keeps_bounded_samples(self):
+        """Test only the most recent samples of each phase are kept."""
+        for i in range(5):
+            timer = timing.HookTimer(self.path, "update-status", capacity=3)
+            timer.spans.append(("install_status", float(i)))
+            timer.flush()
+
+        samples = timing.load(self.path)
+        self.assertEqual(samples["install_status"], [2.0, 3.0, 4.0])
+        self.assertEqual(len(samples["hook-update-status"]), 3)
+
+    def test_span_records_exceptions(self):
+        """Test a span is recorded even when the timed block raises."""
+        timer = timing.HookTimer(self.path, "install")
+        with self.assertRaises(RuntimeError):
+            with timer.span("dpkg"):
+                raise RuntimeError()
+
+        self.assertEqual([phase for phase, _ in timer.spans], ["dpkg"])
+
+    def test_summarize(self):
+        """Test the percentiles are computed with the nearest-rank method."""
+        summary = timing.summarize({"render": [i / 1000 for i in range(1, 101)], "empty": []})
+
+        self.assertEqual(
+            summary, {"render": {"count": 100, "p50": 50.0, "p95": 95.0, "max": 100.0}}
+        )
+
+    def test_load_unreadable_file(self):
+        """Test a corrupted ring buffer is discarded."""
+        self.path.write_text("{not json")
+        self.assertEqual(timing.load(self.path), {})
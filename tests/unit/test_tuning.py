@@ -0,0 +1,57 @@
+# Copyright 2024 Canonical Ltd
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+
+import tuning
+
+
+class TestTuning(unittest.TestCase):
+    def test_profiles_are_valid(self):
+        """Test every profile only sets tunable options with valid values."""
+        for profile, options in tuning.PROFILES.items():
+            overrides = ",".join(f"{name}={value}" for name, value in options.items())
+            self.assertEqual(tuning.parse_overrides(overrides), options, profile)
+
+    def test_profile_options(self):
+        """Test an empty profile name selects the default profile."""
+        self.assertEqual(tuning.profile_options(""), {})
+        self.assertEqual(tuning.profile_options("default"), {})
+        self.assertEqual(tuning.profile_options("low-latency")["rest_api_connect_timeout"], 10)
+
+    def test_parse_overrides(self):
+        """Test overrides are parsed into typed values."""
+        self.assertEqual(
+            tuning.parse_overrides(
+                " backend_native_threads_pool_size = 80, "
+                "powerflex_unmap_volume_before_deletion=yes,"
+            ),
+            {
+                "backend_native_threads_pool_size": 80,
+                "powerflex_unmap_volume_before_deletion": True,
+            },
+        )
+        self.assertEqual(tuning.parse_overrides(None), {})
+
+    def test_parse_overrides_invalid(self):
+        """Test malformed, unknown and invalid overrides are rejected."""
+        for overrides in (
+            "rest_api_read_timeout",
+            "san_password=secret",
+            "rest_api_read_timeout=0",
+            "backend_native_threads_pool_size=many",
+            "powerflex_unmap_volume_before_deletion=maybe",
+        ):
+            with self.assertRaises(ValueError, msg=overrides):
+                tuning.parse_overrides(overrides)